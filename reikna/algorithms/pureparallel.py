@@ -50,6 +50,9 @@ class PureParallel(Computation):
         else:
             self._guiding_shape = guiding_array
 
+        # Set by from_trf()
+        self._trf = None
+
     @classmethod
     def from_trf(cls, trf, guiding_array=None):
         """
@@ -85,9 +88,26 @@ class PureParallel(Computation):
             list(trf.signature.parameters.values()),
             trf.snippet,
             guiding_array=guiding_param.name)
+        res._trf = trf
 
         return res
 
+    def _as_transformation(self):
+        # Only the computations created out of transformations can be represented by them,
+        # as long as no other transformations were connected,
+        # and there is a thread for every element of the output.
+        if self._trf is None or len(list(self._tr_tree.connections())) > 0:
+            return None
+
+        outputs = [
+            param for param in self.signature.parameters.values() if param.annotation.output]
+        if len(outputs) != 1:
+            return None
+        if tuple(outputs[0].annotation.type.shape) != tuple(self._guiding_shape):
+            return None
+
+        return self._trf
+
     def _build_plan(self, plan_factory, _device_params, *args):
 
         plan = plan_factory()
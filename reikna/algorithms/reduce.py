@@ -93,14 +93,16 @@ class Reduce(Computation):
             Parameter('output', Annotation(Type(arr_t.dtype, shape=output_shape), 'o')),
             Parameter('input', Annotation(arr_t, 'i'))])
 
-    def _build_plan_for_wg_size(self, plan_factory, warp_size, max_wg_size, output, input_):
+    def _build_plan_for_wg_size(self, plan_factory, warp_size, max_wg_size, output, input_,
+            max_seq_size=None):
 
         plan = plan_factory()
 
         # Using algorithm cascading: sequential reduction, and then the parallel one.
         # According to Brent's theorem, the optimal sequential size is O(log(n)).
         # Setting it to the nearest power of 2 to simplify integer operations.
-        max_seq_size = helpers.bounding_power_of_2(helpers.log2(max_wg_size))
+        if max_seq_size is None:
+            max_seq_size = helpers.bounding_power_of_2(helpers.log2(max_wg_size))
         max_reduce_power = max_wg_size * max_seq_size
 
         if self._transpose_axes is None:
@@ -172,13 +174,32 @@ class Reduce(Computation):
 
     def _build_plan(self, plan_factory, device_params, output, input_):
 
+        warp_size = device_params.warp_size
         max_wg_size = device_params.max_work_group_size
 
+        # Candidates for the tuner: several largest work group sizes
+        # and power of 2 sequential sizes.
+        candidates = [
+            (max_wg_size // 2 ** i, 2 ** j)
+            for i in range(3) for j in range(1, 6)
+            if max_wg_size // 2 ** i >= 1]
+        build = lambda plan_factory, candidate, output, input_: self._build_plan_for_wg_size(
+            plan_factory, warp_size, candidate[0], output, input_, max_seq_size=candidate[1])
+
+        best = self._tuned(
+            plan_factory, 'wg_and_seq_size', candidates, build, [output, input_],
+            problem=(self._transpose_axes,))
+        if best is not None:
+            try:
+                return build(plan_factory, best, output, input_)
+            except OutOfResourcesError:
+                pass
+
         while max_wg_size >= 1:
 
             try:
                 plan = self._build_plan_for_wg_size(
-                    plan_factory, device_params.warp_size, max_wg_size, output, input_)
+                    plan_factory, warp_size, max_wg_size, output, input_)
             except OutOfResourcesError:
                 max_wg_size //= 2
                 continue
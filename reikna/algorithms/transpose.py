@@ -105,16 +105,9 @@ class Transpose(Computation):
             Parameter('output', Annotation(output_arr, 'o')),
             Parameter('input', Annotation(arr_t, 'i'))])
 
-    def _add_transpose(self, plan, device_params,
+    def _add_transpose(self, plan, block_width,
             mem_out, mem_in, batch_shape, height_shape, width_shape):
 
-        bso = self._block_width_override
-        block_width = device_params.local_mem_banks if bso is None else bso
-
-        if block_width ** 2 > device_params.max_work_group_size:
-            # If it is not CPU, current solution may affect performance
-            block_width = int(numpy.sqrt(device_params.max_work_group_size))
-
         input_height = helpers.product(height_shape)
         input_width = helpers.product(width_shape)
         batch = helpers.product(batch_shape)
@@ -136,7 +129,7 @@ class Transpose(Computation):
             local_size=(1, block_width, block_width),
             render_kwds=render_kwds)
 
-    def _build_plan(self, plan_factory, device_params, output, input_):
+    def _build_plan_for_block_width(self, plan_factory, block_width, output, input_):
         plan = plan_factory()
         transposes = get_transposes(input_.shape, self._axes)
 
@@ -152,7 +145,28 @@ class Transpose(Computation):
                 mem_out = plan.temp_array(
                     batch_shape + width_shape + height_shape, output.dtype)
 
-            self._add_transpose(plan, device_params,
+            self._add_transpose(plan, block_width,
                 mem_out, mem_in, batch_shape, height_shape, width_shape)
 
         return plan
+
+    def _build_plan(self, plan_factory, device_params, output, input_):
+
+        bso = self._block_width_override
+        block_width = device_params.local_mem_banks if bso is None else bso
+
+        if block_width ** 2 > device_params.max_work_group_size:
+            # If it is not CPU, current solution may affect performance
+            block_width = int(numpy.sqrt(device_params.max_work_group_size))
+
+        if bso is None:
+            block_widths = [
+                2 ** n for n in range(helpers.log2(device_params.local_mem_banks), 1, -1)
+                if 2 ** (2 * n) <= device_params.max_work_group_size]
+            best_width = self._tuned(
+                plan_factory, 'block_width', block_widths, self._build_plan_for_block_width,
+                [output, input_], problem=(self._axes,))
+            if best_width is not None:
+                block_width = best_width
+
+        return self._build_plan_for_block_width(plan_factory, block_width, output, input_)
@@ -0,0 +1,37 @@
+"""
+Standard benchmarks of the computations.
+The suites can be run from the command line with ``python -m reikna.benchmarks``
+(or the ``reikna-benchmark`` script);
+run it with ``--help`` for the list of options.
+
+
+Suites
+^^^^^^
+
+.. py:data:: SUITES
+
+    A dictionary of suite names and functions taking the ``double`` keyword
+    and returning lists of :py:class:`Benchmark` objects:
+    ``'FFT'``, ``'FFTShift'``, ``'Reduce'``, ``'Transpose'``, ``'MatrixMul'``,
+    ``'DHT'``, ``'CBRNG'`` and ``'PureParallel'``.
+
+.. autoclass:: Benchmark
+
+
+Running and comparing
+^^^^^^^^^^^^^^^^^^^^^
+
+.. autofunction:: run_benchmark
+
+.. autofunction:: run_suites
+
+.. autofunction:: save_results
+
+.. autofunction:: load_results
+
+.. autofunction:: compare_results
+"""
+
+from reikna.benchmarks.suites import Benchmark, SUITES
+from reikna.benchmarks.runner import \
+    run_benchmark, run_suites, save_results, load_results, compare_results
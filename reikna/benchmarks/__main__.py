@@ -0,0 +1,90 @@
+"""
+Command line interface for the benchmark suites (see :py:mod:`reikna.benchmarks`).
+"""
+
+from __future__ import print_function
+
+import sys
+import argparse
+
+import numpy
+
+import reikna.cluda as cluda
+from reikna.benchmarks.suites import SUITES
+from reikna.benchmarks.runner import run_suites, save_results, load_results, compare_results
+
+
+def _format_value(value, fmt):
+    return "-" if value is None else fmt.format(value)
+
+
+def _print_result(result):
+    print("{name}: {time} ms, {overhead} us per call, compiled in {compile_time} s, "
+        "{gflops} GFLOPS, {gbps} GB/s".format(
+            name=result['name'],
+            time=_format_value(result['time'] * 1e3, "{0:.3f}"),
+            overhead=_format_value(result['call_overhead'] * 1e6, "{0:.1f}"),
+            compile_time=_format_value(result['compile_time'], "{0:.2f}"),
+            gflops=_format_value(result['gflops'], "{0:.2f}"),
+            gbps=_format_value(result['gbps'], "{0:.2f}")))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the standard reikna benchmarks.")
+    parser.add_argument('--api', choices=cluda.api_ids(),
+        help="API to use (by default, the first supported one is used)")
+    parser.add_argument('--device-include-mask', action='append', default=None,
+        help="Use a device with a matching name")
+    parser.add_argument('--platform-include-mask', action='append', default=None,
+        help="Use a platform with a matching name")
+    parser.add_argument('--suite', action='append', choices=sorted(SUITES), default=None,
+        help="Suite to run (can be given several times; by default, all the suites are run)")
+    parser.add_argument('--double', action='store_true',
+        help="Use double precision data types")
+    parser.add_argument('--fast-math', action='store_true',
+        help="Compile the computations with fast math")
+    parser.add_argument('--repetitions', type=int, default=10,
+        help="Number of timed calls for each benchmark")
+    parser.add_argument('--output',
+        help="Save the results to a JSON file")
+    parser.add_argument('--baseline',
+        help="Compare the results with the ones saved in a JSON file")
+    parser.add_argument('--threshold', type=float, default=0.1,
+        help="Relative increase of the execution time considered a regression")
+    args = parser.parse_args(argv)
+
+    api = cluda.any_api() if args.api is None else cluda.get_api(args.api)
+    thr = api.Thread.create(device_filters=dict(
+        include_devices=args.device_include_mask,
+        include_platforms=args.platform_include_mask))
+
+    if args.double and not thr.device_params.supports_dtype(numpy.float64):
+        print("The device does not support double precision", file=sys.stderr)
+        return 2
+
+    results = run_suites(
+        thr, suites=args.suite, double=args.double, repetitions=args.repetitions,
+        fast_math=args.fast_math, callback=_print_result)
+
+    if args.output is not None:
+        save_results(results, args.output)
+
+    if args.baseline is None:
+        return 0
+
+    baseline = load_results(args.baseline)
+    if baseline['device'] != results['device']:
+        print("Warning: the baseline was obtained on a different device or driver",
+            file=sys.stderr)
+
+    regressions = compare_results(results, baseline, threshold=args.threshold)
+    for regression in regressions:
+        print("Regression in {name}: {key} is {value:.3g} (baseline {baseline:.3g}, "
+            "x{ratio:.2f})".format(**regression))
+
+    return 1 if len(regressions) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+This module contains the functions running the benchmarks
+and comparing their results with a baseline.
+"""
+
+import json
+import time
+
+from reikna.core.tuning import measure_time
+from reikna.benchmarks.suites import SUITES
+
+
+def run_benchmark(thr, benchmark, repetitions=10, fast_math=False):
+    """
+    Compiles and executes a :py:class:`~reikna.benchmarks.suites.Benchmark`
+    with zero-filled arguments, and returns a dictionary with the keys:
+
+    * ``name``, ``suite``, ``params``: the attributes of the benchmark;
+    * ``compile_time``: the time of the compilation of the computation (in seconds),
+      including the rendering and the building of the programs;
+    * ``time``: the minimum execution time over ``repetitions`` calls (in seconds);
+    * ``call_overhead``: the minimum time a call takes on the host side,
+      without waiting for the device (in seconds);
+    * ``gflops``, ``gbps``: the performance in GFLOPS and the memory throughput in GB/s
+      (``None`` if the benchmark does not define the corresponding amount of work).
+
+    :param thr: a :py:class:`~reikna.cluda.api.Thread` object.
+    """
+    computation = benchmark.create()
+
+    t1 = time.time()
+    compiled = computation.compile(thr, fast_math=fast_math)
+    compile_time = time.time() - t1
+
+    exec_time, call_overhead = measure_time(
+        compiled, repetitions=repetitions, call_overhead=True)
+
+    return dict(
+        name=benchmark.name,
+        suite=benchmark.suite,
+        params=benchmark.params,
+        compile_time=compile_time,
+        time=exec_time,
+        call_overhead=call_overhead,
+        gflops=None if benchmark.flops is None else benchmark.flops / exec_time / 1e9,
+        gbps=None if benchmark.nbytes is None else benchmark.nbytes / exec_time / 1e9)
+
+
+def run_suites(thr, suites=None, double=False, repetitions=10, fast_math=False, callback=None):
+    """
+    Runs the benchmarks from the given suites and returns a dictionary
+    with the keys ``device`` (a string identifying the device and the driver),
+    ``double``, ``fast_math`` and ``results``
+    (a list of the results of :py:func:`run_benchmark`).
+
+    :param thr: a :py:class:`~reikna.cluda.api.Thread` object.
+    :param suites: a list of suite names (keys of :py:data:`SUITES`).
+        If ``None``, all the suites are run.
+    :param double: if ``True``, the benchmarks use double precision data types.
+    :param callback: if given, will be called with the result of each benchmark
+        as soon as it is available.
+    """
+    if suites is None:
+        suites = sorted(SUITES)
+
+    results = []
+    for suite in suites:
+        if suite not in SUITES:
+            raise ValueError("Unknown benchmark suite: " + repr(suite))
+        for benchmark in SUITES[suite](double=double):
+            result = run_benchmark(thr, benchmark, repetitions=repetitions, fast_math=fast_math)
+            results.append(result)
+            if callback is not None:
+                callback(result)
+
+    return dict(
+        device=thr._device_fingerprint(),
+        double=double,
+        fast_math=fast_math,
+        results=results)
+
+
+def save_results(results, path):
+    """
+    Saves the results of :py:func:`run_suites` to a JSON file.
+    """
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=4, sort_keys=True)
+
+
+def load_results(path):
+    """
+    Loads the results of :py:func:`run_suites` saved by :py:func:`save_results`.
+    """
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_results(results, baseline, threshold=0.1, keys=('time',)):
+    """
+    Compares the results of :py:func:`run_suites` with the ``baseline`` ones
+    (the benchmarks are matched by their names, the ones missing in either are skipped),
+    and returns a list of regressions, each being a dictionary with the keys
+    ``name``, ``key``, ``baseline``, ``value`` and ``ratio`` (of the value to the baseline one).
+
+    :param threshold: the relative increase of a value considered to be a regression.
+    :param keys: the keys of the benchmark results to compare
+        (the ones for which a larger value is worse, e.g.
+        ``'time'``, ``'compile_time'`` or ``'call_overhead'``).
+    """
+    baseline_results = dict((result['name'], result) for result in baseline['results'])
+
+    regressions = []
+    for result in results['results']:
+        if result['name'] not in baseline_results:
+            continue
+        baseline_result = baseline_results[result['name']]
+        for key in keys:
+            ratio = result[key] / baseline_result[key]
+            if ratio > 1 + threshold:
+                regressions.append(dict(
+                    name=result['name'], key=key,
+                    baseline=baseline_result[key], value=result[key], ratio=ratio))
+
+    return regressions
@@ -0,0 +1,229 @@
+"""
+This module contains the standard benchmark suites.
+"""
+
+import numpy
+
+import reikna.helpers as helpers
+from reikna.core import Type, Parameter, Annotation
+from reikna.algorithms import PureParallel, Transpose, Reduce, predicate_sum
+from reikna.linalg import MatrixMul
+from reikna.fft import FFT, FFTShift
+from reikna.dht import DHT, get_spatial_points
+from reikna.cbrng import CBRNG
+
+
+class Benchmark:
+    """
+    A single benchmark case: a computation with a fixed set of parameters,
+    and the amount of work it performs.
+
+    :param suite: the name of the suite the case belongs to.
+    :param params: a dictionary with JSON-serializable parameters of the case.
+    :param create: a function without arguments returning
+        a :py:class:`~reikna.core.Computation` object to benchmark.
+    :param flops: the number of floating point operations performed by a single call
+        (``None`` if not applicable).
+    :param nbytes: the number of bytes read and written by a single call
+        (``None`` if not applicable).
+
+    .. py:attribute:: name
+
+        A string uniquely identifying the case (used to match the results with the baseline).
+    """
+
+    def __init__(self, suite, params, create, flops=None, nbytes=None):
+        self.suite = suite
+        self.params = params
+        self.create = create
+        self.flops = flops
+        self.nbytes = nbytes
+        self.name = suite + "(" + ", ".join(
+            key + "=" + str(params[key]) for key in sorted(params)) + ")"
+
+
+def _dtypes(double):
+    if double:
+        return numpy.float64, numpy.complex128
+    else:
+        return numpy.float32, numpy.complex64
+
+
+def _nbytes(arr_t):
+    return arr_t.size * arr_t.dtype.itemsize
+
+
+def _type_params(shape, dtype, **kwds):
+    params = dict(shape=list(shape), dtype=numpy.dtype(dtype).name)
+    params.update(kwds)
+    return params
+
+
+def fft_suite(double=False):
+    """
+    Complex-to-complex FFT over the innermost axes for several problem sizes
+    (the operation count is estimated as ``5 N log2 N``).
+    """
+    _, ctype = _dtypes(double)
+    benchmarks = []
+    for shape, axes in [
+            ((2 ** 14, 64), (1,)),
+            ((2 ** 10, 1024), (1,)),
+            ((16, 2 ** 16), (1,)),
+            ((4, 512, 512), (1, 2)),
+            ((2 ** 10, 100), (1,))]:
+        arr_t = Type(ctype, shape=shape)
+        benchmarks.append(Benchmark(
+            'FFT', _type_params(shape, ctype, axes=list(axes)),
+            lambda arr_t=arr_t, axes=axes: FFT(arr_t, axes=axes),
+            flops=helpers.product(shape) * sum(numpy.log2(shape[axis]) for axis in axes) * 5,
+            nbytes=_nbytes(arr_t) * 2))
+    return benchmarks
+
+
+def fftshift_suite(double=False):
+    """
+    FFT shift over all the axes for even and odd problem sizes.
+    """
+    _, ctype = _dtypes(double)
+    benchmarks = []
+    for shape in [(2 ** 20,), (1024, 1024), (1023, 1025), (64, 128, 128)]:
+        arr_t = Type(ctype, shape=shape)
+        benchmarks.append(Benchmark(
+            'FFTShift', _type_params(shape, ctype),
+            lambda arr_t=arr_t: FFTShift(arr_t),
+            nbytes=_nbytes(arr_t) * 2))
+    return benchmarks
+
+
+def reduce_suite(double=False):
+    """
+    Summation over the whole array and over the inner or the outer axis.
+    """
+    rtype, _ = _dtypes(double)
+    benchmarks = []
+    for shape, axes in [
+            ((2 ** 22,), None),
+            ((2 ** 10, 2 ** 12), (1,)),
+            ((2 ** 12, 2 ** 10), (0,))]:
+        arr_t = Type(rtype, shape=shape)
+        benchmarks.append(Benchmark(
+            'Reduce', _type_params(shape, rtype, axes=None if axes is None else list(axes)),
+            lambda arr_t=arr_t, axes=axes: Reduce(arr_t, predicate_sum(arr_t.dtype), axes=axes),
+            flops=helpers.product(shape),
+            nbytes=_nbytes(arr_t)))
+    return benchmarks
+
+
+def transpose_suite(double=False):
+    """
+    Transposition of two innermost axes and a full permutation of a 3D array.
+    """
+    rtype, _ = _dtypes(double)
+    benchmarks = []
+    for shape, axes in [
+            ((2048, 2048), (1, 0)),
+            ((16, 512, 512), (0, 2, 1)),
+            ((64, 128, 128), (2, 1, 0)),
+            ((1000, 1000), (1, 0))]:
+        arr_t = Type(rtype, shape=shape)
+        benchmarks.append(Benchmark(
+            'Transpose', _type_params(shape, rtype, axes=list(axes)),
+            lambda arr_t=arr_t, axes=axes: Transpose(arr_t, axes=axes),
+            nbytes=_nbytes(arr_t) * 2))
+    return benchmarks
+
+
+def matrixmul_suite(double=False):
+    """
+    Batched multiplication of square complex matrices of several sizes.
+    """
+    _, ctype = _dtypes(double)
+    benchmarks = []
+    for batch, size in [(256, 32), (16, 256), (1, 1024), (1, 1000)]:
+        shape = (batch, size, size)
+        arr_t = Type(ctype, shape=shape)
+        benchmarks.append(Benchmark(
+            'MatrixMul', _type_params(shape, ctype),
+            lambda arr_t=arr_t: MatrixMul(arr_t, arr_t, out_arr=arr_t),
+            # 4 real multiplications and 4 additions per a complex multiply-add
+            flops=batch * size ** 3 * 8,
+            nbytes=_nbytes(arr_t) * 3))
+    return benchmarks
+
+
+def dht_suite(double=False):
+    """
+    Forward harmonic transform of a batch of 1D and 2D mode arrays.
+    """
+    _, ctype = _dtypes(double)
+    benchmarks = []
+    for shape, axes in [((1024, 64), (1,)), ((64, 256), (1,)), ((16, 64, 64), (1, 2))]:
+        arr_t = Type(ctype, shape=shape)
+        coord_shape = list(shape)
+        flops = 0
+        for axis in axes:
+            points = get_spatial_points(shape[axis], 1)
+            coord_shape[axis] = points
+            # Each axis is transformed by a separate matrix multiplication
+            flops += helpers.product(coord_shape) * shape[axis] * 8
+        benchmarks.append(Benchmark(
+            'DHT', _type_params(shape, ctype, axes=list(axes)),
+            lambda arr_t=arr_t, axes=axes: DHT(arr_t, inverse=False, axes=axes),
+            flops=flops,
+            nbytes=_nbytes(arr_t) + helpers.product(coord_shape) * arr_t.dtype.itemsize))
+    return benchmarks
+
+
+def cbrng_suite(double=False):
+    """
+    Generation of uniformly and normally distributed random numbers.
+    """
+    rtype, _ = _dtypes(double)
+    benchmarks = []
+    for distribution in ('uniform_float', 'normal_bm'):
+        for shape in [(2 ** 6, 2 ** 15), (2 ** 12, 2 ** 10)]:
+            arr_t = Type(rtype, shape=shape)
+            benchmarks.append(Benchmark(
+                'CBRNG', _type_params(shape, rtype, distribution=distribution),
+                lambda arr_t=arr_t, distribution=distribution:
+                    getattr(CBRNG, distribution)(arr_t, 1),
+                nbytes=_nbytes(arr_t)))
+    return benchmarks
+
+
+def pureparallel_suite(double=False):
+    """
+    An element-wise multiply-add of two arrays
+    (mostly limited by the memory bandwidth).
+    """
+    rtype, _ = _dtypes(double)
+    benchmarks = []
+    for shape in [(2 ** 22,), (2048, 2048), (1000, 1000), (64, 256, 256)]:
+        arr_t = Type(rtype, shape=shape)
+        benchmarks.append(Benchmark(
+            'PureParallel', _type_params(shape, rtype),
+            lambda arr_t=arr_t: PureParallel(
+                [
+                    Parameter('output', Annotation(arr_t, 'o')),
+                    Parameter('a', Annotation(arr_t, 'i')),
+                    Parameter('b', Annotation(arr_t, 'i'))],
+                """
+                ${a.ctype} t1 = ${a.load_idx}(${idxs.all()});
+                ${b.ctype} t2 = ${b.load_idx}(${idxs.all()});
+                ${output.store_idx}(${idxs.all()}, t1 * t2 + t1);
+                """),
+            flops=helpers.product(shape) * 2,
+            nbytes=_nbytes(arr_t) * 3))
+    return benchmarks
+
+
+SUITES = dict(
+    FFT=fft_suite,
+    FFTShift=fftshift_suite,
+    Reduce=reduce_suite,
+    Transpose=transpose_suite,
+    MatrixMul=matrixmul_suite,
+    DHT=dht_suite,
+    CBRNG=cbrng_suite,
+    PureParallel=pureparallel_suite)
@@ -26,6 +26,26 @@
 
         The :py:class:`Thread` object for which the array was created.
 
+.. py:class:: Event
+
+    An object marking the completion of the operations enqueued before it
+    (wraps ``pyopencl.Event`` for ``OpenCL`` and ``pycuda.driver.Event`` for ``CUDA``).
+
+    .. py:method:: wait()
+
+        Blocks until the operations are finished.
+
+    .. py:method:: done()
+
+        Returns ``True`` if the operations are finished.
+
+    .. py:method:: time_till(event)
+
+        Returns the time (in seconds) between the completion of this event
+        and the completion of a later ``event`` from the same queue.
+        Both events must be finished.
+        In ``OpenCL``, requires the queue to be created with profiling enabled.
+
 .. py:class:: DeviceParameters(device)
 
     An assembly of device parameters necessary for optimizations.
@@ -62,6 +82,36 @@
         Dictionary ``{word_size:elements}``, where ``elements`` is the number of elements
         with size ``word_size`` in global memory that allow coalesced access.
 
+    .. py:attribute:: max_threads_per_compute_unit
+
+        Maximum number of threads that can be active simultaneously on a compute unit
+        (multiprocessor in CUDA), or ``None`` if it is unknown.
+
+    .. py:attribute:: max_groups_per_compute_unit
+
+        Maximum number of work groups that can be active simultaneously on a compute unit,
+        or ``None`` if it is unknown.
+
+    .. py:attribute:: registers_per_compute_unit
+
+        Number of 32-bit registers available to the threads of a compute unit,
+        or ``None`` if it is unknown.
+
+    .. py:attribute:: local_mem_per_compute_unit
+
+        Size of the local (shared in CUDA) memory available to the work groups of a compute unit,
+        in bytes, or ``None`` if it is unknown.
+
+    .. py:attribute:: mem_base_addr_align
+
+        Required alignment (in bytes) of the beginning of a sub-region of a buffer.
+
+    .. py:attribute:: launch_latency
+
+        The time (in seconds) it takes to launch an empty kernel and wait for its completion,
+        or ``None`` if it was not measured (see the ``characterization`` parameter
+        of :py:class:`Thread`).
+
     .. py:method:: supports_dtype(self, dtype)
 
         Checks if given ``numpy`` dtype can be used in kernels compiled using this thread.
@@ -88,18 +138,36 @@
 """
 
 from __future__ import print_function
-from logging import error
+from logging import error, warning
+from collections import OrderedDict
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
 import weakref
 import sys
+import re
+import time
+
+import numpy
 
 from reikna.cluda import find_devices
-from reikna.helpers import product
-from reikna.cluda.kernel import render_prelude, render_template_source
+from reikna.helpers import product, wrap_in_tuple
+from reikna.cluda.kernel import render_prelude, render_template_source, render_template_sources
 from reikna.cluda.vsize import VirtualSizes
 from reikna.cluda.tempalloc import ZeroOffsetManager
+from reikna.cluda.mempool import SizeClassPool, HostSizeClassPool
+from reikna.cluda.poller import EventPoller
+from reikna.cluda.profiler import Profiler, template_name
+from reikna.cluda.binary_cache import BinaryCache
+from reikna.cluda.characterization import CharacterizationDatabase, characterize
 
 _input = input if sys.version_info[0] >= 3 else raw_input
 
+# Patterns for the names defined in a kernel source outside of modules.
+_FUNCTION_DEFINITION = re.compile(r"WITHIN_KERNEL\b[^;{}()]*?(?<!\w)(\w+)\s*\(")
+_TYPEDEF = re.compile(r"\btypedef\b")
+_TYPEDEF_NAME = re.compile(r"(\w+)\s*(?:\[[^\]]*\]\s*)*$")
+_MACRO_DEFINITION = re.compile(r"^[ \t]*#[ \t]*define[ \t]+(\w+)", re.MULTILINE)
+
 
 def get_id():
     """
@@ -116,6 +184,60 @@ def get_platforms():
     raise NotImplementedError()
 
 
+def _typedef_names(src):
+    """
+    Returns the names of the types defined by ``typedef`` in ``src``
+    (including the ones with a structure body, e.g. ``typedef struct { ... } name;``).
+    """
+    names = []
+    for match in _TYPEDEF.finditer(src):
+        # Looking for the end of the definition, skipping the (possibly nested) braces
+        depth = 0
+        for end in range(match.end(), len(src)):
+            if src[end] == '{':
+                depth += 1
+            elif src[end] == '}':
+                depth -= 1
+            elif src[end] == ';' and depth == 0:
+                break
+        else:
+            continue
+
+        # The name is the last identifier of the declarator (possibly followed by array sizes)
+        declarator = src[match.end():end]
+        name_match = _TYPEDEF_NAME.search(declarator)
+        if name_match is not None:
+            names.append(name_match.group(1))
+    return names
+
+
+def _isolated_section(src, prefix, kernel_name):
+    """
+    Wraps the source of a single kernel so that several such sections
+    can be placed in one program:
+    the kernel, functions and types defined in it get names starting with ``prefix``,
+    and macros defined in it are undefined at the end of the section
+    (unless they were defined before it, e.g. by the compiler).
+    Modules are not affected, since their names are already unique within a program.
+    """
+    renamed = set(_FUNCTION_DEFINITION.findall(src))
+    renamed.update(_typedef_names(src))
+    renamed.add(kernel_name)
+    macros = set(_MACRO_DEFINITION.findall(src)) - renamed
+
+    header = []
+    footer = []
+    for name in sorted(renamed):
+        header.append("#define {name} {prefix}{name}".format(name=name, prefix=prefix))
+        footer.append("#undef " + name)
+    for name in sorted(macros):
+        marker = prefix + name + "_PREDEFINED"
+        header += ["#ifdef " + name, "#define " + marker, "#endif"]
+        footer += ["#ifndef " + marker, "#undef " + name, "#endif", "#undef " + marker]
+
+    return "\n".join(header + [src] + footer)
+
+
 class Thread:
     """
     Wraps an existing context in the CLUDA thread object.
@@ -124,6 +246,39 @@ class Thread:
         If a context is passed, a new stream/queue will be created internally.
     :param async: whether to execute all operations with this thread asynchronously
         (you would generally want to set it to ``False`` only for profiling purposes).
+    :param temp_alloc: a dictionary with the ``cls`` key containing
+        a :py:class:`~reikna.cluda.tempalloc.TemporaryManager` subclass
+        (:py:class:`~reikna.cluda.tempalloc.ZeroOffsetManager` by default)
+        and the keyword arguments for its constructor.
+    :param mem_pool: if ``True``, the memory for the arrays and buffers of this thread
+        is taken from a :py:class:`~reikna.cluda.mempool.SizeClassPool`;
+        can also be a dictionary with the ``cls`` key containing
+        a :py:class:`~reikna.cluda.mempool.MemoryPool` subclass
+        (:py:class:`~reikna.cluda.mempool.SizeClassPool` by default)
+        and the keyword arguments for its constructor.
+        If ``None``, every allocation is requested from the driver.
+    :param host_pool: same as ``mem_pool``, but for the page-locked host memory
+        allocated by :py:meth:`host_array`
+        (with :py:class:`~reikna.cluda.mempool.HostSizeClassPool` as the default class).
+    :param profile: if ``True``, the execution times of kernel launches and transfers
+        are collected by a :py:class:`~reikna.cluda.profiler.Profiler` object
+        (the queue is created with profiling enabled in ``OpenCL``;
+        if a ``CommandQueue`` is passed, it must have profiling enabled too).
+    :param binary_cache: if ``True``, compiled programs will be saved in and loaded from
+        the default :py:class:`~reikna.cluda.binary_cache.BinaryCache`;
+        if it is a string, it is used as the path to the cache directory;
+        can also be a :py:class:`~reikna.cluda.binary_cache.BinaryCache` object.
+        If ``None``, the programs are compiled every time.
+    :param characterization: if ``True``, the device parameters the driver does not report
+        (and which are guessed otherwise) are measured by microbenchmarks
+        (see :py:func:`~reikna.cluda.characterization.characterize`)
+        when the thread is created for a device for the first time,
+        and saved in the default
+        :py:class:`~reikna.cluda.characterization.CharacterizationDatabase`
+        to be used by the subsequent threads;
+        if it is a string, it is used as the path to the database directory;
+        can also be a :py:class:`~reikna.cluda.characterization.CharacterizationDatabase` object.
+        If ``None``, the guessed values are used.
 
     .. note::
         If you are using ``CUDA`` API, you must keep in mind the stateful nature of CUDA calls.
@@ -152,8 +307,28 @@ class Thread:
 
         Instance of :py:class:`~reikna.cluda.tempalloc.TemporaryManager`
         which handles allocations of temporary arrays (see :py:meth:`temp_array`).
+
+    .. py:attribute:: mem_pool
+
+        Instance of :py:class:`~reikna.cluda.mempool.MemoryPool` or ``None``.
+
+    .. py:attribute:: host_pool
+
+        Instance of :py:class:`~reikna.cluda.mempool.MemoryPool` or ``None``.
+
+    .. py:attribute:: profiler
+
+        Instance of :py:class:`~reikna.cluda.profiler.Profiler` or ``None``.
+
+    .. py:attribute:: binary_cache
+
+        Instance of :py:class:`~reikna.cluda.binary_cache.BinaryCache` or ``None``.
     """
 
+    # The exception raised by the backend when a program fails to build
+    # (overridden by a specific ``Thread``).
+    _build_error = Exception
+
     @classmethod
     def create(cls, interactive=False, device_filters=None, gpu_id=0, **thread_kwds):
         """
@@ -221,40 +396,140 @@ class Thread:
             thread_kwds = {}
         return cls(platforms[selected_pnum].get_devices()[selected_dnum], **thread_kwds)
 
-    def __init__(self, cqd, async=True, temp_alloc=None):
+    def __init__(self, cqd, async=True, temp_alloc=None, mem_pool=None, host_pool=None,
+            profile=False, binary_cache=None, characterization=None):
 
         self._released = False
         self._async = async
+        self._profile = profile
 
         # Make the fields initialized even in case _prcess_cqd() raises an exception.
         self._context = None
         self._queue = None
         self._device = None
         self._owns_context = False
+        self.mem_pool = None
+        self.host_pool = None
+        self._parent = None # set for the threads created by fork()
+        self._family = weakref.WeakSet([self])
+        self._poller = None
+        self.profiler = None
         self._context, self._queue, self._device, self._owns_context = self._process_cqd(cqd)
 
         self.device_params = self.api.DeviceParameters(self._device)
 
+        if binary_cache is True:
+            self.binary_cache = BinaryCache()
+        elif isinstance(binary_cache, str):
+            self.binary_cache = BinaryCache(binary_cache)
+        else:
+            self.binary_cache = binary_cache
+
+        # Done before the creation of the profiler and the pools,
+        # so that the microbenchmarks do not leave any traces in them.
+        if characterization is not None:
+            self._characterize(characterization)
+
+        if profile:
+            self.profiler = Profiler(self)
+
+        self.mem_pool = self._create_pool(mem_pool, SizeClassPool)
+        self.host_pool = self._create_pool(host_pool, HostSizeClassPool)
+
         temp_alloc_params = dict(
             cls=ZeroOffsetManager, pack_on_alloc=False, pack_on_free=False)
         if temp_alloc is not None:
             temp_alloc_params.update(temp_alloc)
 
-        self.temp_alloc = temp_alloc_params['cls'](weakref.proxy(self),
-            pack_on_alloc=temp_alloc_params['pack_on_alloc'],
-            pack_on_free=temp_alloc_params['pack_on_free'])
+        # Other parameters are passed to the manager constructor
+        temp_alloc_cls = temp_alloc_params.pop('cls')
+        self.temp_alloc = temp_alloc_cls(weakref.proxy(self), **temp_alloc_params)
+
+    def _characterize(self, characterization):
+        if characterization is True:
+            database = CharacterizationDatabase()
+        elif isinstance(characterization, str):
+            database = CharacterizationDatabase(characterization)
+        else:
+            database = characterization
+
+        # Only the parameters the backend could not query are replaced.
+        names = list(self.device_params._guessed) + ['launch_latency']
+
+        fingerprint = self._device_fingerprint()
+        params = database.get(fingerprint)
+        if params is None or any(name not in params for name in names):
+            params = characterize(self, parameters=names)
+            database.put(fingerprint, params)
+
+        for name in names:
+            if params[name] is not None:
+                setattr(self.device_params, name, params[name])
+
+    def _create_pool(self, pool, default_cls):
+        if pool is None:
+            return None
+
+        pool_params = dict(cls=default_cls)
+        if pool is not True:
+            pool_params.update(pool)
+        pool_cls = pool_params.pop('cls')
+        return pool_cls(weakref.proxy(self), **pool_params)
 
     def allocate(self, size):
         """
         Creates an untyped memory allocation object of type :py:class:`Buffer` with size ``size``.
+        If the thread has a memory pool, the allocation is taken from it.
+        """
+        if self.mem_pool is None:
+            return self._allocate_buffer(size)
+        else:
+            return self.mem_pool.allocate(size)
+
+    def _allocate_buffer(self, size):
+        """
+        Requests a new allocation of ``size`` bytes from the driver.
         """
         raise NotImplementedError()
 
+    def _alias_buffer(self, buf):
+        """
+        Returns a new buffer object referring to the same memory as ``buf``.
+        """
+        raise NotImplementedError()
+
+    def _allocate_host_buffer(self, size):
+        """
+        Requests a new page-locked host allocation of ``size`` bytes from the driver,
+        returning it as a ``numpy.ndarray`` of ``uint8``.
+        """
+        raise NotImplementedError()
+
+    def host_array(self, shape, dtype):
+        """
+        Creates a ``numpy.ndarray`` with given ``shape`` and ``dtype``
+        in the page-locked (pinned) host memory.
+        Transfers between such arrays and the device can be performed asynchronously
+        (see the ``event`` parameter of :py:meth:`to_device` and :py:meth:`from_device`).
+        If the thread has a host memory pool, the allocation is taken from it.
+        """
+        dtype = numpy.dtype(dtype)
+        shape = wrap_in_tuple(shape)
+        nbytes = product(shape) * dtype.itemsize
+
+        if self.host_pool is None:
+            buf = self._allocate_host_buffer(nbytes)
+        else:
+            buf = numpy.asarray(self.host_pool.allocate(nbytes))
+
+        return buf[:nbytes].view(dtype).reshape(shape)
+
     def array(self, shape, dtype, strides=None, allocator=None):
         """
         Creates an :py:class:`Array` on GPU with given ``shape``, ``dtype`` and ``strides``.
         Optionally, an ``allocator`` is a callable returning any object castable to ``int``
         representing the physical address on the device (for instance, :py:class:`Buffer`).
+        If it is not given, the memory is obtained via :py:meth:`allocate`.
         """
         raise NotImplementedError()
 
@@ -268,7 +543,18 @@ class Thread:
         For a list of values ``dependencies`` takes, see the reference entry for
         :py:class:`~reikna.cluda.tempalloc.TemporaryManager`.
         """
-        return self.temp_alloc.array(shape, dtype, strides=strides, dependencies=dependencies)
+        return self.temp_alloc.array(
+            shape, dtype, strides=strides, dependencies=dependencies, thread=self)
+
+    def temp_arrays(self, requests):
+        """
+        Creates a list of temporary arrays used by a sequence of kernel calls.
+        Arrays will not overlap if the kernel index ranges
+        during which their contents has to be preserved overlap.
+        For the format of ``requests``, see the reference entry for
+        :py:meth:`~reikna.cluda.tempalloc.TemporaryManager.arrays`.
+        """
+        return self.temp_alloc.arrays(requests, thread=self)
 
     def empty_like(self, arr):
         """
@@ -280,32 +566,140 @@ class Thread:
             allocator = None
         return self.array(arr.shape, arr.dtype, strides=arr.strides, allocator=allocator)
 
-    def to_device(self, arr, dest=None):
+    def to_device(self, arr, dest=None, event=False):
         """
         Copies an array to the device memory.
         If ``dest`` is specified, it is used as the destination, and the method returns ``None``.
         Otherwise the destination array is created internally and returned from the method.
+
+        If ``event`` is ``True``, the transfer is asynchronous
+        (the thread-wide asynchronisity setting does not apply here),
+        and an :py:class:`Event` marking its completion is returned
+        (instead of ``None``, or along with the destination array as a tuple).
+        ``arr`` must not be modified until the transfer is finished.
+        The transfer can overlap with the kernel execution only if ``arr``
+        was created by :py:meth:`host_array`.
         """
         if dest is None:
             arr_device = self.empty_like(arr)
         else:
             arr_device = dest
 
-        self._copy_array(arr_device, arr)
+        start = self._profile_start()
+        self._copy_array(arr_device, arr, async=event)
+        self._profile_end(start, 'to_device', nbytes=arr.nbytes)
+
+        if event:
+            result_event = self.record_event()
+            return result_event if dest is not None else (arr_device, result_event)
+
         self._synchronize()
 
         if dest is None:
             return arr_device
 
-    def from_device(self, arr, dest=None, async=False):
+    def from_device(self, arr, dest=None, async=False, event=False):
         """
         Transfers the contents of ``arr`` to a ``numpy.ndarray`` object.
         The effect of ``dest`` parameter is the same as in :py:meth:`to_device`.
         If ``async`` is ``True``, the transfer is asynchronous
         (the thread-wide asynchronisity setting does not apply here).
 
+        If ``event`` is ``True``, the transfer is asynchronous,
+        and an :py:class:`Event` marking its completion is returned
+        (instead of ``None``, or along with the destination array as a tuple).
+        In this case the destination array is created by :py:meth:`host_array`,
+        so that the transfer could overlap with the kernel execution.
+
         Alternatively, one can use :py:meth:`Array.get`.
         """
+        if event:
+            arr_cpu = self.host_array(arr.shape, arr.dtype) if dest is None else dest
+            start = self._profile_start()
+            self._from_device(arr, arr_cpu, True)
+            self._profile_end(start, 'from_device', nbytes=arr.nbytes)
+            result_event = self.record_event()
+            return result_event if dest is not None else (arr_cpu, result_event)
+
+        start = self._profile_start()
+        arr_cpu = self._from_device(arr, dest, async)
+        self._profile_end(start, 'from_device', nbytes=arr.nbytes)
+        if dest is None:
+            return arr_cpu
+
+    def to_device_async(self, arr, dest=None):
+        """
+        Same as :py:meth:`to_device` with ``event=True``, but returns an ``asyncio`` future
+        (bound to the running event loop), resolved with the destination array
+        (or ``None``, if ``dest`` is given) when the transfer is finished.
+        The event loop is not blocked while waiting for the device.
+        """
+        if dest is None:
+            arr_device, event = self.to_device(arr, event=True)
+        else:
+            arr_device = None
+            event = self.to_device(arr, dest=dest, event=True)
+        return self._event_future(event, result=arr_device, keep_alive=arr)
+
+    def from_device_async(self, arr, dest=None):
+        """
+        Same as :py:meth:`from_device` with ``event=True``, but returns an ``asyncio`` future
+        (bound to the running event loop), resolved with the destination array
+        (or ``None``, if ``dest`` is given) when the transfer is finished.
+        The event loop is not blocked while waiting for the device.
+        """
+        if dest is None:
+            arr_cpu, event = self.from_device(arr, event=True)
+        else:
+            arr_cpu = None
+            event = self.from_device(arr, dest=dest, event=True)
+        return self._event_future(event, result=arr_cpu, keep_alive=arr)
+
+    def _event_future(self, event, result=None, keep_alive=None):
+        """
+        Returns an ``asyncio`` future resolved with ``result`` when ``event`` is completed
+        (see :py:meth:`~reikna.cluda.poller.EventPoller.future`).
+        """
+        if self._poller is None:
+            self._poller = EventPoller(weakref.proxy(self))
+        return self._poller.future(event, result=result, keep_alive=keep_alive)
+
+    def _wait_in_worker(self, event):
+        """
+        Waits for ``event`` in a worker thread.
+        Overridden by a specific ``Thread`` if it needs to set up the worker thread first.
+        """
+        event.wait()
+
+    def _from_device(self, arr, dest, async):
+        """
+        Transfers the contents of ``arr`` to ``dest`` (or to a new array, if it is ``None``),
+        and returns the destination array.
+        """
+        raise NotImplementedError()
+
+    def _profile_start(self):
+        return None if self.profiler is None else self.record_event()
+
+    def _profile_end(self, start, name, **info):
+        if start is not None:
+            info['name'] = name
+            self.profiler._add(self, 'transfer', start, self.record_event(), info)
+
+    def record_event(self):
+        """
+        Returns an :py:class:`Event` marking the completion
+        of all the operations enqueued in this thread so far.
+        """
+        raise NotImplementedError()
+
+    def wait_for(self, *events):
+        """
+        Makes all the operations enqueued in this thread after this call
+        wait for the completion of ``events``
+        (:py:class:`Event` objects, possibly recorded in other threads of the same context,
+        see :py:meth:`fork`), without blocking the host.
+        """
         raise NotImplementedError()
 
     def copy_array(self, arr, dest=None, src_offset=0, dest_offset=0, size=None):
@@ -328,8 +722,10 @@ class Thread:
         src_offset *= itemsize
         dest_offset *= itemsize
 
+        start = self._profile_start()
         self._copy_array_buffer(arr_device, arr,
             nbytes, src_offset=src_offset, dest_offset=dest_offset)
+        self._profile_end(start, 'copy_array', nbytes=nbytes)
         self._synchronize()
 
         if dest is None:
@@ -345,12 +741,99 @@ class Thread:
         if not self._async:
             self.synchronize()
 
-    def _create_program(self, src, fast_math=False):
+    def fork(self):
+        """
+        Creates a new :py:class:`Thread` with the same context and device, but a different queue,
+        sharing the temporary array manager, the memory pools and the binary cache with this one.
+        The operations in different queues can be executed concurrently;
+        use :py:meth:`record_event` and :py:meth:`wait_for` to order them if necessary.
+        Temporary arrays created in different threads of the same family
+        never share memory, and the allocations returned to the pools
+        are only reused after all the operations enqueued before their release are finished.
+        """
+        # Making sure that the allocations held by the pools
+        # are not used by any operations in this queue.
+        self.synchronize()
+
+        thr = type(self)(self._fork_cqd(), async=self._async, profile=self._profile)
+        thr._context = self._context
+        thr._parent = self # the context and the shared objects belong to the parent
+        thr._family = self._family
+        self._family.add(thr)
+
+        thr.temp_alloc = self.temp_alloc
+        thr.mem_pool = self.mem_pool
+        thr.host_pool = self.host_pool
+        thr.binary_cache = self.binary_cache
+        thr.profiler = self.profiler
+        thr.device_params = self.device_params
+
+        return thr
+
+    def _fork_cqd(self):
+        """
+        Returns a new queue in the context of this thread.
+        """
+        raise NotImplementedError()
+
+    def _family_events(self, always=False):
+        """
+        Returns a list of events marking the completion of the operations enqueued so far
+        in all the threads created by :py:meth:`fork` from the same thread
+        (or an empty list if there is only one such thread and ``always`` is ``False``).
+        """
+        family = [thr for thr in self._family if not thr._released]
+        if len(family) < 2 and not always:
+            return []
+        return [thr.record_event() for thr in family]
+
+    def _synchronize_family(self):
+        """
+        Synchronizes all the threads created by :py:meth:`fork` from the same thread.
+        """
+        for thr in list(self._family):
+            if not thr._released:
+                thr.synchronize()
+
+    def _device_fingerprint(self):
+        """
+        Returns a string identifying the device and the driver (used as a part of cache keys).
+        """
+        raise NotImplementedError()
+
+    def _compile_options(self, fast_math=False):
+        """
+        Returns a string with the compiler options (used as a part of cache keys).
+        """
+        raise NotImplementedError()
+
+    def _compile_cached(self, src, fast_math=False):
+        cache = self.binary_cache
+        key = cache.key(src, self._compile_options(fast_math=fast_math), self._device_fingerprint())
+
+        binary = cache.get(key)
+        if binary is not None:
+            try:
+                return self._program_from_binary(binary, fast_math=fast_math)
+            except Exception:
+                # The entry may be corrupted, or the driver may refuse to load it.
+                # In any case, the program can be rebuilt from scratch.
+                cache.reject(key)
+
+        program, binary = self._compile_with_binary(src, fast_math=fast_math)
+        cache.put(key, binary)
+        return program
+
+    def _create_program(self, src, fast_math=False, log_errors=True):
         try:
-            program = self._compile(src, fast_math=fast_math)
+            if self.binary_cache is None:
+                program = self._compile(src, fast_math=fast_math)
+            else:
+                program = self._compile_cached(src, fast_math=fast_math)
         except:
-            listing = "\n".join([str(i+1) + ":" + l for i, l in enumerate(src.split('\n'))])
-            error("Failed to compile:\n" + listing)
+            if log_errors:
+                listing = "\n".join([str(i+1) + ":" + l for i, l in enumerate(src.split('\n'))])
+                error("Failed to compile:\n" + listing)
             raise
         return program
 
@@ -364,12 +847,18 @@ class Thread:
         :param fast_math: whether to enable fast mathematical operations during compilation.
         :returns: a :py:class:`Program` object.
         """
+        t1 = time.time()
         src = render_template_source(
             template_src, render_args=render_args, render_kwds=render_kwds)
-        return Program(self, src, fast_math=fast_math)
+        render_time = time.time() - t1
+
+        program = Program(self, src, fast_math=fast_math)
+        program.render_time = render_time
+        program.template = template_name(template_src)
+        return program
 
     def compile_static(self, template_src, name, global_size,
-            local_size=None, render_args=None, render_kwds=None, fast_math=False):
+            local_size=None, render_args=None, render_kwds=None, fast_math=False, build=True):
         """
         Creates a kernel object with fixed call sizes,
         which allows to overcome some backend limitations.
@@ -391,11 +880,155 @@ class Thread:
         :param render_kwds: a dictionary with additional parameters
             to be used while rendering the template.
         :param fast_math: whether to enable fast mathematical operations during compilation.
+        :param build: if ``False``, only the call sizes are checked;
+            the template is not rendered and the program is not built
+            until :py:meth:`StaticKernel.build` is called
+            (or the kernel is passed to :py:meth:`build_static_kernels`).
         :returns: a :py:class:`StaticKernel` object.
         """
         return StaticKernel(self, template_src, name, global_size,
             local_size=local_size, render_args=render_args, render_kwds=render_kwds,
-            fast_math=fast_math)
+            fast_math=fast_math, build=build)
+
+    def build_static_kernels(self, kernels, num_workers=None, merge=False):
+        """
+        Builds several :py:class:`StaticKernel` objects created with ``build=False``
+        using a pool of threads (backend compilers release the GIL,
+        so the builds are performed in parallel).
+        If any of the builds raises an exception, it is propagated to the caller.
+
+        :param kernels: a list of :py:class:`StaticKernel` objects.
+        :param num_workers: the number of threads to use.
+            If ``None``, the number of CPUs in the system is used.
+        :param merge: if ``True``, the kernels are first placed in a single program
+            (with the prelude and identical modules included only once),
+            which is built with a single compiler invocation.
+            Kernels that could not be built this way (because of name conflicts
+            between their sources, or because of the resource limits)
+            are built separately.
+        """
+        kernels = [kernel for kernel in kernels if not kernel.built]
+        if merge and len(kernels) > 1:
+            kernels = self._build_merged(kernels)
+
+        # Rendering is not thread-safe, so it has to be done before starting the workers.
+        for kernel in kernels:
+            kernel._render()
+
+        if num_workers is None:
+            num_workers = cpu_count()
+        num_workers = min(num_workers, len(kernels))
+
+        if num_workers <= 1 or not self._parallel_build_supported():
+            for kernel in kernels:
+                kernel.build()
+            return
+
+        pool = ThreadPool(num_workers)
+        try:
+            pool.map(self._build_in_worker, kernels, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _build_merged(self, kernels):
+        """
+        Builds kernels in a single program (one for each value of ``fast_math``).
+        Returns the list of kernels that have to be built separately.
+        """
+        groups = OrderedDict()
+        for kernel in kernels:
+            groups.setdefault(kernel._fast_math, []).append(kernel)
+
+        remaining = []
+        for fast_math, group in groups.items():
+            if len(group) == 1:
+                remaining += group
+                continue
+
+            modules_src, main_srcs = render_template_sources(
+                [kernel._render_request() for kernel in group])
+
+            vss = [kernel._initial_vs for kernel in group]
+            try:
+                program, kernel_objs = self._build_merged_program(
+                    group, modules_src, main_srcs, vss, fast_math)
+            except self._build_error as e:
+                # Kernel sources may define some objects (e.g. constant arrays)
+                # with the same names, in which case they have to be built separately.
+                warning(
+                    "Failed to build " + str(len(group)) + " kernels in a single program, "
+                    "building them separately (" + str(e).strip().split("\n")[0] + ")")
+                remaining += group
+                continue
+
+            # Now that the resource usage of each kernel is known,
+            # pick the local sizes with a better occupancy.
+            # A different local size requires different virtual size functions,
+            # so the program is rebuilt, but only once for the whole group.
+            occupancy_vss = [
+                kernel._occupancy_vs(kernel_obj, vs)
+                for kernel, kernel_obj, vs in zip(group, kernel_objs, vss)]
+            if any(vs is not None for vs in occupancy_vss):
+                new_vss = [
+                    vs if occupancy_vs is None else occupancy_vs
+                    for vs, occupancy_vs in zip(vss, occupancy_vss)]
+                try:
+                    program, kernel_objs = self._build_merged_program(
+                        group, modules_src, main_srcs, new_vss, fast_math,
+                        build_time=program.build_time)
+                    vss = new_vss
+                except self._build_error:
+                    # Should not normally happen, since only the virtual size functions changed.
+                    # The first program is still usable.
+                    pass
+
+            for kernel, kernel_obj, vs in zip(group, kernel_objs, vss):
+                if not kernel._use_program(program, kernel_obj, vs):
+                    remaining.append(kernel)
+
+        return remaining
+
+    def _build_merged_program(
+            self, kernels, modules_src, main_srcs, vss, fast_math, build_time=0):
+        """
+        Builds a single program containing ``kernels`` with the virtual sizes ``vss``.
+        Returns the program and the list of the corresponding kernel objects.
+        """
+        names = []
+        sections = []
+        for i, (kernel, main_src, vs) in enumerate(zip(kernels, main_srcs, vss)):
+            prefix = "_kernel" + str(i) + "_"
+            names.append(prefix + kernel._name)
+            sections.append(_isolated_section(vs.vsize_functions + main_src, prefix, kernel._name))
+
+        program = Program(
+            self, modules_src + "\n\n" + "\n\n".join(sections),
+            static=True, fast_math=fast_math, log_errors=False)
+        program.build_time += build_time
+        return program, [getattr(program, name) for name in names]
+
+    def _parallel_build_supported(self):
+        """
+        Overridden by a specific ``Thread`` if programs cannot be built in worker threads.
+        """
+        return True
+
+    def _build_in_worker(self, kernel):
+        """
+        Builds a :py:class:`StaticKernel` in a worker thread.
+        Overridden by a specific ``Thread`` if it needs to set up the worker thread first.
+        """
+        kernel.build()
+
+    def _call_current(self, func):
+        """
+        Calls ``func`` (without arguments) with this thread being the current one
+        in the calling host thread, and returns its result.
+        Overridden by a specific ``Thread`` if several threads can be current
+        at different times (e.g. the ones having different ``CUDA`` contexts).
+        """
+        return func()
 
     def _release_specific(self):
         """
@@ -418,6 +1051,15 @@ class Thread:
         # stupid stateful contexts), I'll leave at is it is for now.
 
         if not self._released:
+            # Waits for the pending events, since the poller needs the context to do that.
+            if self._poller is not None:
+                self._poller.stop()
+            # The pools of a forked thread belong to its parent,
+            # and are still used by the other threads of the family.
+            if self._parent is None:
+                for pool in (self.mem_pool, self.host_pool):
+                    if pool is not None:
+                        pool.trim()
             self._release_specific()
             del self._device
             del self._queue
@@ -438,7 +1080,7 @@ class Program(object):
         Contains :py:class:`Kernel` object for the kernel ``kernel_name``.
     """
 
-    def __init__(self, thr, src, static=False, fast_math=False):
+    def __init__(self, thr, src, static=False, fast_math=False, log_errors=True):
         """__init__()""" # hide the signature from Sphinx
 
         self._thr = thr
@@ -450,10 +1092,19 @@ class Program(object):
         # New versions of Mako produce Unicode output by default,
         # and it makes the compiler unhappy
         self.source = str(prelude + src)
-        self._program = thr._create_program(self.source, fast_math=fast_math)
+        self.render_time = None
+        self.template = None
+
+        t1 = time.time()
+        self._program = thr._create_program(
+            self.source, fast_math=fast_math, log_errors=log_errors)
+        self.build_time = time.time() - t1
 
     def __getattr__(self, name):
-        return self._thr.api.Kernel(self._thr, self._program, name, static=self._static)
+        kernel = self._thr.api.Kernel(self._thr, self._program, name, static=self._static)
+        kernel._profile_info.update(
+            template=self.template, render_time=self.render_time, build_time=self.build_time)
+        return kernel
 
 
 class Kernel:
@@ -463,6 +1114,15 @@ class Kernel:
     .. py:attribute:: max_work_group_size
 
         Maximum size of the work group for the kernel.
+
+    .. py:attribute:: registers
+
+        Number of registers used by each thread of the kernel, or ``None`` if it is unknown.
+
+    .. py:attribute:: local_mem
+
+        Amount of statically allocated local memory used by the kernel (in bytes),
+        or ``None`` if it is unknown.
     """
 
     def __init__(self, thr, program, name, static=False):
@@ -474,6 +1134,19 @@ class Kernel:
         self._static = static
         self._fill_attributes()
 
+        # Additional information for the profiler records
+        self._profile_info = dict(
+            name=name, template=None, global_size=None, local_size=None,
+            render_time=None, build_time=None)
+        if thr.profiler is not None:
+            self.prepared_call = self._profiled_call
+
+    def _profiled_call(self, *args):
+        start = self._thr.record_event()
+        type(self).prepared_call(self, *args)
+        self._thr.profiler._add(
+            self._thr, 'kernel', start, self._thr.record_event(), self._profile_info)
+
     def prepare(self, global_size, local_size=None, local_mem=0):
         """
         Prepare the kernel for execution with given parameters.
@@ -506,6 +1179,8 @@ class Kernel:
             else:
                 raise TypeError("global_size keyword argument must be set")
             self.prepare(*prep_args, **kwds)
+            self._profile_info.update(
+                global_size=wrap_in_tuple(prep_args[0]), local_size=kwds.get('local_size'))
 
         self.prepared_call(*args)
 
@@ -517,45 +1192,149 @@ class StaticKernel:
     .. py:attribute:: source
 
         Contains the source code of the program.
+
+    .. py:attribute:: built
+
+        ``True`` if the program has already been built.
+
+    .. py:method:: prepared_call(*args)
+
+        Execute the kernel without any additional processing of the arguments
+        (available after the program is built).
+        Has the same effect as :py:meth:`__call__`, but saves a couple of Python function calls.
     """
 
     def __init__(self, thr, template_src, name, global_size, local_size=None,
-            render_args=None, render_kwds=None, fast_math=False):
+            render_args=None, render_kwds=None, fast_math=False, build=True):
         """__init__()""" # hide the signature from Sphinx
 
         self._thr = thr
+        self._name = name
+        self._fast_math = fast_math
+        self._requested_global_size = global_size
+        self._requested_local_size = local_size
+        self.built = False
 
         if render_args is None:
             render_args = []
         if render_kwds is None:
             render_kwds = {}
 
-        main_src = render_template_source(
-            template_src, render_args=render_args, render_kwds=render_kwds)
+        self._template_src = template_src
+        self._render_args = render_args
+        self._render_kwds = render_kwds
+        self._main_src = None
+        self._render_time = None
+        self._build_time = 0
+
+        # Try to find kernel launch parameters for the requested local size.
+        # May raise OutOfResourcesError if it's not possible,
+        # just let it pass to the caller.
+        # This is done before building the program, so that deferred kernels
+        # report unsupported call sizes to the caller right away.
+        self._initial_vs = self._virtual_sizes(thr.device_params.max_work_group_size)
+
+        if build:
+            self.build()
+
+    def _virtual_sizes(self, max_local_size, kernel=None):
+        return VirtualSizes(
+            self._thr.device_params, self._requested_global_size,
+            virtual_local_size=self._requested_local_size,
+            max_local_size=max_local_size,
+            registers=None if kernel is None else kernel.registers,
+            local_mem=None if kernel is None else kernel.local_mem)
+
+    def _occupancy_vs(self, kernel, vs):
+        """
+        Returns the virtual sizes with the local size picked based on the resource usage
+        of the built ``kernel``, or ``None`` if they are the same as ``vs``
+        (or the local size was requested explicitly).
+        """
+        if self._requested_local_size is not None:
+            return None
+
+        new_vs = self._virtual_sizes(
+            min(kernel.max_work_group_size, product(vs.real_local_size)), kernel=kernel)
+        if new_vs.real_local_size == vs.real_local_size:
+            return None
+        else:
+            return new_vs
+
+    def _render_request(self):
+        return self._template_src, self._render_args, self._render_kwds
+
+    def _render(self):
+        if self._main_src is None:
+            t1 = time.time()
+            self._main_src = render_template_source(
+                self._template_src, render_args=self._render_args, render_kwds=self._render_kwds)
+            self._render_time = time.time() - t1
+
+    def _use_program(self, program, kernel, vs):
+        """
+        Finishes the building with the given program and kernel objects.
+        Returns ``False`` if the kernel cannot be executed with the local size from ``vs``.
+        """
+        if kernel.max_work_group_size < product(vs.real_local_size):
+            return False
+
+        self._program = program
+        self._kernel = kernel
+        self.prepared_call = kernel.prepared_call
+        self.virtual_local_size = vs.virtual_local_size
+        self.virtual_global_size = vs.virtual_global_size
+        self.local_size = vs.real_local_size
+        self.global_size = vs.real_global_size
+
+        self._kernel.prepare(self.global_size, local_size=self.local_size)
+        self._kernel._profile_info.update(
+            name=self._name, template=template_name(self._template_src),
+            global_size=self.virtual_global_size, local_size=self.virtual_local_size,
+            render_time=self._render_time, build_time=self._build_time + program.build_time)
+        self.built = True
+        return True
+
+    def build(self):
+        """
+        Builds the program (only necessary if the kernel was created with ``build=False``).
+        May raise :py:class:`~reikna.cluda.OutOfResourcesError` if the built kernel
+        cannot be executed with the requested local size.
+        """
+        if self.built:
+            return
+
+        self._render()
 
         # Since virtual size function require some registers, they affect the maximum local size.
         # Start from the device's max work group size as the first approximation
         # and recompile kernels with smaller local sizes until convergence.
-        max_local_size = thr.device_params.max_work_group_size
+        vs = self._initial_vs
+        occupancy_checked = False
 
         while True:
 
-            # Try to find kernel launch parameters for the requested local size.
-            # May raise OutOfResourcesError if it's not possible,
-            # just let it pass to the caller.
-            vs = VirtualSizes(
-                thr.device_params, global_size,
-                virtual_local_size=local_size,
-                max_local_size=max_local_size)
-
             # Try to compile the kernel with the corresponding virtual size functions
             program = Program(
-                self._thr, vs.vsize_functions + main_src,
-                static=True, fast_math=fast_math)
-            kernel = getattr(program, name)
+                self._thr, vs.vsize_functions + self._main_src,
+                static=True, fast_math=self._fast_math)
+            kernel = getattr(program, self._name)
 
             if kernel.max_work_group_size >= product(vs.real_local_size):
-                # Kernel will execute with this local size, use it
+                # Now that the resource usage of the kernel is known,
+                # check if a smaller local size gives a better occupancy.
+                # This is done only once, since the resource usage can slightly change
+                # with the local size, and we do not want to oscillate between two values.
+                if not occupancy_checked:
+                    occupancy_checked = True
+                    occupancy_vs = self._occupancy_vs(kernel, vs)
+                    if occupancy_vs is not None:
+                        self._build_time += program.build_time
+                        vs = occupancy_vs
+                        continue
+
+                # Kernel will execute with this local size
+                self._use_program(program, kernel, vs)
                 break
 
             # By the contract of VirtualSizes,
@@ -564,16 +1343,9 @@ class StaticKernel:
             # kernel.max_work_group_size < product(vs.real_local_size).
             # Therefore the new max_local_size value is guaranteed
             # to be smaller than the previous one.
-            max_local_size = kernel.max_work_group_size
-
-        self._program = program
-        self._kernel = kernel
-        self.virtual_local_size = vs.virtual_local_size
-        self.virtual_global_size = vs.virtual_global_size
-        self.local_size = vs.real_local_size
-        self.global_size = vs.real_global_size
-
-        self._kernel.prepare(self.global_size, local_size=self.local_size)
+            # May raise OutOfResourcesError, just let it pass to the caller.
+            self._build_time += program.build_time
+            vs = self._virtual_sizes(kernel.max_work_group_size)
 
     def __call__(self, *args):
         """
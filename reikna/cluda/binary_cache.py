@@ -0,0 +1,173 @@
+"""
+This module contains an on-disk cache of compiled kernel binaries.
+"""
+
+import os
+import os.path
+import hashlib
+import tempfile
+import errno
+
+
+def _default_cache_dir():
+    if 'REIKNA_CACHE_DIR' in os.environ:
+        return os.environ['REIKNA_CACHE_DIR']
+    else:
+        return os.path.join(os.path.expanduser('~'), '.cache', 'reikna', 'binaries')
+
+
+class BinaryCache:
+    """
+    A content-addressed on-disk cache of program binaries.
+    Entries are keyed by the full program source, the compiler options
+    and the fingerprint of the device and driver they were built for.
+    The cache can be safely shared between several processes:
+    entries are written to temporary files and atomically renamed into place,
+    and a concurrently removed entry is treated as a cache miss.
+
+    :param path: the directory to store binaries in.
+        If ``None``, the value of the environment variable ``REIKNA_CACHE_DIR`` is used,
+        or, if it is not set, ``~/.cache/reikna/binaries``.
+    :param max_size: the maximum total size (in bytes) of the stored binaries.
+        When it is exceeded, the least recently used entries are evicted.
+        If ``None``, the size of the cache is not limited.
+
+    .. py:attribute:: hits
+
+        Number of successful lookups performed by this object.
+
+    .. py:attribute:: misses
+
+        Number of failed lookups performed by this object.
+    """
+
+    SUFFIX = '.bin'
+
+    def __init__(self, path=None, max_size=2 ** 28):
+        self.path = _default_cache_dir() if path is None else path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        try:
+            os.makedirs(self.path)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    @staticmethod
+    def key(source, options, fingerprint):
+        """
+        Returns a string identifying a program built from ``source``
+        with compiler ``options`` for the device with the given ``fingerprint``
+        (all three are strings).
+        """
+        hasher = hashlib.sha1()
+        for part in (source, options, fingerprint):
+            hasher.update(part.encode('utf-8'))
+            # A separator to prevent collisions between different splits of the same string
+            hasher.update(b'\x00')
+        return hasher.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key + self.SUFFIX)
+
+    def get(self, key):
+        """
+        Returns the binary (a ``bytes`` object) saved for ``key``,
+        or ``None`` if there is no such entry.
+        """
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                binary = f.read()
+        except (IOError, OSError):
+            self.misses += 1
+            return None
+
+        # Update the access time of the entry, so that it is not evicted too soon.
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        self.hits += 1
+        return binary
+
+    def reject(self, key):
+        """
+        Removes the entry for ``key`` returned by :py:meth:`get` which could not be used
+        (e.g. a corrupted one, or the one the driver refused to load),
+        and counts the lookup as a miss.
+        """
+        self.hits -= 1
+        self.misses += 1
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            # Already removed by another process.
+            pass
+
+    def put(self, key, binary):
+        """
+        Saves ``binary`` (a ``bytes`` object) for ``key``.
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(binary)
+            # ``rename()`` is atomic on POSIX, so readers will see either the full entry or nothing.
+            # On Windows it fails if the destination exists, but in that case some other process
+            # has already saved the same binary.
+            os.rename(temp_path, self._entry_path(key))
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+        if self.max_size is not None:
+            self.evict(self.max_size)
+
+    def _entries(self):
+        entries = []
+        for fname in os.listdir(self.path):
+            if not fname.endswith(self.SUFFIX):
+                continue
+            path = os.path.join(self.path, fname)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # removed by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def size(self):
+        """
+        Returns the total size (in bytes) of the stored binaries.
+        """
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, max_size):
+        """
+        Removes the least recently used entries
+        until the total size of the cache is not greater than ``max_size``.
+        """
+        entries = sorted(self._entries())
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total_size <= max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # Already removed by another process.
+                pass
+            total_size -= size
+
+    def clear(self):
+        """
+        Removes all the entries from the cache.
+        """
+        self.evict(0)
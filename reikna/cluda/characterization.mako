@@ -0,0 +1,68 @@
+<%def name="divergence()">
+KERNEL void divergence(GLOBAL_MEM float *dest)
+{
+    VIRTUAL_SKIP_THREADS;
+    const VSIZE_T lid = virtual_local_id(0);
+    float x = lid;
+
+    // Neighbouring groups of ${width} threads take different branches,
+    // which have to be executed one after another if the groups share a SIMD unit.
+    if ((lid / ${width}) % 2 == 0)
+    {
+        for (int i = 0; i < ${iterations}; i++)
+            x = x * 0.999f + 0.5f;
+    }
+    else
+    {
+        for (int i = 0; i < ${iterations}; i++)
+            x = x * 0.998f + 0.25f;
+    }
+
+    dest[virtual_global_id(0)] = x;
+}
+</%def>
+
+
+<%def name="bank_conflicts()">
+KERNEL void bank_conflicts(GLOBAL_MEM int *dest)
+{
+    VIRTUAL_SKIP_THREADS;
+    LOCAL_MEM int local_mem[${local_size * stride}];
+    const VSIZE_T lid = virtual_local_id(0);
+
+    // The threads access words ${stride} apart, so the number of threads
+    // accessing the same bank grows with the stride until it reaches the number of banks.
+    int idx = lid * ${stride};
+    local_mem[idx] = idx;
+    LOCAL_BARRIER;
+
+    // The next address depends on the loaded value,
+    // so that the compiler could not move the loads out of the loop.
+    for (int i = 0; i < ${iterations}; i++)
+        idx = local_mem[idx];
+
+    dest[virtual_global_id(0)] = idx;
+}
+</%def>
+
+
+<%def name="coalescing()">
+KERNEL void coalescing(GLOBAL_MEM ${ctype} *dest, GLOBAL_MEM ${ctype} *src)
+{
+    VIRTUAL_SKIP_THREADS;
+    const VSIZE_T i = virtual_global_id(0);
+
+    // Groups of ${width} successive threads read successive elements,
+    // and the beginnings of the groups are ${stride} elements apart.
+    dest[i] = src[(i / ${width}) * ${stride} + i % ${width}];
+}
+</%def>
+
+
+<%def name="empty()">
+KERNEL void empty(GLOBAL_MEM int *dest)
+{
+    VIRTUAL_SKIP_THREADS;
+    dest[virtual_global_id(0)] = 0;
+}
+</%def>
@@ -0,0 +1,274 @@
+"""
+This module contains the microbenchmarks measuring the device parameters
+that cannot be queried from the driver,
+and an on-disk database of their results.
+"""
+
+import os
+import os.path
+import hashlib
+import tempfile
+import errno
+import json
+import time
+
+import numpy
+
+from reikna.helpers import template_for
+from reikna.cluda import OutOfResourcesError
+
+
+TEMPLATE = template_for(__file__)
+
+# The parameters that can be measured by characterize()
+PARAMETERS = ('warp_size', 'local_mem_banks', 'min_mem_coalesce_width', 'launch_latency')
+
+
+def _default_database_dir():
+    if 'REIKNA_DEVICE_DIR' in os.environ:
+        return os.environ['REIKNA_DEVICE_DIR']
+    else:
+        return os.path.join(os.path.expanduser('~'), '.cache', 'reikna', 'devices')
+
+
+class CharacterizationDatabase:
+    """
+    An on-disk database of the results of :py:func:`characterize`,
+    keyed by the device fingerprint.
+    Each entry is stored in a separate file,
+    so the database can be safely shared between several processes
+    (see :py:class:`~reikna.cluda.binary_cache.BinaryCache` for details).
+
+    :param path: the directory to store the entries in.
+        If ``None``, the value of the environment variable ``REIKNA_DEVICE_DIR`` is used,
+        or, if it is not set, ``~/.cache/reikna/devices``.
+    """
+
+    SUFFIX = '.json'
+
+    def __init__(self, path=None):
+        self.path = _default_database_dir() if path is None else path
+
+        try:
+            os.makedirs(self.path)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def _entry_path(self, fingerprint):
+        key = hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, key + self.SUFFIX)
+
+    def get(self, fingerprint):
+        """
+        Returns the parameters saved for the device with the given ``fingerprint``,
+        or ``None`` if there is no such entry.
+        """
+        try:
+            with open(self._entry_path(fingerprint)) as f:
+                params = json.load(f)
+        except (IOError, OSError, ValueError):
+            # The entry does not exist, or was corrupted.
+            return None
+
+        # JSON only supports string keys
+        if params.get('min_mem_coalesce_width') is not None:
+            params['min_mem_coalesce_width'] = dict(
+                (int(size), width) for size, width in params['min_mem_coalesce_width'].items())
+        return params
+
+    def put(self, fingerprint, params):
+        """
+        Saves ``params`` (a dictionary returned by :py:func:`characterize`)
+        for the device with the given ``fingerprint``.
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(params, f)
+            os.rename(temp_path, self._entry_path(fingerprint))
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def clear(self):
+        """
+        Removes all the entries.
+        """
+        for fname in os.listdir(self.path):
+            if fname.endswith(self.SUFFIX):
+                try:
+                    os.remove(os.path.join(self.path, fname))
+                except OSError:
+                    # Already removed by another process.
+                    pass
+
+
+def _time_kernel(thr, kernel, args, launches=10, repetitions=3):
+    # The launches are enqueued one after another,
+    # so that their overhead is mostly hidden by the execution of the previous ones.
+    kernel(*args)
+    thr.synchronize()
+
+    times = []
+    for _ in range(repetitions):
+        t1 = time.time()
+        for _ in range(launches):
+            kernel(*args)
+        thr.synchronize()
+        times.append((time.time() - t1) / launches)
+    return min(times)
+
+
+def _powers_of_2(min_value, max_value):
+    values = []
+    value = min_value
+    while value <= max_value:
+        values.append(value)
+        value *= 2
+    return values
+
+
+def measure_warp_size(thr, iterations=1000, groups=64):
+    """
+    Returns the SIMD width of the device (the warp size in CUDA),
+    or ``None`` if it could not be determined.
+    Measured as the smallest width of the groups of threads taking alternating branches
+    that does not increase the execution time (which happens if the branches are serialized).
+    """
+    local_size = thr.device_params.max_work_group_size
+    widths = _powers_of_2(1, local_size // 2)
+    if len(widths) < 2:
+        return None
+
+    dest = thr.array(local_size * groups, numpy.float32)
+    times = {}
+    for width in widths:
+        kernel = thr.compile_static(
+            TEMPLATE.get_def('divergence'), 'divergence', local_size * groups,
+            local_size=local_size, render_kwds=dict(width=width, iterations=iterations))
+        times[width] = _time_kernel(thr, kernel, [dest])
+
+    undiverged = times[widths[-1]]
+    if times[widths[0]] < undiverged * 1.5:
+        # No divergence penalty (e.g. on CPU)
+        return None
+    for width in widths:
+        if times[width] < undiverged * 1.25:
+            return width
+
+
+def measure_local_mem_banks(thr, iterations=1000, groups=64, max_stride=64):
+    """
+    Returns the number of local memory banks,
+    or ``None`` if it could not be determined.
+    Measured as the stride of the local memory accesses
+    after which the execution time stops increasing because of the bank conflicts.
+    """
+    local_size = min(64, thr.device_params.max_work_group_size)
+    dest = thr.array(local_size * groups, numpy.int32)
+
+    strides = [
+        stride for stride in _powers_of_2(1, max_stride)
+        if local_size * stride * 4 <= thr.device_params.local_mem_size // 2]
+    if len(strides) < 2:
+        return None
+
+    times = {}
+    for stride in strides:
+        kernel = thr.compile_static(
+            TEMPLATE.get_def('bank_conflicts'), 'bank_conflicts', local_size * groups,
+            local_size=local_size,
+            render_kwds=dict(local_size=local_size, stride=stride, iterations=iterations))
+        times[stride] = _time_kernel(thr, kernel, [dest])
+
+    if times[strides[-1]] < times[strides[0]] * 1.5:
+        # No bank conflicts (e.g. on CPU)
+        return None
+    for i, stride in enumerate(strides[:-1]):
+        if all(times[larger] < times[stride] * 1.2 for larger in strides[i+1:]):
+            return stride
+    return None
+
+
+def measure_min_mem_coalesce_width(thr, threads=2 ** 18, segment=256):
+    """
+    Returns a dictionary ``{word_size:elements}``
+    (see :py:attr:`~reikna.cluda.api.DeviceParameters.min_mem_coalesce_width`).
+    For each word size, measured as the smallest number of successive words
+    read by successive threads that gives the throughput close to the maximum one
+    (with the groups of words being ``segment`` bytes apart).
+    """
+    ctypes = {4: 'int', 8: 'int2', 16: 'int4'}
+    result = {}
+    for word_size in sorted(ctypes):
+        stride = segment // word_size
+        widths = _powers_of_2(1, stride)
+        dest = thr.array(threads * word_size, numpy.uint8)
+        src = thr.array(threads * segment, numpy.uint8)
+
+        throughputs = {}
+        for width in widths:
+            kernel = thr.compile_static(
+                TEMPLATE.get_def('coalescing'), 'coalescing', threads,
+                render_kwds=dict(ctype=ctypes[word_size], width=width, stride=stride))
+            throughputs[width] = 1. / _time_kernel(thr, kernel, [dest, src])
+
+        max_throughput = max(throughputs.values())
+        for width in widths:
+            if throughputs[width] >= max_throughput * 0.8:
+                result[word_size] = width
+                break
+
+    return result
+
+
+def measure_launch_latency(thr, launches=100):
+    """
+    Returns the time (in seconds) between the launch of an empty kernel
+    and the moment its completion is seen by the host.
+    """
+    dest = thr.array(1, numpy.int32)
+    kernel = thr.compile_static(TEMPLATE.get_def('empty'), 'empty', 1)
+    kernel(dest)
+    thr.synchronize()
+
+    times = []
+    for _ in range(launches):
+        t1 = time.time()
+        kernel(dest)
+        thr.synchronize()
+        times.append(time.time() - t1)
+    return min(times)
+
+
+def characterize(thr, parameters=None):
+    """
+    Runs the microbenchmarks on the device of ``thr`` and returns a dictionary
+    with the measured parameters (``None`` for the ones that could not be determined):
+    ``warp_size``, ``local_mem_banks``, ``min_mem_coalesce_width``
+    (see :py:class:`~reikna.cluda.api.DeviceParameters` for their meaning)
+    and ``launch_latency`` (see :py:func:`measure_launch_latency`).
+
+    :param thr: a :py:class:`~reikna.cluda.api.Thread` object.
+    :param parameters: a list of the names of the parameters to measure.
+        If ``None``, all of them are measured.
+    """
+    measures = dict(
+        warp_size=measure_warp_size,
+        local_mem_banks=measure_local_mem_banks,
+        min_mem_coalesce_width=measure_min_mem_coalesce_width,
+        launch_latency=measure_launch_latency)
+
+    if parameters is None:
+        parameters = PARAMETERS
+
+    result = {}
+    for name in parameters:
+        try:
+            result[name] = measures[name](thr)
+        except OutOfResourcesError:
+            result[name] = None
+    return result
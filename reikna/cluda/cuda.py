@@ -1,9 +1,11 @@
 import sys
 import itertools
 
+import numpy
 import pycuda.gpuarray as gpuarray
 import pycuda.driver as cuda
-from pycuda.compiler import SourceModule
+from pycuda.compiler import SourceModule, compile as compile_to_cubin
+import pycuda
 from pycuda.tools import DeviceData
 
 import reikna.cluda as cluda
@@ -62,10 +64,53 @@ class Buffer:
     def __long__(self):
         return long(self._buffer)
 
+    def get_sub_region(self, origin, size):
+        return SubBuffer(self, origin, size)
+
     def __del__(self):
         self._buffer.free()
 
 
+class SubBuffer:
+    """
+    Mimics the result of pyopencl.Buffer.get_sub_region()
+    """
+
+    def __init__(self, base, origin, size):
+        # Keeping the reference to prevent the allocation from being freed
+        self._base = base
+        self._origin = origin
+        self.size = size
+
+    def __int__(self):
+        return int(self._base) + self._origin
+
+    def __long__(self):
+        return long(self._base) + self._origin
+
+    def get_sub_region(self, origin, size):
+        return SubBuffer(self._base, self._origin + origin, size)
+
+
+class Event:
+    """
+    Mimics pyopencl.Event
+    """
+
+    def __init__(self, stream):
+        self._event = cuda.Event()
+        self._event.record(stream)
+
+    def wait(self):
+        self._event.synchronize()
+
+    def done(self):
+        return self._event.query()
+
+    def time_till(self, event):
+        return event._event.time_since(self._event) * 1e-3
+
+
 class Array(gpuarray.GPUArray):
     """
     A superclass of PyCUDA ``GPUArray``, with some additional functionality.
@@ -78,6 +123,7 @@ class Array(gpuarray.GPUArray):
 class Thread(api_base.Thread):
 
     api = sys.modules[__name__]
+    _build_error = cuda.CompileError
 
     def __init__(self, *args, **kwds):
         api_base.Thread.__init__(self, *args, **kwds)
@@ -97,10 +143,19 @@ class Thread(api_base.Thread):
         else:
             return ValueError("The value provided is not Device, Context or Stream")
 
-    def allocate(self, size):
+    def _allocate_buffer(self, size):
         return Buffer(size)
 
+    def _alias_buffer(self, buf):
+        return SubBuffer(buf, 0, buf.size)
+
+    def _allocate_host_buffer(self, size):
+        return cuda.pagelocked_empty(size, numpy.uint8)
+
     def array(self, shape, dtype, strides=None, allocator=None):
+        if allocator is None and self.mem_pool is not None:
+            allocator = self.allocate
+
         # In PyCUDA, the default allocator is not None, but a default alloc object
         kwds = {}
         if strides is not None:
@@ -109,17 +164,26 @@ class Thread(api_base.Thread):
             kwds['allocator'] = allocator
         return Array(self, shape, dtype, **kwds)
 
-    def _copy_array(self, dest, src):
+    def _copy_array(self, dest, src, async=False):
         dest.set_async(src, stream=self._queue)
 
-    def from_device(self, arr, dest=None, async=False):
+    def _from_device(self, arr, dest, async):
         if async:
-            arr_cpu = arr.get_async(ary=dest, stream=self._queue)
+            return arr.get_async(ary=dest, stream=self._queue)
         else:
-            arr_cpu = arr.get(ary=dest)
+            return arr.get(ary=dest)
+
+    def record_event(self):
+        return Event(self._queue)
 
-        if dest is None:
-            return arr_cpu
+    def wait_for(self, *events):
+        for event in events:
+            self._queue.wait_for_event(event._event)
+
+    def _fork_cqd(self):
+        # Streams are created in the current context,
+        # which is the context of this thread while it is active.
+        return cuda.Stream()
 
     def _copy_array_buffer(self, dest, src, nbytes, src_offset=0, dest_offset=0):
         cuda.memcpy_dtod_async(
@@ -130,10 +194,64 @@ class Thread(api_base.Thread):
     def synchronize(self):
         self._queue.synchronize()
 
+    def _compile_options(self, fast_math=False):
+        return " ".join(['-use_fast_math'] if fast_math else [])
+
+    def _device_fingerprint(self):
+        return "|".join([
+            self._device.name,
+            ".".join(str(x) for x in self._device.compute_capability()),
+            str(cuda.get_driver_version()),
+            ".".join(str(x) for x in cuda.get_version()),
+            pycuda.VERSION_TEXT])
+
     def _compile(self, src, fast_math=False):
         options = ['-use_fast_math'] if fast_math else []
         return SourceModule(src, no_extern_c=True, options=options)
 
+    def _compile_with_binary(self, src, fast_math=False):
+        options = ['-use_fast_math'] if fast_math else []
+        cubin = compile_to_cubin(src, no_extern_c=True, options=options)
+        return cuda.module_from_buffer(cubin), cubin
+
+    def _program_from_binary(self, binary, fast_math=False):
+        return cuda.module_from_buffer(binary)
+
+    def _parallel_build_supported(self):
+        # The context has to be made current in worker threads,
+        # which is impossible if the thread was created from a stream.
+        return self._context is not None
+
+    def _build_in_worker(self, kernel):
+        self._context.push()
+        try:
+            kernel.build()
+        finally:
+            cuda.Context.pop()
+
+    def _wait_in_worker(self, event):
+        if self._context is None:
+            event.wait()
+            return
+
+        self._context.push()
+        try:
+            event.wait()
+        finally:
+            cuda.Context.pop()
+
+    def _call_current(self, func):
+        # Separately created threads have different contexts,
+        # and only the one on top of the context stack can be used.
+        if self._context is None or cuda.Context.get_current() == self._context:
+            return func()
+
+        self._context.push()
+        try:
+            return func()
+        finally:
+            cuda.Context.pop()
+
     def _cuda_push(self):
         assert not self._active
         self._context.push()
@@ -181,6 +299,28 @@ class DeviceParameters:
             ((size,devdata.align_words(word_size=size)) for size in [4, 8, 16]))
         self.local_mem_size = device.max_shared_memory_per_block
 
+        # The alignment guaranteed by cudaMalloc()
+        self.mem_base_addr_align = 256
+
+        # Older versions of CUDA do not report per-multiprocessor limits,
+        # in which case per-block limits are the best approximation.
+        self.max_threads_per_compute_unit = device.max_threads_per_multiprocessor
+        self.registers_per_compute_unit = getattr(
+            device, 'max_registers_per_multiprocessor', device.max_registers_per_block)
+        self.local_mem_per_compute_unit = getattr(
+            device, 'max_shared_memory_per_multiprocessor', self.local_mem_size)
+
+        # there is no corresponding constant in the API at the moment
+        major = device.compute_capability()[0]
+        self.max_groups_per_compute_unit = 8 if major < 3 else (16 if major < 5 else 32)
+
+        # Measured by microbenchmarks (see the ``characterization`` parameter of Thread)
+        self.launch_latency = None
+
+        # The parameters that are guessed and not queried
+        # (can be measured instead, see the ``characterization`` parameter of Thread)
+        self._guessed = ('local_mem_banks', 'min_mem_coalesce_width')
+
     def supports_dtype(self, dtype):
         if dtypes.is_double(dtype):
             major, minor = self._device.compute_capability()
@@ -219,6 +359,8 @@ class Kernel(api_base.Kernel):
     def _fill_attributes(self):
         self.max_work_group_size = self._kernel.get_attribute(
             cuda.function_attribute.MAX_THREADS_PER_BLOCK)
+        self.registers = self._kernel.get_attribute(cuda.function_attribute.NUM_REGS)
+        self.local_mem = self._kernel.get_attribute(cuda.function_attribute.SHARED_SIZE_BYTES)
 
     def prepare(self, global_size, local_size=None, local_mem=0):
         global_size = wrap_in_tuple(global_size)
@@ -1,14 +1,29 @@
 from logging import error
+from collections import OrderedDict
 
 from mako import exceptions
 
 import reikna.helpers as helpers
-from reikna.helpers import template_for, template_from, template_def, extract_signature_and_value
+from reikna.helpers import template_for, template_from, template_def, \
+    extract_signature_and_value, structural_key
 from reikna.cluda import dtypes
 
 
 TEMPLATE = template_for(__file__)
 
+# The maximum number of rendered sources kept by ``render_template_source()``.
+RENDER_CACHE_SIZE = 256
+
+_render_cache = OrderedDict()
+
+_render_stats = dict(
+    cache_hits=0,
+    cache_misses=0,
+    module_renders=0,
+    module_duplicates=0,
+    source_size_total=0,
+    source_size_deduplicated=0)
+
 
 def render_prelude(thr, fast_math=False):
     return TEMPLATE.get_def('prelude').render(
@@ -97,30 +112,39 @@ class Module:
 class SourceCollector:
 
     def __init__(self):
-        self.constant_modules = {}
+        self.modules = {}
         self.sources = []
         self.prefix_counter = 0
 
-    def add_module(self, module_id, tmpl_def, args, render_kwds):
+        # Total size of the rendered modules with and without deduplication
+        self.size_total = 0
+        self.size_deduplicated = 0
+
+    def add_module(self, tmpl_def, args, render_kwds):
 
         # This caching serves two purposes.
         # First, it reduces the amount of generated code by not generating
-        # the same module several times.
-        # Second, if the same module object is used (without arguments) in other modules,
-        # the data structures defined in this module will be suitable
-        # for functions in these modules.
-        if len(args) == 0:
-            if module_id in self.constant_modules:
-                return self.constant_modules[module_id]
+        # the same module several times (e.g. when a parametrized module is called in a loop).
+        # Second, if the same module (possibly with the same arguments)
+        # is used in other modules, the data structures defined in this module
+        # will be suitable for functions in these modules.
+        module_key = structural_key((tmpl_def, args, render_kwds))
+        if module_key in self.modules:
+            prefix, size = self.modules[module_key]
+            self.size_total += size
+            _render_stats['module_duplicates'] += 1
+            return prefix
 
         prefix = "_module" + str(self.prefix_counter) + "_"
         self.prefix_counter += 1
 
         src = render_template(tmpl_def, prefix, *args, **render_kwds)
         self.sources.append(src)
+        _render_stats['module_renders'] += 1
 
-        if len(args) == 0:
-            self.constant_modules[module_id] = prefix
+        self.size_total += len(src)
+        self.size_deduplicated += len(src)
+        self.modules[module_key] = (prefix, len(src))
 
         return prefix
 
@@ -134,6 +158,9 @@ class RenderableSnippet:
         self.template_def = tmpl_def
         self.render_kwds = render_kwds
 
+    def __structural_key__(self, key):
+        return (key(self.template_def), key(self.render_kwds))
+
     def __call__(self, *args):
         return render_template(self.template_def, *args, **self.render_kwds)
 
@@ -143,15 +170,18 @@ class RenderableSnippet:
 
 class RenderableModule:
 
-    def __init__(self, collector, module_id, tmpl_def, render_kwds):
-        self.module_id = module_id
+    def __init__(self, collector, tmpl_def, render_kwds):
         self.collector = collector
         self.template_def = tmpl_def
         self.render_kwds = render_kwds
 
+    def __structural_key__(self, key):
+        # The collector is excluded, because it is the same for all modules
+        # rendered together, and its state changes during the rendering.
+        return (key(self.template_def), key(self.render_kwds))
+
     def __call__(self, *args):
-        return self.collector.add_module(
-            self.module_id, self.template_def, args, self.render_kwds)
+        return self.collector.add_module(self.template_def, args, self.render_kwds)
 
     def __str__(self):
         return self()
@@ -163,7 +193,7 @@ def process(obj, collector):
         return RenderableSnippet(obj.template, render_kwds)
     elif isinstance(obj, Module):
         render_kwds = process(obj.render_kwds, collector)
-        return RenderableModule(collector, id(obj), obj.template, render_kwds)
+        return RenderableModule(collector, obj.template, render_kwds)
     elif hasattr(obj, '__process_modules__'):
         return obj.__process_modules__(lambda x: process(x, collector))
     elif isinstance(obj, dict):
@@ -176,6 +206,35 @@ def process(obj, collector):
         return obj
 
 
+def render_template_sources(requests):
+    """
+    Renders several templates with a common module collector,
+    so that identical modules used by them are only rendered once
+    (and can therefore be placed in the same program).
+    ``requests`` is a list of tuples ``(src, render_args, render_kwds)``.
+    Returns a tuple of the source of all the modules, and the list of main sources
+    (which have to be placed after the modules).
+    """
+
+    collector = SourceCollector()
+    main_srcs = []
+    for src, render_args, render_kwds in requests:
+        render_args = process(render_args, collector)
+        main_renderable = process(Snippet(src, render_kwds=render_kwds), collector)
+        main_srcs.append(main_renderable(*render_args))
+
+    main_size = sum(len(main_src) for main_src in main_srcs)
+    _render_stats['source_size_total'] += collector.size_total + main_size
+    _render_stats['source_size_deduplicated'] += collector.size_deduplicated + main_size
+
+    return collector.get_source(), main_srcs
+
+
+def _render_template_source(src, render_args, render_kwds):
+    modules_src, main_srcs = render_template_sources([(src, render_args, render_kwds)])
+    return modules_src + "\n\n" + main_srcs[0]
+
+
 def render_template_source(src, render_args=None, render_kwds=None):
 
     if render_args is None:
@@ -183,10 +242,42 @@ def render_template_source(src, render_args=None, render_kwds=None):
     if render_kwds is None:
         render_kwds = {}
 
-    collector = SourceCollector()
-    render_args = process(render_args, collector)
-    main_renderable = process(Snippet(src, render_kwds=render_kwds), collector)
+    # Rendering does not have side effects, and its result only depends
+    # on the structure of the template and its arguments,
+    # so equal requests (e.g. the same kernel in another plan) can reuse the source.
+    key = structural_key((src, render_args, render_kwds))
+    if key in _render_cache:
+        _render_stats['cache_hits'] += 1
+        rendered = _render_cache.pop(key)
+    else:
+        _render_stats['cache_misses'] += 1
+        rendered = _render_template_source(src, render_args, render_kwds)
+        if len(_render_cache) >= RENDER_CACHE_SIZE:
+            _render_cache.popitem(last=False)
+
+    _render_cache[key] = rendered
+    return rendered
 
-    main_src = main_renderable(*render_args)
 
-    return collector.get_source() + "\n\n" + main_src
+def render_statistics():
+    """
+    Returns a dictionary with the statistics of template rendering in this process:
+
+    * ``cache_hits``, ``cache_misses``: number of rendered kernel sources
+      taken from the cache and rendered from scratch;
+    * ``module_renders``, ``module_duplicates``: number of modules rendered,
+      and the number of module calls that reused an identical module
+      already rendered in the same source;
+    * ``source_size_total``, ``source_size_deduplicated``: total size (in characters)
+      of the rendered kernel sources without and with the module deduplication.
+    """
+    return dict(_render_stats)
+
+
+def clear_render_cache():
+    """
+    Clears the cache of rendered sources and resets the rendering statistics.
+    """
+    _render_cache.clear()
+    for name in _render_stats:
+        _render_stats[name] = 0
@@ -0,0 +1,235 @@
+"""
+This module contains pools of device memory allocations.
+"""
+
+import weakref
+
+
+class MemoryPool:
+    """
+    Base class for a pool of device memory allocations.
+    A pool attached to a :py:class:`~reikna.cluda.api.Thread` (see its ``mem_pool`` parameter)
+    serves all the requests of :py:meth:`~reikna.cluda.api.Thread.allocate`,
+    including the ones made by arrays created without an explicit allocator
+    and by temporary array managers.
+
+    :param thr: an instance of :py:class:`~reikna.cluda.api.Thread`.
+    """
+
+    def __init__(self, thr):
+        self._thr = thr
+
+    def allocate(self, size):
+        """
+        Returns a :py:class:`~reikna.cluda.api.Buffer` object of at least ``size`` bytes
+        (its ``size`` attribute contains the actual size of the allocation).
+        """
+        raise NotImplementedError()
+
+    def trim(self, size=0):
+        """
+        Frees the allocations held by the pool
+        until their total size does not exceed ``size`` bytes.
+        The allocations that can still be used by the operations enqueued before their release
+        are kept, so the resulting size can be greater.
+        """
+        raise NotImplementedError()
+
+    def statistics(self):
+        """
+        Returns a dictionary with the statistics of the pool.
+        """
+        raise NotImplementedError()
+
+
+class SizeClassPool(MemoryPool):
+    """
+    Rounds the requested sizes up to a set of size classes
+    (``2 ** class_bits`` classes per each power of two),
+    and keeps the freed allocations in per-class lists to serve the subsequent requests.
+    An allocation returns to the pool when the last reference to the buffer object
+    handed out by :py:meth:`allocate` disappears.
+    Since all the operations of a thread are serialized in its queue,
+    the memory can be reused right away, without waiting for the pending kernels to finish.
+    If the pool is shared by several threads (see :py:meth:`~reikna.cluda.api.Thread.fork`),
+    a released allocation is only reused after all the operations enqueued before its release
+    are finished.
+
+    :param limit: the maximum total size (in bytes) of the allocations held by the pool;
+        if ``None``, the size is not limited.
+    :param class_bits: the number of bits defining the size classes
+        between successive powers of two
+        (the memory wasted on the rounding does not exceed ``1 / 2 ** class_bits``
+        of the requested size).
+    :param min_size: the size of the smallest class in bytes.
+    """
+
+    def __init__(self, thr, limit=None, class_bits=2, min_size=256):
+        MemoryPool.__init__(self, thr)
+        self._limit = limit
+        self._class_bits = class_bits
+        self._min_size = min_size
+
+        self._held = {} # class size -> list of (buffer, list of events to wait for)
+        self._active = {} # id -> (weak reference to the handle, class size, requested size)
+        self._id_counter = 0
+
+        self._requests = 0
+        self._hits = 0
+        self._bytes_held = 0
+        self._bytes_active = 0
+        self._bytes_requested = 0
+
+    def _new_buffer(self, size):
+        return self._thr._allocate_buffer(size)
+
+    def _alias(self, buf):
+        return self._thr._alias_buffer(buf)
+
+    def size_class(self, size):
+        """
+        Returns the size of the class the allocation of ``size`` bytes belongs to.
+        """
+        size = int(size)
+        if size <= self._min_size:
+            return self._min_size
+        step = 1 << max(size.bit_length() - 1 - self._class_bits, 0)
+        return ((size + step - 1) // step) * step
+
+    def allocate(self, size):
+        class_size = self.size_class(size)
+        self._requests += 1
+
+        buf = None
+        for i, (held_buf, events) in enumerate(self._held.get(class_size, [])):
+            if all(event.done() for event in events):
+                buf = held_buf
+                del self._held[class_size][i]
+                self._bytes_held -= class_size
+                self._hits += 1
+                break
+
+        if buf is None:
+            buf = self._new_buffer(class_size)
+
+        # The user gets a separate object referring to the same memory,
+        # so that we could find out when it is not used anymore,
+        # while still holding the original allocation.
+        handle = self._alias(buf)
+
+        new_id = self._id_counter
+        self._id_counter += 1
+        self._active[new_id] = (
+            weakref.ref(handle, lambda _: self._release(new_id, buf)), class_size, size)
+        self._bytes_active += class_size
+        self._bytes_requested += size
+
+        return handle
+
+    def _release(self, id_, buf):
+        _, class_size, size = self._active.pop(id_)
+        self._bytes_active -= class_size
+        self._bytes_requested -= size
+
+        events = self._release_events()
+
+        self._held.setdefault(class_size, []).append((buf, events))
+        self._bytes_held += class_size
+
+        if self._limit is not None:
+            self.trim(self._limit)
+
+    def _release_events(self):
+        # If the pool is shared by several queues (see Thread.fork()),
+        # the buffer can only be reused after the operations enqueued so far are finished,
+        # since they can still be using it.
+        return self._thr._family_events()
+
+    def trim(self, size=0):
+        # Freeing the largest allocations first, to keep as many buffers as possible.
+        for class_size in sorted(self._held, reverse=True):
+            buffers = self._held[class_size]
+            for i in reversed(range(len(buffers))):
+                if self._bytes_held <= size:
+                    break
+                _, events = buffers[i]
+                if all(event.done() for event in events):
+                    del buffers[i]
+                    self._bytes_held -= class_size
+            if not buffers:
+                del self._held[class_size]
+            if self._bytes_held <= size:
+                break
+
+    def set_limit(self, limit):
+        """
+        Sets the maximum total size of the held allocations (``None`` for no limit),
+        freeing the excessive ones.
+        """
+        self._limit = limit
+        if limit is not None:
+            self.trim(limit)
+
+    def statistics(self):
+        """
+        Returns a dictionary with the statistics of the pool:
+
+        * ``requests``, ``hits``: number of allocation requests,
+          and the number of ones served by a held allocation;
+        * ``hit_rate``: the ratio of the two above (``0`` if there were no requests);
+        * ``bytes_held``, ``buffers_held``: total size and the number of the allocations
+          held by the pool for reuse;
+        * ``bytes_active``, ``buffers_active``: total size and the number of the allocations
+          currently in use;
+        * ``fragmentation``: the fraction of ``bytes_active``
+          wasted because of the size rounding.
+        """
+        return dict(
+            requests=self._requests,
+            hits=self._hits,
+            hit_rate=float(self._hits) / self._requests if self._requests > 0 else 0,
+            bytes_held=self._bytes_held,
+            buffers_held=sum(len(buffers) for buffers in self._held.values()),
+            bytes_active=self._bytes_active,
+            buffers_active=len(self._active),
+            fragmentation=(
+                1 - float(self._bytes_requested) / self._bytes_active
+                if self._bytes_active > 0 else 0))
+
+
+class HostBuffer:
+    """
+    A page-locked host memory allocation handed out by :py:class:`HostSizeClassPool`.
+    Supports the ``numpy`` array interface, so ``numpy.asarray()`` can be used to access it
+    (the resulting array and all its views keep the allocation alive).
+
+    .. py:attribute:: size
+    """
+
+    def __init__(self, base):
+        # Keeping the reference to prevent the allocation from being returned to the pool
+        self._base = base
+        self.size = base.size
+        self.__array_interface__ = base.__array_interface__
+
+
+class HostSizeClassPool(SizeClassPool):
+    """
+    Same as :py:class:`SizeClassPool`, but for page-locked host memory
+    (see :py:meth:`~reikna.cluda.api.Thread.host_array`).
+    The :py:meth:`allocate` method returns :py:class:`HostBuffer` objects.
+    Since the host can access the memory without waiting for the queue,
+    a released allocation is always reused only after all the operations
+    enqueued before its release (e.g. asynchronous transfers) are finished.
+    """
+
+    def _new_buffer(self, size):
+        return self._thr._allocate_host_buffer(size)
+
+    def _release_events(self):
+        # Even with a single queue, the host code writing to a reused allocation
+        # is not serialized with the transfers that can still be reading from it.
+        return self._thr._family_events(always=True)
+
+    def _alias(self, buf):
+        return HostBuffer(buf)
@@ -1,5 +1,6 @@
 import sys
 
+import numpy
 import pyopencl as cl
 import pyopencl.array as clarray
 
@@ -26,34 +27,82 @@ class Array(clarray.Array):
         self.thread = thr
 
 
+class Event:
+    """
+    Wraps pyopencl.Event
+    """
+
+    def __init__(self, event):
+        self._event = event
+
+    def wait(self):
+        self._event.wait()
+
+    def done(self):
+        return self._event.command_execution_status == cl.command_execution_status.COMPLETE
+
+    def time_till(self, event):
+        return (event._event.profile.end - self._event.profile.end) * 1e-9
+
+
 class Thread(api_base.Thread):
 
     api = sys.modules[__name__]
+    _build_error = cl.RuntimeError
+
+    def _create_queue(self, context, device=None):
+        if self._profile:
+            properties = cl.command_queue_properties.PROFILING_ENABLE
+        else:
+            properties = None
+        return cl.CommandQueue(context, device=device, properties=properties)
 
     def _process_cqd(self, cqd):
         if isinstance(cqd, cl.Device):
             context = cl.Context(devices=[cqd])
-            return context, cl.CommandQueue(context), cqd, False
+            return context, self._create_queue(context), cqd, False
         elif isinstance(cqd, cl.Context):
-            return cqd, cl.CommandQueue(cqd), cqd.devices[0], False
+            return cqd, self._create_queue(cqd), cqd.devices[0], False
         elif isinstance(cqd, cl.CommandQueue):
             return cqd.context, cqd, cqd.device, False
         else:
             return ValueError("The value provided is not Device, Context or CommandQueue")
 
-    def allocate(self, size):
+    def _allocate_buffer(self, size):
         return cl.Buffer(self._context, cl.mem_flags.READ_WRITE, size=size)
 
+    def _alias_buffer(self, buf):
+        # A new Python object referring to the same (retained) memory object
+        return cl.Buffer.from_int_ptr(buf.int_ptr)
+
+    def _allocate_host_buffer(self, size):
+        # The memory allocated by the driver with ALLOC_HOST_PTR is usually page-locked,
+        # and stays mapped to the host while the returned array is alive.
+        buf = cl.Buffer(
+            self._context, cl.mem_flags.READ_WRITE | cl.mem_flags.ALLOC_HOST_PTR, size=size)
+        mapped, _ = cl.enqueue_map_buffer(
+            self._queue, buf, cl.map_flags.READ | cl.map_flags.WRITE, 0, (size,), numpy.uint8)
+        return mapped
+
     def array(self, shape, dtype, strides=None, allocator=None):
+        if allocator is None and self.mem_pool is not None:
+            allocator = self.allocate
         return Array(self, shape, dtype, strides=strides, allocator=allocator)
 
-    def _copy_array(self, dest, src):
-        dest.set(src, queue=self._queue, async=self._async)
+    def _copy_array(self, dest, src, async=False):
+        dest.set(src, queue=self._queue, async=async or self._async)
 
-    def from_device(self, arr, dest=None, async=False):
-        arr_cpu = arr.get(queue=self._queue, ary=dest, async=async)
-        if dest is None:
-            return arr_cpu
+    def _from_device(self, arr, dest, async):
+        return arr.get(queue=self._queue, ary=dest, async=async)
+
+    def record_event(self):
+        return Event(cl.enqueue_marker(self._queue))
+
+    def wait_for(self, *events):
+        cl.enqueue_barrier(self._queue, wait_for=[event._event for event in events])
+
+    def _fork_cqd(self):
+        return self._create_queue(self._context, self._device)
 
     def _copy_array_buffer(self, dest, src, nbytes, src_offset=0, dest_offset=0):
         cl.enqueue_copy(
@@ -63,10 +112,29 @@ class Thread(api_base.Thread):
     def synchronize(self):
         self._queue.finish()
 
+    def _compile_options(self, fast_math=False):
+        return "-cl-mad-enable -cl-fast-relaxed-math" if fast_math else ""
+
+    def _device_fingerprint(self):
+        device = self._device
+        return "|".join([
+            device.platform.name, device.platform.version,
+            device.name, device.version, device.driver_version])
+
     def _compile(self, src, fast_math=False):
-        options = "-cl-mad-enable -cl-fast-relaxed-math" if fast_math else ""
+        options = self._compile_options(fast_math=fast_math)
         return cl.Program(self._context, src).build(options=options)
 
+    def _compile_with_binary(self, src, fast_math=False):
+        program = self._compile(src, fast_math=fast_math)
+        # The context may contain several devices, picking the binary for ours.
+        device_idx = program.get_info(cl.program_info.DEVICES).index(self._device)
+        return program, program.get_info(cl.program_info.BINARIES)[device_idx]
+
+    def _program_from_binary(self, binary, fast_math=False):
+        options = self._compile_options(fast_math=fast_math)
+        return cl.Program(self._context, [self._device], [binary]).build(options=options)
+
 
 class DeviceParameters:
 
@@ -87,6 +155,10 @@ class DeviceParameters:
         max_size = 2 ** device.address_bits
         self.max_num_groups = [max_size, max_size, max_size]
 
+        # The parameters that are guessed and not queried
+        # (can be measured instead, see the ``characterization`` parameter of Thread)
+        self._guessed = ('warp_size', 'local_mem_banks', 'min_mem_coalesce_width')
+
         if device.type == cl.device_type.CPU:
             # For CPU both values do not make much sense
             self.local_mem_banks = self.max_work_group_size
@@ -95,6 +167,7 @@ class DeviceParameters:
             # If NV extensions are available, use them to query info
             self.local_mem_banks = 16 if device.compute_capability_major_nv < 2 else 32
             self.warp_size = device.warp_size_nv
+            self._guessed = ('local_mem_banks', 'min_mem_coalesce_width')
         elif device.vendor == 'NVIDIA':
             # nVidia device, but no extensions.
             # Must be APPLE OpenCL implementation.
@@ -113,6 +186,18 @@ class DeviceParameters:
         self.min_mem_coalesce_width = {4: 16, 8: 16, 16: 8}
         self.local_mem_size = device.local_mem_size
 
+        # The value is reported in bits
+        self.mem_base_addr_align = device.mem_base_addr_align // 8
+
+        # OpenCL does not provide the information necessary to estimate the occupancy.
+        self.max_threads_per_compute_unit = None
+        self.max_groups_per_compute_unit = None
+        self.registers_per_compute_unit = None
+        self.local_mem_per_compute_unit = None
+
+        # Measured by microbenchmarks (see the ``characterization`` parameter of Thread)
+        self.launch_latency = None
+
     def supports_dtype(self, dtype):
         if dtypes.is_double(dtype):
             extensions = self._device.extensions
@@ -129,6 +214,9 @@ class Kernel(api_base.Kernel):
     def _fill_attributes(self):
         self.max_work_group_size = self._kernel.get_work_group_info(
             cl.kernel_work_group_info.WORK_GROUP_SIZE, self._thr._device)
+        self.registers = None
+        self.local_mem = self._kernel.get_work_group_info(
+            cl.kernel_work_group_info.LOCAL_MEM_SIZE, self._thr._device)
 
     def prepare(self, global_size, local_size=None, local_mem=0):
         # ``local_mem`` is ignored, since it cannot be easily passed to the kernel
@@ -0,0 +1,100 @@
+"""
+This module contains the integration of device events with ``asyncio``.
+"""
+
+import threading
+
+try:
+    import queue
+except ImportError: # Python 2
+    import Queue as queue
+
+
+def _set_result(future, result):
+    if not future.cancelled():
+        future.set_result(result)
+
+
+def _set_exception(future, exc):
+    if not future.cancelled():
+        future.set_exception(exc)
+
+
+class EventPoller:
+    """
+    Waits for device events in a background thread
+    and resolves the corresponding ``asyncio`` futures in their event loops,
+    so that the loops are never blocked by the device.
+    The events are waited for in the order of submission,
+    which is also the order of their completion for events from a single queue.
+
+    :param thr: an instance of :py:class:`~reikna.cluda.api.Thread`
+        the events belong to.
+    """
+
+    def __init__(self, thr):
+        self._thr = thr
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def future(self, event, result=None, keep_alive=None):
+        """
+        Returns an ``asyncio`` future (bound to the running event loop)
+        which is resolved with ``result`` when ``event`` is completed.
+        In Python 3.7+ it must be called while the loop is running (e.g. from a coroutine).
+        ``keep_alive`` is an object that will be referenced until then
+        (e.g. the host array a transfer is reading from).
+        """
+        import asyncio
+
+        if hasattr(asyncio, 'get_running_loop'): # Python 3.7+
+            loop = asyncio.get_running_loop()
+        else:
+            loop = asyncio.get_event_loop()
+        future = loop.create_future()
+
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run)
+                self._worker.daemon = True
+                self._worker.start()
+
+        self._queue.put((event, loop, future, result, keep_alive))
+        return future
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            event, loop, future, result, _ = item
+            try:
+                self._thr._wait_in_worker(event)
+            except Exception as exc:
+                callback, value = _set_exception, exc
+            else:
+                callback, value = _set_result, result
+
+            try:
+                loop.call_soon_threadsafe(callback, future, value)
+            except RuntimeError:
+                # The loop was closed before the event completed;
+                # nobody can await the future anymore, but the other events still need polling.
+                pass
+
+    def stop(self):
+        """
+        Stops the background thread after the already submitted events are completed,
+        and waits for that (unless called from the background thread itself,
+        e.g. by the garbage collector).
+        """
+        with self._lock:
+            worker = self._worker
+            if worker is not None:
+                self._queue.put(None)
+                self._worker = None
+
+        if worker is not None and worker is not threading.current_thread():
+            worker.join()
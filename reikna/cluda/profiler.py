@@ -0,0 +1,131 @@
+"""
+This module contains the profiler of kernel launches and transfers
+(see the ``profile`` parameter of :py:class:`~reikna.cluda.api.Thread`).
+"""
+
+import os.path
+import json
+
+
+def template_name(template_src):
+    """
+    Returns a short human-readable name of a template used to render a kernel
+    (``<file>:<def>`` for a ``Mako`` def, ``<file>`` for a template loaded from a file),
+    or ``None`` if it cannot be determined.
+    """
+    parent = getattr(template_src, 'parent', None)
+    if parent is not None:
+        # A def of a Mako template
+        def_name = template_src.callable_.__name__
+        if def_name.startswith('render_'):
+            def_name = def_name[len('render_'):]
+        filename = getattr(parent, 'filename', None)
+        return def_name if filename is None else os.path.basename(filename) + ":" + def_name
+
+    filename = getattr(template_src, 'filename', None)
+    return None if filename is None else os.path.basename(filename)
+
+
+class Profiler:
+    """
+    Collects the execution times of kernel launches and transfers of a
+    :py:class:`~reikna.cluda.api.Thread` (and the threads created by its
+    :py:meth:`~reikna.cluda.api.Thread.fork`).
+    The times are measured with the events recorded before and after each operation,
+    so the collection does not synchronize the queue.
+
+    :param thr: an instance of :py:class:`~reikna.cluda.api.Thread`.
+    """
+
+    def __init__(self, thr):
+        self._origin = thr.record_event()
+        self._pending = []
+        self._records = []
+        self._queue_ids = {}
+
+    def _add(self, thr, kind, start, end, info):
+        queue_id = self._queue_ids.setdefault(id(thr._queue), len(self._queue_ids))
+        # The kernel information can change between the calls, so it has to be copied.
+        self._pending.append((kind, queue_id, start, end, dict(info)))
+
+    def records(self):
+        """
+        Waits for the profiled operations to finish, and returns a list of dictionaries
+        (one for each operation, in the order of submission) with the keys:
+
+        * ``kind``: ``'kernel'`` or ``'transfer'``;
+        * ``name``: the name of the kernel, or of the transfer method;
+        * ``queue``: the number of the queue the operation was submitted to;
+        * ``start``, ``end``, ``duration``: the time (in seconds) of the start and the end
+          of the operation relative to the creation of the profiler, and the difference of the two.
+
+        Kernel records also contain the keys ``template`` (see :py:func:`template_name`),
+        ``global_size``, ``local_size``, ``render_time`` and ``build_time``
+        (the time it took to render the template and to build the program in seconds,
+        ``None`` if unknown), and transfer records contain ``nbytes``.
+        """
+        for kind, queue_id, start, end, info in self._pending:
+            end.wait()
+            record = info
+            record.update(
+                kind=kind, queue=queue_id,
+                start=self._origin.time_till(start),
+                end=self._origin.time_till(end))
+            record['duration'] = record['end'] - record['start']
+            self._records.append(record)
+        self._pending = []
+        return list(self._records)
+
+    def report(self):
+        """
+        Returns a list of dictionaries with the statistics for each distinct operation
+        (identified by ``kind``, ``name`` and ``template``), sorted by the total time,
+        with the keys ``kind``, ``name``, ``template``, ``count``,
+        ``total_time``, ``mean_time``, ``min_time`` and ``max_time`` (in seconds).
+        """
+        stats = {}
+        for record in self.records():
+            key = (record['kind'], record['name'], record.get('template'))
+            stats.setdefault(key, []).append(record['duration'])
+
+        report = []
+        for (kind, name, template), durations in stats.items():
+            report.append(dict(
+                kind=kind, name=name, template=template, count=len(durations),
+                total_time=sum(durations),
+                mean_time=sum(durations) / len(durations),
+                min_time=min(durations),
+                max_time=max(durations)))
+
+        return sorted(report, key=lambda entry: -entry['total_time'])
+
+    def chrome_trace(self):
+        """
+        Returns the records in the trace event format
+        (can be opened in ``chrome://tracing`` or similar viewers after saving to a JSON file),
+        with a separate timeline for each queue.
+        """
+        events = []
+        for record in self.records():
+            args = dict(
+                (key, value) for key, value in record.items()
+                if key not in ('kind', 'name', 'queue', 'start', 'end', 'duration'))
+            events.append(dict(
+                name=record['name'], cat=record['kind'], ph='X',
+                ts=record['start'] * 1e6, dur=record['duration'] * 1e6,
+                pid=0, tid=record['queue'], args=args))
+        return dict(traceEvents=events, displayTimeUnit='ms')
+
+    def export_chrome_trace(self, path):
+        """
+        Saves the result of :py:meth:`chrome_trace` to a JSON file.
+        """
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+    def clear(self):
+        """
+        Removes all the collected records.
+        """
+        self.records()
+        self._records = []
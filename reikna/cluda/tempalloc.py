@@ -22,6 +22,27 @@ def extract_dependencies(dependencies):
     return results
 
 
+def overlapping_intervals(intervals):
+    """
+    Returns a list of sets with the indices of elements of ``intervals``
+    (lists of inclusive ``(start, end)`` tuples) overlapping with each of its elements.
+    """
+    result = [set() for _ in intervals]
+
+    # The intervals still active at the start of an interval are the ones it overlaps with.
+    active = []
+    for start, end, idx in sorted(
+            (start, end, idx) for idx, spans in enumerate(intervals) for start, end in spans):
+        active = [(other_end, other_idx) for other_end, other_idx in active if other_end >= start]
+        for _, other_idx in active:
+            if other_idx != idx:
+                result[idx].add(other_idx)
+                result[other_idx].add(idx)
+        active.append((end, idx))
+
+    return result
+
+
 class TemporaryManager:
     """
     Base class for a manager of temporary allocations.
@@ -35,10 +56,11 @@ class TemporaryManager:
         self._thr = thr
         self._id_counter = 0
         self._arrays = {}
+        self._queue_ids = {} # id -> identifier of the queue the array is used in
         self._pack_on_alloc = pack_on_alloc
         self._pack_on_free = pack_on_free
 
-    def array(self, shape, dtype, strides=None, dependencies=None):
+    def array(self, shape, dtype, strides=None, dependencies=None, thread=None):
         """
         Returns a temporary array.
 
@@ -50,6 +72,51 @@ class TemporaryManager:
             an iterable with valid values,
             or an object with the attribute `__tempalloc__` which is a valid value
             (the last two will be processed recursively).
+        :param thread: the :py:class:`~reikna.cluda.api.Thread` the array will be used in
+            (the one the manager was created for, if ``None``).
+            Arrays used in threads with different queues (see
+            :py:meth:`~reikna.cluda.api.Thread.fork`) never share memory.
+        """
+
+        thr = self._thr if thread is None else thread
+        new_id, array, size = self._new_array(shape, dtype, strides, thr)
+
+        dependencies = extract_dependencies(dependencies)
+        dependencies.update(self._queue_dependencies(new_id, thr))
+
+        self._allocate(new_id, size, dependencies, self._pack_on_alloc)
+        self._register(new_id, array)
+
+        if self._pack_on_alloc:
+            self.update_all()
+        else:
+            self.update_buffer(new_id)
+
+        return array
+
+    def arrays(self, requests, thread=None):
+        """
+        Returns a list of temporary arrays used in a sequence of steps (e.g. kernel calls).
+
+        :param requests: a list of tuples ``(shape, dtype, strides, intervals)``,
+            where ``intervals`` is a list of inclusive ``(start, end)`` tuples
+            with the ranges of steps during which the contents of the array has to be preserved.
+            Arrays with overlapping intervals do not share memory.
+        :param thread: same as in :py:meth:`array`.
+        """
+        overlaps = overlapping_intervals([intervals for _, _, _, intervals in requests])
+        results = []
+        for (shape, dtype, strides, _), idxs in zip(requests, overlaps):
+            results.append(self.array(
+                shape, dtype, strides=strides,
+                dependencies=[results[idx] for idx in idxs if idx < len(results)],
+                thread=thread))
+        return results
+
+    def _new_array(self, shape, dtype, strides, thr):
+        """
+        Returns ``(id, array, size)`` for a new temporary array
+        which does not have a buffer assigned yet.
         """
 
         # Used to hook memory allocation in the array constructor
@@ -64,19 +131,21 @@ class TemporaryManager:
         self._id_counter += 1
 
         allocator = DummyAllocator()
-        array = self._thr.array(shape, dtype, strides=strides, allocator=allocator)
+        array = thr.array(shape, dtype, strides=strides, allocator=allocator)
         array.__tempalloc_id__ = new_id
 
-        dependencies = extract_dependencies(dependencies)
-        self._allocate(new_id, allocator.size, dependencies, self._pack_on_alloc)
-        self._arrays[new_id] = weakref.ref(array, lambda _: self.free(new_id))
+        return new_id, array, allocator.size
 
-        if self._pack_on_alloc:
-            self.update_all()
-        else:
-            self.update_buffer(new_id)
+    def _queue_dependencies(self, new_id, thr):
+        # Arrays used in different queues can be accessed concurrently,
+        # so they must not share memory.
+        queue_id = id(thr._queue)
+        self._queue_ids[new_id] = queue_id
+        return set(
+            id_ for id_, other_queue_id in self._queue_ids.items() if other_queue_id != queue_id)
 
-        return array
+    def _register(self, new_id, array):
+        self._arrays[new_id] = weakref.ref(array, lambda _: self.free(new_id))
 
     def update_buffer(self, id_):
         array = self._arrays[id_]()
@@ -96,6 +165,7 @@ class TemporaryManager:
             raise Exception("Attempting to free the buffer of an existing temporary array")
 
         del self._arrays[id_]
+        del self._queue_ids[id_]
         self._free(id_, self._pack_on_free)
         if self._pack_on_free:
             self.update_all()
@@ -202,7 +272,7 @@ class ZeroOffsetManager(TemporaryManager):
             self._real_id_counter += 1
 
             self._real_allocations[real_id] = self.RealAllocation(buf, set([new_id]))
-            self._real_sizes.insert(self.RealSize(size, real_id))
+            self._real_sizes.insert(self.RealSize(buf.size, real_id))
 
         # Here it would be more appropriate to use buffer.get_sub_region(0, size),
         # but OpenCL does not allow several overlapping subregions to be used in a single kernel
@@ -247,7 +317,7 @@ class ZeroOffsetManager(TemporaryManager):
 
         # Need to synchronize, because we are going to change allocation addresses,
         # and we do not want to free the memory some kernel is reading from.
-        self._thr.synchronize()
+        self._thr._synchronize_family()
 
         # Clear all real allocation data.
         self._real_sizes.clear()
@@ -290,3 +360,299 @@ class ZeroOffsetManager(TemporaryManager):
         stats['real_sizes'] = sorted(stats['real_sizes'])
 
         return stats
+
+
+class OffsetManager(TemporaryManager):
+    """
+    Places several allocation requests in a single real allocation (an arena)
+    at different offsets, if dependencies allow that.
+    Virtual allocations that depend on each other occupy non-overlapping regions of an arena,
+    while independent ones can overlap.
+    A virtual allocation is placed in the smallest suitable gap of existing arenas,
+    and a new arena is only allocated if there are no such gaps.
+    Packing places all virtual allocations in a single arena.
+
+    :param arena_size: the minimum size of a new arena in bytes.
+    """
+
+    VirtualAllocation = collections.namedtuple('VirtualAllocation', ['size', 'dependencies'])
+    VirtualMapping = collections.namedtuple(
+        'VirtualMapping', ['real_id', 'offset', 'sub_region'])
+
+    def __init__(self, *args, **kwds):
+        arena_size = kwds.pop('arena_size', 0)
+        TemporaryManager.__init__(self, *args, **kwds)
+
+        self._arena_size = arena_size
+
+        self._virtual_allocations = {} # id -> VirtualAllocation
+        self._virtual_to_real = {} # id -> VirtualMapping
+        self._real_allocations = {} # real_id -> buffer
+        self._real_virtual_ids = {} # real_id -> set of virtual ids
+        self._real_id_counter = 0
+
+    def _alignment(self):
+        # The beginning of a sub-region must be aligned
+        # (required in OpenCL, and desirable for the memory coalescing in both APIs).
+        return self._thr.device_params.mem_base_addr_align
+
+    def _aligned(self, size):
+        alignment = self._alignment()
+        return ((size + alignment - 1) // alignment) * alignment
+
+    def _allocate(self, new_id, size, dependencies, pack):
+
+        # Dependencies should be bidirectional.
+        # So if some new allocation says it depends on earlier ones,
+        # we need to update their dependency lists.
+        dep_set = set(dependencies)
+        for dep in dependencies:
+            if dep in self._virtual_allocations:
+                self._virtual_allocations[dep].dependencies.add(new_id)
+            else:
+                dep_set.remove(dep)
+
+        # Save virtual allocation parameters
+        self._virtual_allocations[new_id] = self.VirtualAllocation(size, dep_set)
+
+        if pack:
+            self._pack()
+        else:
+            self._fast_add(new_id, size, dep_set)
+
+    def arrays(self, requests, thread=None):
+        """
+        Same as :py:meth:`TemporaryManager.arrays`.
+        The arrays are placed in a single arena as an interval coloring problem:
+        going through them in the order of the start of their live intervals,
+        each one gets the lowest offset not overlapping with the arrays
+        whose live intervals overlap with its own.
+        """
+        if len(requests) == 0:
+            return []
+
+        thr = self._thr if thread is None else thread
+        new_arrays = [
+            self._new_array(shape, dtype, strides, thr) for shape, dtype, strides, _ in requests]
+        ids = [id_ for id_, _, _ in new_arrays]
+        sizes = [size for _, _, size in new_arrays]
+        overlaps = overlapping_intervals([intervals for _, _, _, intervals in requests])
+
+        queue_deps = set()
+        for id_ in ids:
+            queue_deps.update(self._queue_dependencies(id_, thr))
+        queue_deps.intersection_update(self._virtual_allocations)
+
+        for idx, id_ in enumerate(ids):
+            for dep in queue_deps:
+                self._virtual_allocations[dep].dependencies.add(id_)
+            dep_set = set(ids[other_idx] for other_idx in overlaps[idx]) | queue_deps
+            self._virtual_allocations[id_] = self.VirtualAllocation(sizes[idx], dep_set)
+
+        offsets = {}
+        order = sorted(
+            range(len(requests)), key=lambda idx: (min(requests[idx][3]), -sizes[idx], idx))
+        for idx in order:
+            occupied = [
+                (offsets[other_idx], sizes[other_idx])
+                for other_idx in overlaps[idx] if other_idx in offsets]
+            offsets[idx] = self._find_first_gap(sizes[idx], occupied)
+
+        # Use the smallest existing arena that can hold all the arrays,
+        # as long as it is not used in other queues.
+        required_size = max(offsets[idx] + sizes[idx] for idx in offsets)
+        best = None
+        for real_id, buf in self._real_allocations.items():
+            if (buf.size >= required_size
+                    and self._real_virtual_ids[real_id].isdisjoint(queue_deps)
+                    and (best is None or buf.size < self._real_allocations[best].size)):
+                best = real_id
+
+        if best is None:
+            buf = self._thr.allocate(max(required_size, self._arena_size))
+            real_id = self._real_id_counter
+            self._real_id_counter += 1
+            self._real_allocations[real_id] = buf
+            self._real_virtual_ids[real_id] = set()
+        else:
+            real_id = best
+            buf = self._real_allocations[real_id]
+
+        for idx, id_ in enumerate(ids):
+            self._real_virtual_ids[real_id].add(id_)
+            self._virtual_to_real[id_] = self.VirtualMapping(
+                real_id, offsets[idx], self._sub_region(buf, offsets[idx], sizes[idx]))
+
+        for id_, array, _ in new_arrays:
+            self._register(id_, array)
+
+        if self._pack_on_alloc:
+            self._pack()
+            self.update_all()
+        else:
+            for id_ in ids:
+                self.update_buffer(id_)
+
+        return [array for _, array, _ in new_arrays]
+
+    def _find_gap(self, size, occupied, limit):
+        """
+        Returns ``(offset, gap_size)`` for the smallest gap of at least ``size`` bytes
+        between ``occupied`` regions (a list of ``(offset, size)`` tuples) below ``limit``,
+        or ``None`` if there is no such gap.
+        """
+        best = None
+        offset = 0
+        for region_offset, region_size in sorted(occupied) + [(limit, 0)]:
+            gap_size = region_offset - offset
+            if gap_size >= size and (best is None or gap_size < best[1]):
+                best = (offset, gap_size)
+            offset = max(offset, self._aligned(region_offset + region_size))
+        return best
+
+    def _occupied(self, real_id, dep_set):
+        # Only the regions of dependencies are occupied for a new virtual allocation,
+        # the regions of other virtual allocations can be reused.
+        result = []
+        for id_ in self._real_virtual_ids[real_id]:
+            if id_ in dep_set:
+                mapping = self._virtual_to_real[id_]
+                result.append((mapping.offset, self._virtual_allocations[id_].size))
+        return result
+
+    def _fast_add(self, new_id, size, dep_set):
+        """
+        Best-fit algorithm to find a place for a given virtual allocation in existing arenas.
+        """
+
+        best = None
+        for real_id, buf in self._real_allocations.items():
+            gap = self._find_gap(size, self._occupied(real_id, dep_set), buf.size)
+            if gap is not None and (best is None or gap[1] < best[2]):
+                best = (real_id, gap[0], gap[1])
+
+        if best is None:
+            # If no suitable gap is found, create a new arena.
+            buf = self._thr.allocate(max(size, self._arena_size))
+            real_id = self._real_id_counter
+            self._real_id_counter += 1
+            self._real_allocations[real_id] = buf
+            self._real_virtual_ids[real_id] = set()
+            offset = 0
+        else:
+            real_id, offset, _ = best
+            buf = self._real_allocations[real_id]
+
+        self._real_virtual_ids[real_id].add(new_id)
+
+        # Independent virtual allocations can overlap, but they are never used
+        # in the same kernel, so the OpenCL restriction on using overlapping sub-regions
+        # in a single kernel is not violated.
+        self._virtual_to_real[new_id] = self.VirtualMapping(
+            real_id, offset, self._sub_region(buf, offset, size))
+
+    def _sub_region(self, buf, offset, size):
+        if offset == 0 and size == buf.size:
+            return buf
+        else:
+            return buf.get_sub_region(offset, size)
+
+    def _get_buffer(self, id_):
+        return self._virtual_to_real[id_].sub_region
+
+    def _free(self, id_, pack=False):
+        # Remove the allocation from the dependency lists of its dependencies
+        dep_set = self._virtual_allocations[id_].dependencies
+        for dep in dep_set:
+            self._virtual_allocations[dep].dependencies.remove(id_)
+
+        vtr = self._virtual_to_real[id_]
+
+        # Clear virtual allocation data
+        del self._virtual_allocations[id_]
+        del self._virtual_to_real[id_]
+
+        if pack:
+            self._pack()
+        else:
+            # Delete the arena if it is no longer used by other virtual allocations.
+            virtual_ids = self._real_virtual_ids[vtr.real_id]
+            virtual_ids.remove(id_)
+            if len(virtual_ids) == 0:
+                del self._real_allocations[vtr.real_id]
+                del self._real_virtual_ids[vtr.real_id]
+
+    def _pack(self):
+        """
+        Full memory re-pack.
+        Places all virtual allocations in a single arena, starting from the largest ones,
+        each one at the lowest offset not overlapping with its dependencies.
+        """
+
+        # Need to synchronize, because we are going to change allocation addresses,
+        # and we do not want to free the memory some kernel is reading from.
+        self._thr._synchronize_family()
+
+        va = self._virtual_allocations
+
+        offsets = {}
+        for id_ in sorted(va, key=lambda id_: (-va[id_].size, id_)):
+            occupied = [
+                (offsets[dep], va[dep].size) for dep in va[id_].dependencies if dep in offsets]
+            offsets[id_] = self._find_first_gap(va[id_].size, occupied)
+
+        self._real_allocations = {}
+        self._real_virtual_ids = {}
+        self._virtual_to_real = {}
+        self._real_id_counter = 0
+
+        if len(va) == 0:
+            return
+
+        arena_size = max(offsets[id_] + va[id_].size for id_ in va)
+        buf = self._thr.allocate(max(arena_size, self._arena_size))
+        self._real_allocations[0] = buf
+        self._real_virtual_ids[0] = set(va)
+        self._real_id_counter = 1
+
+        for id_ in va:
+            offset = offsets[id_]
+            self._virtual_to_real[id_] = self.VirtualMapping(
+                0, offset, self._sub_region(buf, offset, va[id_].size))
+
+    def _find_first_gap(self, size, occupied):
+        """
+        Returns the lowest aligned offset where ``size`` bytes do not overlap
+        with ``occupied`` regions (a list of ``(offset, size)`` tuples).
+        """
+        offset = 0
+        for region_offset, region_size in sorted(occupied):
+            if region_offset - offset >= size:
+                break
+            offset = max(offset, self._aligned(region_offset + region_size))
+        return offset
+
+    def _statistics(self):
+
+        stats = dict(
+            virtual_size_total=0,
+            virtual_num=0,
+            real_size_total=0,
+            real_num=0,
+            virtual_sizes=[],
+            real_sizes=[])
+
+        for va in self._virtual_allocations.values():
+            stats['virtual_size_total'] += va.size
+            stats['virtual_num'] += 1
+            stats['virtual_sizes'].append(va.size)
+
+        for buf in self._real_allocations.values():
+            stats['real_size_total'] += buf.size
+            stats['real_num'] += 1
+            stats['real_sizes'].append(buf.size)
+
+        stats['virtual_sizes'] = sorted(stats['virtual_sizes'])
+        stats['real_sizes'] = sorted(stats['real_sizes'])
+
+        return stats
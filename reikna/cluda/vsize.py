@@ -121,6 +121,91 @@ def find_local_size(global_size, flat_local_size, threshold=0.05):
     return best_local_size
 
 
+def _occupancy_known(device_params):
+    return all(value is not None for value in [
+        device_params.max_threads_per_compute_unit,
+        device_params.max_groups_per_compute_unit,
+        device_params.registers_per_compute_unit,
+        device_params.local_mem_per_compute_unit])
+
+
+def occupancy(device_params, flat_local_size, registers, local_mem):
+    """
+    Returns the ratio of the number of threads that can be active simultaneously
+    on a compute unit when the kernel is executed with the work group size ``flat_local_size``
+    to the maximum number of active threads per compute unit.
+    ``registers`` is the number of registers used by each thread,
+    and ``local_mem`` is the amount of local memory (in bytes) used by each work group.
+    """
+    warp_size = device_params.warp_size
+    max_threads = device_params.max_threads_per_compute_unit
+
+    # Threads are scheduled in warps, so the resources are allocated for whole warps.
+    allocated_size = min_blocks(flat_local_size, warp_size) * warp_size
+
+    groups = min(max_threads // allocated_size, device_params.max_groups_per_compute_unit)
+    if registers > 0:
+        groups = min(
+            groups, device_params.registers_per_compute_unit // (registers * allocated_size))
+    if local_mem > 0:
+        groups = min(groups, device_params.local_mem_per_compute_unit // local_mem)
+
+    return float(groups * flat_local_size) / max_threads
+
+
+def sort_by_occupancy(device_params, items, flat_local_sizes, local_mems):
+    """
+    Returns ``items`` sorted by the decreasing occupancy (see :py:func:`occupancy`)
+    of the kernels with the corresponding work group sizes ``flat_local_sizes``
+    and amounts of local memory ``local_mems``.
+    Intended for the kernels whose source depends on the local size,
+    so the number of registers is not known and is not taken into account.
+    The relative order of the items with the same occupancy is preserved,
+    and if the device limits are not known, ``items`` are returned unchanged.
+    """
+    if not _occupancy_known(device_params):
+        return list(items)
+
+    occupancies = [
+        occupancy(device_params, flat_local_size, 0, local_mem)
+        for flat_local_size, local_mem in zip(flat_local_sizes, local_mems)]
+    order = sorted(range(len(occupancies)), key=lambda i: -occupancies[i])
+    return [items[i] for i in order]
+
+
+def find_flat_local_size(device_params, flat_global_size, max_work_group_size,
+        registers=None, local_mem=None):
+    """
+    Returns the total number of threads in a work group for a kernel
+    with ``flat_global_size`` threads in total.
+    If the resource usage of the kernel (``registers`` per thread and ``local_mem`` bytes
+    per work group) and the corresponding limits of the device are known,
+    picks the largest work group size with the best occupancy.
+    Otherwise assumes that the more threads in a work group, the better.
+    """
+    multiple = device_params.warp_size
+
+    if flat_global_size < max_work_group_size:
+        return flat_global_size
+    elif max_work_group_size < multiple:
+        return 1
+
+    flat_local_size = multiple * (max_work_group_size // multiple)
+
+    if registers is None or local_mem is None or not _occupancy_known(device_params):
+        return flat_local_size
+
+    best_occupancy = 0
+    best_local_size = flat_local_size
+    for candidate in _range(flat_local_size, 0, -multiple):
+        candidate_occupancy = occupancy(device_params, candidate, registers, local_mem)
+        if candidate_occupancy > best_occupancy:
+            best_occupancy = candidate_occupancy
+            best_local_size = candidate
+
+    return best_local_size
+
+
 def _group_dimensions(vdim, virtual_shape, adim, available_shape):
     """
     ``vdim`` and ``adim`` are used for the absolute addressing of dimensions during recursive calls.
@@ -255,7 +340,7 @@ class ShapeGroups:
 class VirtualSizes:
 
     def __init__(self, device_params, virtual_global_size,
-            virtual_local_size=None, max_local_size=None):
+            virtual_local_size=None, max_local_size=None, registers=None, local_mem=None):
 
         virtual_global_size = wrap_in_tuple(virtual_global_size)
         if virtual_local_size is not None:
@@ -286,17 +371,9 @@ class VirtualSizes:
             max_work_item_sizes = device_params.max_work_item_sizes
 
         if virtual_local_size is None:
-            # FIXME: we can obtain better results by taking occupancy into account here,
-            # but for now we will assume that the more threads, the better.
-            flat_global_size = product(virtual_global_size)
-            multiple = device_params.warp_size
-
-            if flat_global_size < max_work_group_size:
-                flat_local_size = flat_global_size
-            elif max_work_group_size < multiple:
-                flat_local_size = 1
-            else:
-                flat_local_size = multiple * (max_work_group_size // multiple)
+            flat_local_size = find_flat_local_size(
+                device_params, product(virtual_global_size), max_work_group_size,
+                registers=registers, local_mem=local_mem)
 
             # product(virtual_local_size) == flat_local_size <= max_work_group_size
             virtual_local_size = find_local_size(virtual_global_size, flat_local_size)
@@ -1,3 +1,8 @@
 from reikna.core.signature import Type, Annotation, Parameter, Signature
-from reikna.core.computation import Computation
+from reikna.core.computation import Computation, CompilationCache
 from reikna.core.transformation import Transformation, Indices
+from reikna.core.tuning import Tuner, TuningDatabase
+from reikna.core.graph import LaunchGraph
+from reikna.core.parallel import DataParallel
+from reikna.core.streaming import Streaming
+from reikna.core.variable_batch import VariableBatch
@@ -1,7 +1,9 @@
+import os.path
 import weakref
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 
-from reikna.helpers import Graph
+from reikna.helpers import structural_key, product
+from reikna.cluda import OutOfResourcesError
 from reikna.core.signature import Parameter, Annotation, Type, Signature
 from reikna.core.transformation import TransformationTree, TransformationParameter
 
@@ -180,22 +182,115 @@ class Computation:
     def _translate_tree(self, translator):
         return self._tr_tree.translate(translator)
 
-    def _get_plan(self, tr_tree, translator, thread, fast_math):
-        plan_factory = lambda: ComputationPlan(tr_tree, translator, thread, fast_math)
+    def _get_plan(self, tr_tree, translator, thread, fast_math,
+            build_workers=1, merge_kernels=False, tuner=None, fuse_kernels=False):
+        plan_factory = PlanFactory(
+            tr_tree, translator, thread, fast_math,
+            build_workers=build_workers, merge_kernels=merge_kernels, tuner=tuner,
+            fuse_kernels=fuse_kernels)
         args = [
             KernelArgument(param.name, param.annotation.type)
             for param in tr_tree.get_root_parameters()]
         return self._build_plan(plan_factory, thread.device_params, *args)
 
-    def compile(self, thread, fast_math=False):
+    def _as_transformation(self):
+        """
+        Returns a :py:class:`~reikna.core.Transformation` object with the same parameters
+        producing the same results as this computation, or ``None`` if there is no such object.
+        Used to fuse nested computation calls (see the ``fuse_kernels`` parameter
+        of :py:meth:`compile`).
+        """
+        return None
+
+    def _tuned(self, plan_factory, name, candidates, build, args, problem=None):
+        """
+        Returns the best of ``candidates`` for the parameter ``name`` according to the tuner
+        the computation is compiled with, or ``None`` if it is not known.
+        ``build(plan_factory, candidate, *args)`` must return a plan for the given candidate,
+        or raise :py:class:`~reikna.cluda.OutOfResourcesError` or ``ValueError``.
+        ``args`` are the arguments passed to :py:meth:`_build_plan`,
+        and ``problem`` is a tuple with additional values the choice depends on.
+        """
+        tuner = plan_factory.tuner
+        if tuner is None or len(candidates) < 2:
+            return None
+
+        thread = plan_factory.thread
+        fast_math = plan_factory.fast_math
+
+        def measure(candidate):
+            # Candidates are measured for this computation alone
+            # (with its own transformations), even if it is nested in another one.
+            # Nested computations are not tuned during the measurement.
+            standalone_factory = PlanFactory(
+                self._tr_tree, Translator.identity(), thread, fast_math)
+            root_args = [
+                KernelArgument(param.name, param.annotation.type)
+                for param in self._tr_tree.get_root_parameters()]
+            plan = build(standalone_factory, candidate, *root_args)
+            return tuner.time(plan.finalize())
+
+        key = tuner.key(thread, self, name, args, problem=problem, fast_math=fast_math)
+        return tuner.pick(key, candidates, measure)
+
+    def compile(self, thread, fast_math=False, cache=None, build_workers=1, merge_kernels=False,
+            tuner=None, fuse_kernels=False):
         """
         Compiles the computation with the given :py:class:`~reikna.cluda.api.Thread` object
         and returns a :py:class:`~reikna.core.computation.ComputationCallable` object.
         If ``fast_math`` is enabled, the compilation of all kernels is performed using
         the compiler options for fast and imprecise mathematical functions.
+        If ``cache`` (a :py:class:`~reikna.core.CompilationCache` object) is given,
+        and a structurally identical computation was already compiled with it
+        for the same thread, the previously compiled callable is returned.
+        If ``build_workers`` is not equal to 1, kernel programs are not built
+        as soon as they are added to the plan, but all at once when the plan is finalized,
+        using ``build_workers`` threads (``None`` means the number of CPUs in the system).
+        If ``merge_kernels`` is ``True``, kernel programs are also built at the finalization,
+        but all kernels are placed in a single program, so that the prelude and common modules
+        are only compiled once (kernels for which it is not possible are built separately).
+        If some kernel turns out to require more resources than available
+        only after it is built, the plan is created again with kernels being built one by one,
+        so that the computation could pick different kernel parameters.
+        If ``tuner`` (a :py:class:`~reikna.core.Tuner` object) is given,
+        the computations that support it use the kernel parameters
+        found by measuring their performance on the device.
+        If ``fuse_kernels`` is ``True``, the creation of plans for nested computations
+        is deferred until the finalization, and a call to an elementwise computation
+        (a :py:class:`~reikna.algorithms.PureParallel` created by
+        :py:meth:`~reikna.algorithms.PureParallel.from_trf`) whose only output
+        is a temporary array read by the next nested computation call only
+        is merged into this call as an input transformation.
+        This way the intermediate values stay in registers, and the temporary array
+        is not allocated.
         """
+        if cache is not None:
+            key = cache.key(
+                self, thread, fast_math, tuner=tuner, fuse_kernels=fuse_kernels)
+            compiled = cache.get(key)
+            if compiled is not None:
+                return compiled
+
         translator = Translator.identity()
-        return self._get_plan(self._tr_tree, translator, thread, fast_math).finalize()
+        try:
+            compiled = self._get_plan(
+                self._tr_tree, translator, thread, fast_math,
+                build_workers=build_workers, merge_kernels=merge_kernels,
+                tuner=tuner, fuse_kernels=fuse_kernels).finalize()
+        except OutOfResourcesError:
+            if build_workers == 1 and not merge_kernels:
+                raise
+            # Computations react to OutOfResourcesError raised by kernel_call()
+            # by trying other kernel parameters, which is only possible
+            # if the kernels are built right away.
+            compiled = self._get_plan(
+                self._tr_tree, translator, thread, fast_math, tuner=tuner,
+                fuse_kernels=fuse_kernels).finalize()
+
+        if cache is not None:
+            cache.put(key, compiled)
+
+        return compiled
 
     def _build_plan(self, plan_factory, device_params, *args):
         """
@@ -214,6 +309,104 @@ class Computation:
         raise NotImplementedError
 
 
+class CompilationCache:
+    """
+    An in-process cache of compiled computations
+    (see the ``cache`` parameter of :py:meth:`~reikna.core.Computation.compile`).
+    The computations are identified by their class, attributes
+    (in particular, the values passed to the constructor),
+    connected transformations, the thread they are compiled for,
+    the ``fast_math`` and ``fuse_kernels`` values, and the mode and the database of the tuner.
+    Least recently used entries are evicted when either of the limits is exceeded.
+
+    :param max_entries: the maximum number of compiled computations to keep.
+    :param max_nbytes: the maximum total size (in bytes) of the device arrays
+        owned by the kept compiled computations (persistent and temporary ones).
+        If ``None``, the size is not limited.
+
+    .. py:attribute:: hits
+
+        The number of lookups that returned a compiled computation.
+
+    .. py:attribute:: misses
+
+        The number of lookups that failed.
+    """
+
+    def __init__(self, max_entries=128, max_nbytes=None):
+        self.max_entries = max_entries
+        self.max_nbytes = max_nbytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict() # key -> (compiled computation, nbytes)
+
+    def key(self, computation, thread, fast_math, tuner=None, fuse_kernels=False):
+        """
+        Returns a hashable key for the given compilation parameters.
+        """
+        # The tuner and the kernel fusion change the plan of the computation.
+        if tuner is None or tuner.mode == 'off':
+            tuner_key = None
+        else:
+            tuner_key = (tuner.mode, os.path.abspath(tuner.database.path))
+
+        return (
+            structural_key(computation),
+            # The compiled callable is bound to the thread,
+            # so the cache cannot be shared between different threads.
+            # The cached callable keeps a reference to the thread,
+            # so its ``id`` cannot be reused while the entry exists.
+            id(thread),
+            structural_key(thread.device_params),
+            bool(fast_math),
+            tuner_key,
+            bool(fuse_kernels))
+
+    def get(self, key):
+        """
+        Returns the compiled computation for the given ``key``, or ``None``.
+        """
+        if key in self._entries:
+            compiled, nbytes = self._entries.pop(key)
+            # The thread may have been released after the computation was compiled.
+            if not compiled.thread._released:
+                self._entries[key] = (compiled, nbytes)
+                self.hits += 1
+                return compiled
+            self.nbytes -= nbytes
+
+        self.misses += 1
+        return None
+
+    def put(self, key, compiled):
+        """
+        Saves a compiled computation (a :py:class:`ComputationCallable` object).
+        """
+        if key in self._entries:
+            _, nbytes = self._entries.pop(key)
+            self.nbytes -= nbytes
+
+        nbytes = compiled._device_nbytes()
+        self._entries[key] = (compiled, nbytes)
+        self.nbytes += nbytes
+
+        while len(self._entries) > 0 and (len(self._entries) > self.max_entries or
+                (self.max_nbytes is not None and self.nbytes > self.max_nbytes)):
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self.nbytes -= nbytes
+
+    def clear(self):
+        """
+        Removes all the entries.
+        """
+        self._entries.clear()
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
 class IdGen:
     """
     Encapsulates a simple ID generator.
@@ -244,18 +437,47 @@ class KernelArgument(Type):
         return "KernelArgument(" + self.name + ")"
 
 
+class PlanFactory:
+    """
+    A callable creating new :py:class:`ComputationPlan` objects
+    with the given compilation parameters.
+    """
+
+    def __init__(self, tr_tree, translator, thread, fast_math,
+            build_workers=1, merge_kernels=False, tuner=None, fuse_kernels=False):
+        self._tr_tree = tr_tree
+        self._translator = translator
+        self.thread = thread
+        self.fast_math = fast_math
+        self._build_workers = build_workers
+        self._merge_kernels = merge_kernels
+        self.tuner = tuner
+        self._fuse_kernels = fuse_kernels
+
+    def __call__(self):
+        return ComputationPlan(
+            self._tr_tree, self._translator, self.thread, self.fast_math,
+            build_workers=self._build_workers, merge_kernels=self._merge_kernels,
+            tuner=self.tuner, fuse_kernels=self._fuse_kernels)
+
+
 class ComputationPlan:
     """
     Computation plan recorder.
     """
 
-    def __init__(self, tr_tree, translator, thread, fast_math):
+    def __init__(self, tr_tree, translator, thread, fast_math,
+            build_workers=1, merge_kernels=False, tuner=None, fuse_kernels=False):
         """__init__()""" # hide the signature from Sphinx
 
         self._thread = thread
         self._tr_tree = tr_tree
         self._translator = translator
         self._fast_math = fast_math
+        self._build_workers = build_workers
+        self._merge_kernels = merge_kernels
+        self._tuner = tuner
+        self._fuse_kernels = fuse_kernels
 
         self._nested_comp_idgen = IdGen('_nested')
         self._persistent_value_idgen = IdGen('_value')
@@ -296,6 +518,8 @@ class ComputationPlan:
         Temporary arrays can share physical memory, but in such a way that
         their contents is guaranteed to persist between the first and the last use in a kernel
         during the execution of the plan.
+        A write ends the preservation only if the kernel is declared to overwrite
+        the whole array (see the ``overwrites`` parameter of :py:meth:`kernel_call`).
         """
         name = self._translator(self._temp_array_idgen())
         ann = Annotation(Type(dtype, shape=shape, strides=strides), 'io')
@@ -381,7 +605,7 @@ class ComputationPlan:
         return [arg.name for arg in args]
 
     def kernel_call(self, template_def, args, global_size,
-            local_size=None, render_kwds=None):
+            local_size=None, render_kwds=None, overwrites=None):
         """
         Adds a kernel call to the plan.
 
@@ -394,6 +618,11 @@ class ComputationPlan:
         :param local_size: local size to use for the call, in **row-major** order.
             If ``None``, the local size will be picked automatically.
         :param render_kwds: dictionary with additional values used to render the template.
+        :param overwrites: a list of :py:class:`~reikna.core.computation.KernelArgument` objects
+            from ``args`` corresponding to the temporary arrays the kernel writes completely,
+            without using their previous contents.
+            Their memory can then be shared with other temporary arrays before this call.
+            By default, a write is assumed to cover only a part of the array.
         """
 
         processed_args, adhoc_values = self._process_kernel_arguments(args)
@@ -412,9 +641,25 @@ class ComputationPlan:
             template_def, kernel_name, global_size, local_size=local_size,
             render_args=[kernel_declaration] + kernel_argobjects,
             render_kwds=render_kwds,
-            fast_math=self._fast_math)
+            fast_math=self._fast_math,
+            build=(self._build_workers == 1 and not self._merge_kernels))
 
-        self._kernels.append(PlannedKernelCall(kernel, kernel_leaf_names, adhoc_values))
+        read_names = set(
+            param.name for param in subtree.get_leaf_parameters() if param.annotation.input)
+
+        overwrite_names = set()
+        if overwrites is not None:
+            arg_names = set(arg.name for arg in args if isinstance(arg, KernelArgument))
+            for arg in overwrites:
+                if arg.name not in arg_names:
+                    raise ValueError(
+                        "The overwritten array " + repr(arg.name) + " is not a kernel argument")
+                overwrite_names.add(arg.name)
+            read_names -= overwrite_names
+
+        self._kernels.append(PlannedKernelCall(
+            kernel, kernel_leaf_names, adhoc_values,
+            read_names=read_names, overwrite_names=overwrite_names))
 
     def computation_call(self, computation, *args, **kwds):
         """
@@ -426,17 +671,76 @@ class ComputationPlan:
         signature = computation.signature
         argnames = self._process_computation_arguments(signature, args, kwds)
 
-        # We want to preserve the Computation object for which we're calling _build_plan()
-        # (because it may have attributes created by the constructor of the derived class),
-        # but we need to translate its tree to integrate names of its nodes into
-        # the parent namespace.
-        translator = self._translator.get_nested(
-            signature.parameters, argnames, self._nested_comp_idgen())
-        new_tree = computation._translate_tree(translator)
-        new_tree.reconnect(self._tr_tree)
+        call = PlannedComputationCall(
+            computation, argnames, self._translator, self._tr_tree, self._nested_comp_idgen())
+
+        if self._fuse_kernels:
+            # The plan for the call is created in finalize(),
+            # when it is known whether it can be fused with the neighbouring ones.
+            self._kernels.append(call)
+        else:
+            self._append_plan(self._get_nested_plan(call))
+
+    def _get_nested_plan(self, call):
+        return call.get_plan(
+            self._thread, self._fast_math,
+            build_workers=self._build_workers, merge_kernels=self._merge_kernels,
+            tuner=self._tuner, fuse_kernels=self._fuse_kernels)
+
+    def _fusion_target(self, call, next_call, usage):
+        """
+        Returns the name of the array through which ``call`` can be fused
+        into ``next_call``, or ``None`` if it cannot be fused.
+        """
+        trf = call.computation._as_transformation()
+        if trf is None:
+            return None
+
+        outputs = list(call.output_names)
+        if len(outputs) != 1:
+            return None
+        name = outputs[0]
+
+        # The intermediate array must not be needed by anyone except these two calls,
+        # and must be only read by the second one.
+        if (name not in self._temp_arrays or usage[name] != 2
+                or call.argnames.count(name) != 1
+                or name not in next_call.types or name in next_call.output_names):
+            return None
+
+        # The inputs of the first call are read during the execution of the second one,
+        # so they must not be overwritten by it.
+        if any(argname in next_call.output_names for argname in call.argnames):
+            return None
+
+        for argname, type_ in call.types.items():
+            if argname in next_call.types and next_call.types[argname] != type_:
+                return None
+
+        return name
+
+    def _fuse(self, kernels):
+        """
+        Merges elementwise nested computation calls into the calls following them.
+        """
+        usage = {}
+        for kernel in kernels:
+            for argname in set(kernel.argnames):
+                usage[argname] = usage.get(argname, 0) + 1
+
+        # Going backwards, so that chains of elementwise calls
+        # are fused into the last call one after another.
+        result = []
+        for kernel in reversed(kernels):
+            if (len(result) > 0 and isinstance(kernel, PlannedComputationCall)
+                    and isinstance(result[-1], PlannedComputationCall)):
+                name = self._fusion_target(kernel, result[-1], usage)
+                if name is not None:
+                    result[-1] = result[-1].fused_with(kernel, name)
+                    continue
+            result.append(kernel)
 
-        self._append_plan(computation._get_plan(
-            new_tree, translator, self._thread, self._fast_math))
+        return result[::-1]
 
     def _append_plan(self, plan):
         self._kernels += plan._kernels
@@ -446,50 +750,45 @@ class ComputationPlan:
 
     def finalize(self):
 
-        # We need to add inferred dependencies between temporary buffers.
-        # Basically, we assume that if some buffer X was used first in kernel M
-        # and last in kernel N, all buffers in kernels from M+1 till N-1 depend on it
-        # (in other words, data in X has to persist from call M till call N)
-
-        # Record first and last kernel when a certain temporary array was used.
-        usage = {}
-        for i, kernel in enumerate(self._kernels):
-            for argname in kernel.argnames:
-                if argname not in self._temp_arrays:
-                    continue
-                if argname in usage:
-                    usage[argname][1] = i
+        # Create the plans for deferred nested computation calls.
+        # These plans can contain deferred calls of their own.
+        while any(isinstance(kernel, PlannedComputationCall) for kernel in self._kernels):
+            kernels = self._fuse(self._kernels)
+            self._kernels = []
+            for kernel in kernels:
+                if isinstance(kernel, PlannedComputationCall):
+                    self._append_plan(self._get_nested_plan(kernel))
                 else:
-                    usage[argname] = [i, i]
-
-        # Convert usage to dependencies.
-        # Basically, if usage ranges of two arrays overlap, they are dependent.
-        dependencies = Graph()
-        for name, pair in usage.items():
-            start, end = pair
-            for i in range(start, end + 1):
-                for other_name in self._kernels[i].argnames:
-                    if other_name not in self._temp_arrays or other_name == name:
-                        continue
-                    dependencies.add_edge(name, other_name)
+                    self._kernels.append(kernel)
+
+        # Build the programs for kernels whose building was deferred.
+        # May raise OutOfResourcesError.
+        self._thread.build_static_kernels(
+            [kernel.kernel for kernel in self._kernels],
+            num_workers=self._build_workers, merge=self._merge_kernels)
+
+        intervals = self._live_intervals()
 
         # Create a dictionary of internal values to be used by kernels.
 
         internal_args = dict(self._persistent_values)
 
-        # Allocate buffers specifying the dependencies
-        all_buffers = []
-        for name in self._temp_arrays:
-            dependent_buffers = []
-            for dep in dependencies[name]:
-                if dep in internal_args:
-                    dependent_buffers.append(internal_args[dep])
+        # Allocate buffers specifying the live intervals of the arrays
+        # (skipping the ones that are not used by any kernel, e.g. made redundant by fusion).
+        # Allocating the largest arrays first makes it easier for the manager
+        # to fit the smaller ones in the same memory.
+        def allocation_order(name):
+            type_ = self._internal_annotations[name].type
+            return (-product(type_.shape) * type_.dtype.itemsize, name)
 
+        names = sorted(intervals, key=allocation_order)
+        requests = []
+        for name in names:
             type_ = self._internal_annotations[name].type
-            new_buf = self._thread.temp_array(
-                type_.shape, type_.dtype, strides=type_.strides, dependencies=dependent_buffers)
-            internal_args[name] = new_buf
-            all_buffers.append(new_buf)
+            requests.append((type_.shape, type_.dtype, type_.strides, intervals[name]))
+
+        all_buffers = self._thread.temp_arrays(requests)
+        internal_args.update(zip(names, all_buffers))
 
         return ComputationCallable(
             self._thread,
@@ -499,12 +798,131 @@ class ComputationPlan:
             all_buffers)
 
 
+    def _live_intervals(self):
+        """
+        Returns a dictionary with lists of ``(start, end)`` tuples for each used temporary array,
+        with the ranges of kernel indices during which its contents has to be preserved.
+        """
+
+        uses = {}
+        for i, kernel in enumerate(self._kernels):
+            for argname in set(kernel.argnames):
+                if argname in self._temp_arrays:
+                    uses.setdefault(argname, []).append(
+                        (i, argname in kernel.read_names, argname in kernel.overwrite_names))
+
+        intervals = {}
+        for name, name_uses in uses.items():
+            # A kernel declared to overwrite the whole array
+            # does not need its previous contents, so it starts a new interval.
+            segments = []
+            for use in name_uses:
+                if use[2] or len(segments) == 0:
+                    segments.append([])
+                segments[-1].append(use)
+
+            # Within a segment, the data has to persist from its first use
+            # till the last kernel reading it.
+            # Other writes do not end the interval, since they may only cover
+            # a part of the array.
+            # The kernels writing to the array after the last read still need it,
+            # but only for the duration of the call.
+            spans = []
+            for segment in segments:
+                start = segment[0][0]
+                end = max([i for i, read, _ in segment if read] + [start])
+                spans.append((start, end))
+                spans.extend((i, i) for i, _, _ in segment if i > end)
+            intervals[name] = spans
+
+        return intervals
+
+
+class PlannedComputationCall:
+    """
+    A nested computation call whose plan has not been created yet.
+    """
+
+    def __init__(self, computation, argnames, translator, tr_tree, prefix):
+        self.computation = computation
+        self.argnames = argnames
+        self._translator = translator
+        self._tr_trees = [tr_tree]
+        self._prefix = prefix
+        # A list of transformations to connect to the computation tree,
+        # in the form of ``(node_name, trf, node_from_tr)``.
+        self._fused = []
+
+        # Types and roles of arrays as seen by the computation
+        self.types = {}
+        self.output_names = set()
+        for argname, param in zip(argnames, computation.signature.parameters.values()):
+            if not param.annotation.array:
+                continue
+            self.types[argname] = param.annotation.type
+            if param.annotation.output:
+                self.output_names.add(argname)
+
+    def fused_with(self, call, name):
+        """
+        Returns a new object with the elementwise ``call`` producing the array ``name``
+        connected to the input of this call.
+        """
+        trf = call.computation._as_transformation()
+        node_from_tr = dict(
+            (param_name, argname) for param_name, argname
+            in zip(call.computation.signature.parameters, call.argnames))
+
+        res = PlannedComputationCall.__new__(PlannedComputationCall)
+        res.computation = self.computation
+        res.argnames = self.argnames + [
+            argname for argname in call.argnames if argname != name]
+        res._translator = self._translator
+        res._tr_trees = self._tr_trees + [
+            tr_tree for tr_tree in call._tr_trees
+            if not any(tr_tree is other for other in self._tr_trees)]
+        res._prefix = self._prefix
+        res._fused = self._fused + [(name, trf, node_from_tr)]
+
+        res.types = dict(self.types)
+        for argname, type_ in call.types.items():
+            if argname != name:
+                res.types[argname] = type_
+        res.output_names = self.output_names
+
+        return res
+
+    def get_plan(self, thread, fast_math, **kwds):
+        signature = self.computation.signature
+
+        # We want to preserve the Computation object for which we're calling _build_plan()
+        # (because it may have attributes created by the constructor of the derived class),
+        # but we need to translate its tree to integrate names of its nodes into
+        # the parent namespace.
+        translator = self._translator.get_nested(
+            signature.parameters, self.argnames[:len(signature.parameters)], self._prefix)
+        new_tree = self.computation._translate_tree(translator)
+
+        # Fused transformations are connected before the ones from the parent trees,
+        # so that the latter could be attached to the new leaves.
+        for node_name, trf, node_from_tr in self._fused:
+            new_tree.connect(node_name, trf, node_from_tr)
+        for tr_tree in self._tr_trees:
+            new_tree.reconnect(tr_tree)
+
+        return self.computation._get_plan(new_tree, translator, thread, fast_math, **kwds)
+
+
 class PlannedKernelCall:
 
-    def __init__(self, kernel, argnames, adhoc_values):
-        self._kernel = kernel
+    def __init__(self, kernel, argnames, adhoc_values, read_names=None, overwrite_names=None):
+        self.kernel = kernel
         self.argnames = argnames
         self._adhoc_values = adhoc_values
+        # Names of the arguments the kernel can read from
+        self.read_names = set(argnames) if read_names is None else read_names
+        # Names of the arguments the kernel overwrites completely
+        self.overwrite_names = set() if overwrite_names is None else overwrite_names
 
     def finalize(self, known_args):
         args = [None] * len(self.argnames)
@@ -518,7 +936,7 @@ class PlannedKernelCall:
             else:
                 external_arg_positions.append((name, i))
 
-        return KernelCall(self._kernel, self.argnames, args, external_arg_positions)
+        return KernelCall(self.kernel, self.argnames, args, external_arg_positions)
 
 
 class ComputationCallable:
@@ -548,6 +966,20 @@ class ComputationCallable:
         self._internal_args = internal_args
         self.__tempalloc__ = temp_buffers
 
+        param_positions = dict(
+            (name, i) for i, name in enumerate(self.signature.parameters.keys()))
+        self._prepared_calls = [
+            kernel_call.prepare(param_positions) for kernel_call in self._kernel_calls]
+        self._params_num = len(param_positions)
+
+    def _device_nbytes(self):
+        """
+        Returns the total size of device arrays owned by this object.
+        """
+        return sum(
+            value.nbytes for value in self._internal_args.values()
+            if hasattr(value, 'nbytes') and len(value.shape) > 0)
+
     def __call__(self, *args, **kwds):
         """
         Execute the computation.
@@ -556,6 +988,234 @@ class ComputationCallable:
         for kernel_call in self._kernel_calls:
             kernel_call(bound_args.arguments)
 
+    def submit(self, args=(), kwds=None, wait_for=None):
+        """
+        Enqueues the computation with the positional arguments ``args``
+        and the keyword arguments ``kwds`` (same as in :py:meth:`__call__`),
+        and returns a :py:class:`ComputationEvent` object marking its completion.
+        ``wait_for`` is an iterable of :py:class:`ComputationEvent`
+        or :py:class:`~reikna.cluda.api.Event` objects
+        (possibly from other threads with the same context)
+        that must be completed before the computation starts.
+        """
+        return submit_call(self.thread, lambda: self(*args, **(kwds or {})), wait_for)
+
+    def call_async(self, *args, **kwds):
+        """
+        Enqueues the computation (same as :py:meth:`__call__`)
+        and returns an ``asyncio`` future (bound to the running event loop)
+        resolved with ``None`` when the computation is finished.
+        The event loop is not blocked while waiting for the device.
+        """
+        event = self.submit(args, kwds)
+        return self.thread._event_future(event, keep_alive=(args, kwds))
+
+    def prepared_call(self, *args):
+        """
+        Execute the computation with less overhead than :py:meth:`__call__`
+        (which may be noticeable for small problem sizes).
+        Only positional arguments are accepted, and all of them must be given
+        (including the ones that have default values).
+        Scalar arguments are not cast, so they must already have the types from the signature
+        (e.g. ``numpy.int32(1)`` instead of ``1``).
+        """
+        if len(args) != self._params_num:
+            raise TypeError(
+                "Expected {num} arguments, got {got}".format(num=self._params_num, got=len(args)))
+        run_prepared_calls(self._prepared_calls, args)
+
+    def bind(self, **fixed):
+        """
+        Returns a :py:class:`BoundComputationCallable` object
+        with the values of some of the parameters fixed.
+        """
+        return BoundComputationCallable(self, fixed)
+
+
+class ComputationEvent:
+    """
+    A result of :py:meth:`ComputationCallable.submit`.
+    Marks the completion of an enqueued computation call.
+
+    .. py:attribute:: start_event
+
+        A :py:class:`~reikna.cluda.api.Event` recorded before the computation call.
+
+    .. py:attribute:: end_event
+
+        A :py:class:`~reikna.cluda.api.Event` recorded after the computation call.
+    """
+
+    def __init__(self, start_event, end_event):
+        self.start_event = start_event
+        self.end_event = end_event
+
+    def wait(self):
+        """
+        Blocks until the computation is finished.
+        """
+        self.end_event.wait()
+
+    def done(self):
+        """
+        Returns ``True`` if the computation is finished.
+        """
+        return self.end_event.done()
+
+    def time(self):
+        """
+        Waits for the computation to finish and returns its execution time in seconds
+        (see :py:meth:`~reikna.cluda.api.Event.time_till`).
+        """
+        self.wait()
+        return self.start_event.time_till(self.end_event)
+
+
+def submit_call(thread, call, wait_for):
+    """
+    Enqueues ``call`` (a function with no arguments) in ``thread``
+    after the completion of ``wait_for``, and returns a :py:class:`ComputationEvent`.
+    """
+    if wait_for is not None:
+        events = [
+            event.end_event if isinstance(event, ComputationEvent) else event
+            for event in wait_for]
+        if len(events) > 0:
+            thread.wait_for(*events)
+
+    start_event = thread.record_event()
+    call()
+    return ComputationEvent(start_event, thread.record_event())
+
+
+def run_prepared_calls(prepared_calls, args):
+    """
+    Launches the kernels from the list returned by :py:meth:`KernelCall.prepare`
+    with the given computation arguments.
+    """
+    for launch, kernel_args, slots in prepared_calls:
+        kernel_args = list(kernel_args)
+        for kernel_pos, arg_pos in slots:
+            kernel_args[kernel_pos] = args[arg_pos]
+        launch(*kernel_args)
+
+
+class BoundComputationCallable:
+    """
+    A result of calling :py:meth:`~reikna.core.computation.ComputationCallable.bind`.
+    Represents a compiled computation with some of the arguments fixed.
+    The fixed values are placed in the argument lists of the kernels in advance,
+    so they are not processed on each call.
+
+    .. py:attribute:: thread
+
+        A :py:class:`~reikna.cluda.api.Thread` object used to compile the computation.
+
+    .. py:attribute:: signature
+
+        A :py:class:`~reikna.core.Signature` object with the parameters that are not fixed.
+
+    .. py:attribute:: parameter
+
+        A named tuple of :py:class:`~reikna.core.Type` objects corresponding
+        to the parameters that are not fixed.
+    """
+
+    def __init__(self, compiled, fixed):
+        """__init__()""" # hide the signature from Sphinx
+
+        parameters = compiled.signature.parameters
+        for name in fixed:
+            if name not in parameters:
+                raise TypeError("Unknown parameter: " + name)
+
+        remaining = [param for name, param in parameters.items() if name not in fixed]
+        names = list(parameters.keys())
+        positions = dict((param.name, i) for i, param in enumerate(remaining))
+
+        # Keeping the reference, since the compiled computation owns the temporary arrays.
+        self._compiled = compiled
+        self.thread = compiled.thread
+        self.signature = Signature(remaining)
+        self.parameter = make_parameter_container(self, remaining)
+        self._params_num = len(remaining)
+
+        self._annotations = dict((name, parameters[name].annotation) for name in fixed)
+        self._fixed_slots = dict((name, []) for name in fixed)
+        self._prepared_calls = []
+        for launch, kernel_args, slots in compiled._prepared_calls:
+            kernel_args = list(kernel_args)
+            remaining_slots = []
+            for kernel_pos, arg_pos in slots:
+                name = names[arg_pos]
+                if name in fixed:
+                    self._fixed_slots[name].append((kernel_args, kernel_pos))
+                else:
+                    remaining_slots.append((kernel_pos, positions[name]))
+            self._prepared_calls.append((launch, kernel_args, remaining_slots))
+
+        self.set(**fixed)
+
+    def setter(self, name):
+        """
+        Returns a function taking one argument, which sets the value of the fixed parameter
+        ``name`` (scalar values are cast to the parameter type).
+        """
+        if name not in self._fixed_slots:
+            raise TypeError("Parameter " + name + " is not fixed")
+
+        annotation = self._annotations[name]
+        slots = self._fixed_slots[name]
+
+        def set_value(value):
+            if not annotation.array:
+                value = annotation.type(value)
+            for kernel_args, kernel_pos in slots:
+                kernel_args[kernel_pos] = value
+
+        return set_value
+
+    def set(self, **kwds):
+        """
+        Sets new values of the fixed parameters.
+        """
+        for name, value in kwds.items():
+            self.setter(name)(value)
+
+    def __call__(self, *args, **kwds):
+        """
+        Execute the computation with the given values of the parameters that are not fixed.
+        """
+        bound_args = self.signature.bind_with_defaults(args, kwds, cast=True)
+        arguments = bound_args.arguments
+        run_prepared_calls(
+            self._prepared_calls, [arguments[name] for name in self.signature.parameters])
+
+    def submit(self, args=(), kwds=None, wait_for=None):
+        """
+        Same as :py:meth:`ComputationCallable.submit`,
+        taking only the parameters that are not fixed.
+        """
+        return submit_call(self.thread, lambda: self(*args, **(kwds or {})), wait_for)
+
+    def call_async(self, *args, **kwds):
+        """
+        Same as :py:meth:`ComputationCallable.call_async`,
+        taking only the parameters that are not fixed.
+        """
+        event = self.submit(args, kwds)
+        return self.thread._event_future(event, keep_alive=(args, kwds))
+
+    def prepared_call(self, *args):
+        """
+        Same as :py:meth:`ComputationCallable.prepared_call`,
+        taking only the parameters that are not fixed.
+        """
+        if len(args) != self._params_num:
+            raise TypeError(
+                "Expected {num} arguments, got {got}".format(num=self._params_num, got=len(args)))
+        run_prepared_calls(self._prepared_calls, args)
+
 
 class KernelCall:
 
@@ -565,6 +1225,16 @@ class KernelCall:
         self._args = args
         self._external_arg_positions = external_arg_positions
 
+    def prepare(self, param_positions):
+        """
+        Returns a tuple of the launch function, the list of kernel arguments
+        (with ``None`` in place of external ones), and the list of pairs
+        ``(position in the kernel arguments, position in the computation arguments)``
+        for external arguments, given the positions of the computation parameters.
+        """
+        slots = [(pos, param_positions[name]) for name, pos in self._external_arg_positions]
+        return self._kernel.prepared_call, list(self._args), slots
+
     def __call__(self, external_args):
         for name, pos in self._external_arg_positions:
             self._args[pos] = external_args[name]
@@ -0,0 +1,82 @@
+class LaunchGraph:
+    """
+    A recorded sequence of compiled computation calls and device-to-device copies,
+    which can be replayed with a single Python call.
+    All the arguments are processed during recording,
+    so the replay only issues the kernel launches and copies to the thread's queue.
+    The recorded launches are not tied to any native graph API of the backend,
+    so they can be freely mixed with other operations on the same thread.
+
+    :param thread: a :py:class:`~reikna.cluda.api.Thread` object
+        all the recorded operations belong to.
+
+    .. py:attribute:: thread
+
+        The :py:class:`~reikna.cluda.api.Thread` object the graph was created for.
+    """
+
+    def __init__(self, thread):
+        self.thread = thread
+        self._launches = []
+        # Compiled computations own their temporary arrays,
+        # so they have to be kept alive while their launches are recorded.
+        self._computations = []
+
+    def add(self, computation, *args, **kwds):
+        """
+        Records a call to ``computation``
+        (a :py:class:`~reikna.core.computation.ComputationCallable`
+        or a :py:class:`~reikna.core.computation.BoundComputationCallable` object)
+        with the given arguments.
+        The values of fixed parameters of a bound computation are taken at the time of recording.
+        Returns this graph object.
+        """
+        if computation.thread is not self.thread:
+            raise ValueError("The computation must be compiled for the thread of the graph")
+
+        bound_args = computation.signature.bind_with_defaults(args, kwds, cast=True)
+        arguments = bound_args.arguments
+        args = [arguments[name] for name in computation.signature.parameters]
+
+        for launch, kernel_args, slots in computation._prepared_calls:
+            kernel_args = list(kernel_args)
+            for kernel_pos, arg_pos in slots:
+                kernel_args[kernel_pos] = args[arg_pos]
+            self._launches.append((launch, tuple(kernel_args), {}))
+
+        self._computations.append(computation)
+        return self
+
+    def add_copy(self, dest, src, src_offset=0, dest_offset=0, size=None):
+        """
+        Records a device-to-device copy
+        (see :py:meth:`~reikna.cluda.api.Thread.copy_array` for the meaning of parameters).
+        Returns this graph object.
+        """
+        itemsize = src.dtype.itemsize
+        nbytes = src.nbytes if size is None else itemsize * size
+        self._launches.append((
+            self.thread._copy_array_buffer, (dest, src, nbytes),
+            dict(src_offset=src_offset * itemsize, dest_offset=dest_offset * itemsize)))
+        return self
+
+    def clear(self):
+        """
+        Removes all the recorded operations.
+        """
+        self._launches = []
+        self._computations = []
+
+    def __len__(self):
+        """
+        Returns the number of recorded kernel launches and copies.
+        """
+        return len(self._launches)
+
+    def __call__(self):
+        """
+        Replays the recorded operations.
+        """
+        for launch, args, kwds in self._launches:
+            launch(*args, **kwds)
+        self.thread._synchronize()
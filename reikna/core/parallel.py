@@ -0,0 +1,224 @@
+"""
+This module contains the execution of batched computations on several devices.
+"""
+
+import numpy
+
+from reikna.core.tuning import measure_time
+
+
+def split_batch(batch_size, weights):
+    """
+    Splits ``batch_size`` into a list of non-negative integers
+    proportional to ``weights`` (as close as possible), with the sum equal to ``batch_size``.
+    """
+    total = float(sum(weights))
+    exact = [batch_size * weight / total for weight in weights]
+    sizes = [int(size) for size in exact]
+
+    # Distributing the remainder between the parts with the largest fractional parts
+    remainder = batch_size - sum(sizes)
+    order = sorted(range(len(weights)), key=lambda i: sizes[i] - exact[i])
+    for i in order[:remainder]:
+        sizes[i] += 1
+
+    return sizes
+
+
+def _check_batched_parameters(signature, batch_size, batched):
+    for name in batched:
+        if name not in signature.parameters:
+            raise ValueError("Unknown parameter: " + repr(name))
+        annotation = signature.parameters[name].annotation
+        if not annotation.array or annotation.type.shape[0] != batch_size:
+            raise ValueError(
+                "The first axis of the parameter " + repr(name) + " must be the batch one")
+
+    for name, param in signature.parameters.items():
+        if name not in batched and param.annotation.output:
+            raise ValueError(
+                "The output parameter " + repr(name) + " must be batched")
+
+
+def _get_batch_size(signature, batched, bound_args):
+    sizes = set()
+    for name in batched:
+        arg = bound_args[name]
+        if tuple(arg.shape[1:]) != signature.parameters[name].annotation.type.shape[1:]:
+            raise ValueError(
+                "The shape of the argument " + repr(name)
+                + " is incompatible with the computation")
+        sizes.add(arg.shape[0])
+    if len(sizes) != 1:
+        raise ValueError("The batched arguments must have the same length of the first axis")
+    return sizes.pop()
+
+
+class DataParallel:
+    """
+    Executes a computation which is independent along the outer (batch) axis of its arrays
+    (e.g. a batched :py:class:`~reikna.fft.FFT` or :py:class:`~reikna.linalg.MatrixMul`,
+    or a :py:class:`~reikna.algorithms.Reduce` over non-batch axes)
+    on several threads at once, typically having different devices
+    (including the sub-devices of a CPU created by the ``OpenCL`` device fission),
+    each thread processing a part of the batch.
+
+    :param factory: a function taking the batch size
+        and returning a :py:class:`~reikna.core.Computation` object for it.
+    :param batch_size: the total batch size.
+    :param batched: a list of names of the array parameters whose first axis is the batch one.
+        The other array parameters must be inputs, and are copied to every device in full.
+
+    .. note::
+
+        For :py:class:`~reikna.cbrng.CBRNG` the batch axis has to be a part of the generators
+        (see its ``generators_dim`` parameter), otherwise every device produces
+        the same random numbers.
+    """
+
+    def __init__(self, factory, batch_size, batched):
+        self._factory = factory
+        self._batch_size = batch_size
+        self._batched = list(batched)
+
+        self.signature = factory(batch_size).signature
+        _check_batched_parameters(self.signature, batch_size, self._batched)
+
+    def compile(self, threads, weights=None, fast_math=False, repetitions=5):
+        """
+        Compiles the computations for the parts of the batch
+        and returns a :py:class:`~reikna.core.parallel.DataParallelCallable` object.
+
+        :param threads: a list of :py:class:`~reikna.cluda.api.Thread` objects.
+            They can be created separately (in ``CUDA``, with different contexts);
+            the context of each thread is made current for its operations.
+        :param weights: a list of relative throughputs of the threads
+            defining the sizes of the parts of the batch.
+            If ``None``, the throughputs are measured by executing the computation
+            with an equal part of the batch on each thread ``repetitions`` times.
+        :param fast_math: same as in :py:meth:`~reikna.core.Computation.compile`.
+        """
+        compiled = {}
+
+        # The threads can have different contexts (e.g. created separately in CUDA),
+        # so every thread is made current for its own operations.
+        def get_compiled(i, size):
+            if (i, size) not in compiled:
+                compiled[(i, size)] = threads[i]._call_current(
+                    lambda: self._factory(size).compile(threads[i], fast_math=fast_math))
+            return compiled[(i, size)]
+
+        def get_weight(i, size):
+            return threads[i]._call_current(
+                lambda: size / measure_time(get_compiled(i, size), repetitions=repetitions))
+
+        if weights is None:
+            probe_size = max(self._batch_size // len(threads), 1)
+            weights = [get_weight(i, probe_size) for i in range(len(threads))]
+
+        sizes = split_batch(self._batch_size, weights)
+        parts = []
+        start = 0
+        for i, size in enumerate(sizes):
+            if size == 0:
+                continue
+            parts.append((start, start + size, get_compiled(i, size)))
+            start += size
+
+        return DataParallelCallable(self.signature, self._batched, parts, weights)
+
+
+class DataParallelCallable:
+    """
+    A result of :py:meth:`~reikna.core.DataParallel.compile`.
+    When called with ``numpy`` arrays (and scalars) corresponding to the full batch,
+    copies the parts of the batched inputs and the non-batched inputs to the devices,
+    executes the parts concurrently,
+    and copies the parts of the outputs back to the given arrays.
+
+    .. py:attribute:: signature
+
+        A :py:class:`~reikna.core.Signature` object (for the full batch).
+
+    .. py:attribute:: weights
+
+        The relative throughputs of the threads used to split the batch.
+
+    .. py:attribute:: parts
+
+        A list of tuples ``(start, stop, compiled)`` for each part of the batch,
+        where ``compiled`` is a :py:class:`~reikna.core.computation.ComputationCallable` object.
+    """
+
+    def __init__(self, signature, batched, parts, weights):
+        self.signature = signature
+        self.weights = weights
+        self.parts = parts
+        self._batched = set(batched)
+
+        # Device arrays for each part, allocated once
+        self._device_args = [
+            compiled.thread._call_current(lambda: self._allocate_part(compiled))
+            for _, _, compiled in parts]
+
+    def _allocate_part(self, compiled):
+        device_args = {}
+        for name, param in compiled.signature.parameters.items():
+            if param.annotation.array:
+                type_ = param.annotation.type
+                device_args[name] = compiled.thread.array(
+                    type_.shape, type_.dtype, strides=type_.strides)
+        return device_args
+
+    def _enqueue_part(self, start, stop, compiled, device_args, bound_args, host_views):
+        thread = compiled.thread
+        call_args = []
+        for name, param in compiled.signature.parameters.items():
+            annotation = param.annotation
+            if not annotation.array:
+                call_args.append(bound_args[name])
+                continue
+
+            if annotation.input:
+                arg = bound_args[name]
+                if name in self._batched:
+                    arg = arg[start:stop]
+                arg = numpy.ascontiguousarray(arg)
+                host_views.append(arg)
+                thread.to_device(arg, dest=device_args[name])
+            call_args.append(device_args[name])
+
+        compiled(*call_args)
+
+        events = []
+        for name, param in compiled.signature.parameters.items():
+            if param.annotation.output:
+                events.append(thread.from_device(
+                    device_args[name], dest=bound_args[name][start:stop], event=True))
+        return events
+
+    def __call__(self, *args, **kwds):
+        """
+        Execute the computation.
+        """
+        bound_args = self.signature.bind_with_defaults(args, kwds, cast=True).arguments
+        batch_size = _get_batch_size(self.signature, self._batched, bound_args)
+        expected_size = self.parts[-1][1]
+        if batch_size != expected_size:
+            raise ValueError(
+                "The batch size " + str(batch_size)
+                + " is different from the compiled one " + str(expected_size))
+
+        # The threads can have different contexts (e.g. created separately in CUDA),
+        # so every thread is made current for its own part.
+        host_views = [] # keeping the references until the transfers are finished
+        part_events = []
+        for (start, stop, compiled), device_args in zip(self.parts, self._device_args):
+            part_events.append((compiled.thread, compiled.thread._call_current(
+                lambda: self._enqueue_part(
+                    start, stop, compiled, device_args, bound_args, host_views))))
+
+        # All the parts are enqueued at this point, so the devices work concurrently.
+        for thread, events in part_events:
+            for event in events:
+                thread._call_current(event.wait)
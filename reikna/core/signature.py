@@ -94,6 +94,11 @@ class Type:
         else:
             return "Type({dtype})".format(dtype=self.dtype)
 
+    def __structural_key__(self, key):
+        # Derived classes may have references to their parents,
+        # which are irrelevant for the type itself.
+        return (self.dtype, self.shape, self.strides)
+
     def __process_modules__(self, process):
         tp = Type(self.dtype, shape=self.shape, strides=self.strides)
         tp.ctype = process(tp.ctype)
@@ -0,0 +1,166 @@
+"""
+This module contains the execution of batched computations
+on arrays that do not fit in the device memory.
+"""
+
+from reikna.core.parallel import _check_batched_parameters, _get_batch_size
+
+
+class Streaming:
+    """
+    Executes a computation which is independent along the outer (batch) axis of its arrays
+    on host arrays of any batch size (e.g. ``numpy.memmap`` objects larger than the device memory)
+    by processing them in chunks of a fixed batch size.
+    The transfers of the chunks to and from the device
+    are performed in separate queues (see :py:meth:`~reikna.cluda.api.Thread.fork`)
+    and overlap with the execution of the computation for the neighbouring chunks.
+
+    :param factory: a function taking the batch size
+        and returning a :py:class:`~reikna.core.Computation` object for it.
+    :param chunk_size: the batch size of a chunk.
+    :param batched: a list of names of the array parameters whose first axis is the batch one.
+        The other array parameters must be inputs, and are copied to the device once per call.
+    """
+
+    def __init__(self, factory, chunk_size, batched):
+        self._computation = factory(chunk_size)
+        self._chunk_size = chunk_size
+        self._batched = list(batched)
+        _check_batched_parameters(self._computation.signature, chunk_size, self._batched)
+
+    def compile(self, thread, fast_math=False):
+        """
+        Compiles the computation for a single chunk
+        and returns a :py:class:`~reikna.core.streaming.StreamingCallable` object.
+
+        :param thread: a :py:class:`~reikna.cluda.api.Thread` object
+            (it is used to execute the computation, and two threads forked from it
+            are used for the transfers).
+        :param fast_math: same as in :py:meth:`~reikna.core.Computation.compile`.
+        """
+        compiled = self._computation.compile(thread, fast_math=fast_math)
+        return StreamingCallable(compiled, self._chunk_size, self._batched)
+
+
+class StreamingCallable:
+    """
+    A result of :py:meth:`~reikna.core.Streaming.compile`.
+    When called with host arrays (and scalars), the batched ones having the same length
+    of the first axis, uploads the non-batched inputs,
+    streams the chunks of the batched inputs through two sets of device arrays
+    (so that the upload of a chunk, the computation for the previous one,
+    and the download of the one before that can be executed concurrently),
+    and writes the chunks of the outputs to the given arrays.
+    The batched arrays can be any objects supporting slicing of the first axis
+    and the assignment to slices (e.g. ``numpy.memmap``).
+    The last chunk is padded to the full chunk size.
+
+    .. py:attribute:: compiled
+
+        A :py:class:`~reikna.core.computation.ComputationCallable` object
+        processing a single chunk.
+    """
+
+    def __init__(self, compiled, chunk_size, batched):
+        self.compiled = compiled
+        self._chunk_size = chunk_size
+        self._batched = set(batched)
+
+        thread = compiled.thread
+        self._thread = thread
+        self._upload_thread = thread.fork()
+        self._download_thread = thread.fork()
+
+        self._params = list(compiled.signature.parameters.values())
+        self._non_batched = {}
+        self._device_sets = []
+        self._input_staging = []
+        self._output_staging = []
+        for _ in range(2):
+            device_args = {}
+            input_staging = {}
+            output_staging = {}
+            for param in self._params:
+                annotation = param.annotation
+                if not annotation.array or param.name not in self._batched:
+                    continue
+                type_ = annotation.type
+                device_args[param.name] = thread.array(type_.shape, type_.dtype)
+                # Page-locked arrays, so that the transfers could overlap with the computation
+                if annotation.input:
+                    input_staging[param.name] = thread.host_array(type_.shape, type_.dtype)
+                if annotation.output:
+                    output_staging[param.name] = thread.host_array(type_.shape, type_.dtype)
+            self._device_sets.append(device_args)
+            self._input_staging.append(input_staging)
+            self._output_staging.append(output_staging)
+
+        for param in self._params:
+            if param.annotation.array and param.name not in self._batched:
+                type_ = param.annotation.type
+                self._non_batched[param.name] = thread.array(type_.shape, type_.dtype)
+
+    def __call__(self, *args, **kwds):
+        """
+        Execute the computation.
+        """
+        bound_args = self.compiled.signature.bind_with_defaults(args, kwds, cast=True).arguments
+        batch_size = _get_batch_size(self.compiled.signature, self._batched, bound_args)
+
+        for name, device_arr in self._non_batched.items():
+            self._thread.to_device(bound_args[name], dest=device_arr)
+
+        chunks = [
+            (start, min(start + self._chunk_size, batch_size))
+            for start in range(0, batch_size, self._chunk_size)]
+
+        # For each chunk, the events marking the end of the operations with its arrays
+        chunk_events = [None] * len(chunks)
+        for i, (start, stop) in enumerate(chunks):
+            buf = i % 2
+            size = stop - start
+
+            # The arrays of the current set are not used by any operations at this point,
+            # since the chunk that used them last has already been finished below.
+            input_staging = self._input_staging[buf]
+            for name, staging in input_staging.items():
+                staging[:size] = bound_args[name][start:stop]
+
+            upload_events = [
+                self._upload_thread.to_device(
+                    staging, dest=self._device_sets[buf][name], event=True)
+                for name, staging in input_staging.items()]
+
+            if len(upload_events) > 0:
+                self._thread.wait_for(*upload_events)
+            call_args = []
+            for param in self._params:
+                if not param.annotation.array:
+                    call_args.append(bound_args[param.name])
+                elif param.name in self._batched:
+                    call_args.append(self._device_sets[buf][param.name])
+                else:
+                    call_args.append(self._non_batched[param.name])
+            self.compiled(*call_args)
+            computed = self._thread.record_event()
+
+            self._download_thread.wait_for(computed)
+            chunk_events[i] = [computed] + [
+                self._download_thread.from_device(
+                    self._device_sets[buf][name], dest=staging, event=True)
+                for name, staging in self._output_staging[buf].items()]
+
+            # Finishing the previous chunk while the current one is being processed
+            if i > 0:
+                self._finish_chunk(bound_args, chunks[i - 1], (i - 1) % 2, chunk_events[i - 1])
+
+        if len(chunks) > 0:
+            self._finish_chunk(
+                bound_args, chunks[-1], (len(chunks) - 1) % 2, chunk_events[-1])
+
+    def _finish_chunk(self, bound_args, chunk, buf, events):
+        start, stop = chunk
+        for event in events:
+            event.wait()
+        for name, staging in self._output_staging[buf].items():
+            bound_args[name][start:stop] = staging[:stop - start]
@@ -4,7 +4,8 @@ from reikna.helpers import template_def
 from reikna.cluda import Snippet
 from reikna.core.signature import Signature, Type, Parameter, Annotation
 from reikna.core.transformation_modules import leaf_name, node_connector, module_transformation, \
-    module_leaf_macro, module_same_indices, module_combined, kernel_declaration, index_cnames
+    module_leaf_macro, module_same_indices, module_cached_same_indices, module_combined, \
+    kernel_declaration, index_cnames
 
 
 class TransformationParameter(Type):
@@ -396,15 +397,71 @@ class TransformationTree:
 
         return decl, leaf_names
 
-    def _get_transformation_module(self, annotation, ntr):
+    def _same_index_leaves(self, ntr, shape, names):
+        # Collects the names of the input leaves read by ``ntr``
+        # (directly or through the input transformations of its nodes)
+        # with the same indices as its connector.
+        # Not including the leaves that can be written to (their values can change
+        # between the reads), and the ones read through the parameters of other shapes
+        # (the indices of the connector may be out of bounds for them).
+        for tr_param in ntr.trf.signature.parameters.values():
+            name = ntr.node_from_tr[tr_param.name]
+            ann = tr_param.annotation
+            if (name == ntr.connector_node_name or not ann.array
+                    or not ann.input or ann.output or ann.type.shape != shape):
+                continue
+
+            input_ntr = self.nodes[name].input_ntr
+            if input_ntr is not None:
+                self._same_index_leaves(input_ntr, shape, names)
+            elif not self.leaf_parameters[name].annotation.output:
+                names.add(name)
+
+    def _get_cached_load_same(self, name, annotation, cached_names):
+        # Returns the ``load_same`` module for the node ``name``
+        # which uses the values of the leaves from ``cached_names``
+        # loaded by the caller instead of reading them from the global memory,
+        # or ``None`` if there are no such leaves in the subtree of the node.
+        param = Parameter(name, annotation)
+        if name in cached_names:
+            return module_cached_same_indices(param)
+
+        input_ntr = self.nodes[name].input_ntr
+        if input_ntr is None:
+            return None
+
+        subtree_params = self.get_leaf_parameters([name])
+        cached = [leaf for leaf in subtree_params if leaf.name in cached_names]
+        if len(cached) == 0:
+            return None
+
+        m_idx = self._get_transformation_module(annotation, input_ntr, cached=cached)
+        return module_same_indices(False, param, subtree_params, m_idx)
+
+    def _get_transformation_module(self, annotation, ntr, cached=None):
 
         param = Parameter(ntr.connector_node_name, annotation)
+        shape = param.annotation.type.shape
+
+        # The input leaves read with the same indices by any transformation in the subtree
+        # are loaded from the global memory once, at the start of the function,
+        # and passed to the functions of the nested transformations reading them.
+        # If ``cached`` is given, these values are already loaded by the caller.
+        if cached is None:
+            hoisted_names = set()
+            self._same_index_leaves(ntr, shape, hoisted_names)
+            hoisted = [
+                leaf for leaf in self.get_leaf_parameters([ntr.connector_node_name])
+                if leaf.name in hoisted_names]
+            cached_names = hoisted_names
+            cached = []
+        else:
+            hoisted = []
+            cached_names = set(leaf.name for leaf in cached)
 
-        tr_args = [Indices(param.annotation.type.shape)]
-        connection_names = []
+        tr_args = [Indices(shape)]
         for tr_param in ntr.trf.signature.parameters.values():
             connection_name = ntr.node_from_tr[tr_param.name]
-            connection_names.append(connection_name)
 
             if connection_name == ntr.connector_node_name:
                 if ntr.output:
@@ -416,11 +473,24 @@ class TransformationTree:
                     tr_args.append(KernelParameter(
                         param.name, param.annotation.type, store_same=store_same))
             else:
-                tr_args.append(self._get_kernel_argobject(connection_name, tr_param.annotation))
+                argobject = self._get_kernel_argobject(connection_name, tr_param.annotation)
+
+                ann = tr_param.annotation
+                if (len(cached_names) > 0 and ann.array and ann.input and not ann.output
+                        and ann.type.shape == shape):
+                    load_same = self._get_cached_load_same(
+                        connection_name, ann, cached_names)
+                    if load_same is not None:
+                        argobject = argobject._replace(load_same=load_same)
+
+                tr_args.append(argobject)
 
         subtree_params = self.get_leaf_parameters([ntr.connector_node_name])
 
-        return module_transformation(ntr.output, param, subtree_params, ntr.trf.snippet, tr_args)
+        return module_transformation(
+            ntr.output, param, subtree_params, ntr.trf.snippet, tr_args,
+            hoisted=[(leaf, module_leaf_macro(False, leaf)) for leaf in hoisted],
+            cached=cached)
 
     def _get_connection_modules(self, output, name, annotation):
 
@@ -581,12 +651,22 @@ class KernelParameter:
         if store_combined_idx is not None:
             self.store_combined_idx = store_combined_idx
 
+    _MODULE_ATTRS = (
+        'load_idx', 'store_idx', 'load_same', 'store_same',
+        'load_combined_idx', 'store_combined_idx')
+
+    def _replace(self, **kwds):
+        """
+        Returns a copy of this object with some of the load/store modules replaced.
+        """
+        for attr in self._MODULE_ATTRS:
+            if attr not in kwds and hasattr(self, attr):
+                kwds[attr] = getattr(self, attr)
+        return KernelParameter(self.name, self._type, **kwds)
+
     def __process_modules__(self, process):
         kwds = {}
-        attrs = (
-            'load_idx', 'store_idx', 'load_same', 'store_same',
-            'load_combined_idx', 'store_combined_idx')
-        for attr in attrs:
+        for attr in self._MODULE_ATTRS:
             if hasattr(self, attr):
                 kwds[attr] = process(getattr(self, attr))
 
@@ -10,6 +10,10 @@ def leaf_name(name):
     return "_leaf_" + name
 
 
+def cached_value_name(name):
+    return "_cached_" + name
+
+
 def index_cnames(shape):
     return [INDEX_NAME + str(i) for i in range(len(shape))]
 
@@ -98,6 +102,7 @@ _module_transformation = helpers.template_def(
         signature = (
             param_cnames_seq(subtree_parameters, qualified=True) +
             q_indices +
+            [str(ctype) + ' ' + cname for ctype, cname in cached_values] +
             value_param)
     %>
     INLINE WITHIN_KERNEL ${'void' if output else connector_ctype} ${prefix}func(
@@ -107,6 +112,10 @@ _module_transformation = helpers.template_def(
         ${connector_ctype} ${VALUE_NAME};
         %endif
 
+        %for ctype, cname, load_idx in hoisted_values:
+        ${ctype} ${cname} = ${load_idx}(${', '.join(nq_indices)});
+        %endfor
+
         ${tr_snippet(*tr_args)}
 
         %if not output:
@@ -116,10 +125,16 @@ _module_transformation = helpers.template_def(
     <%
     %>
     #define ${prefix}(${', '.join(nq_indices + value)}) ${prefix}func(\\
-        ${', '.join(nq_params + nq_indices + value)})
+        ${', '.join(nq_params + nq_indices + [cname for _, cname in cached_values] + value)})
     """)
 
-def module_transformation(output, param, subtree_parameters, tr_snippet, tr_args):
+# ``hoisted`` is a list of pairs (leaf parameter, leaf macro module) for the leaves
+# that are loaded at the start of the function (with the indices of the connector),
+# and ``cached`` is a list of leaf parameters whose values were loaded by the caller.
+# In both cases the values are available to the transformation snippet
+# through ``module_cached_same_indices()``.
+def module_transformation(output, param, subtree_parameters, tr_snippet, tr_args,
+        hoisted=(), cached=()):
     return Module(
         _module_transformation,
         render_kwds=dict(
@@ -132,7 +147,12 @@ def module_transformation(output, param, subtree_parameters, tr_snippet, tr_args
             nq_indices=index_cnames_seq(param),
             connector_ctype=param.annotation.type.ctype,
             tr_snippet=tr_snippet,
-            tr_args=tr_args))
+            tr_args=tr_args,
+            hoisted_values=[
+                (leaf.annotation.type.ctype, cached_value_name(leaf.name), load_idx)
+                for leaf, load_idx in hoisted],
+            cached_values=[
+                (leaf.annotation.type.ctype, cached_value_name(leaf.name)) for leaf in cached]))
 
 
 _module_leaf_macro = helpers.template_def(
@@ -181,6 +201,25 @@ def module_same_indices(output, param, subtree_parameters, module_idx):
             nq_params=param_cnames_seq(subtree_parameters)))
 
 
+_module_cached_same_indices = helpers.template_def(
+    ['prefix'],
+    """
+    // cached leaf input for a transformation for "${name}"
+    #define ${prefix} ${cname}
+    """)
+
+# Replaces the input variant of ``module_same_indices()`` for a leaf inside a transformation
+# function, where the value is read once into a local variable or passed by the caller
+# (see ``hoisted`` and ``cached`` in ``module_transformation()``).
+# If the transformation does not use the value, the compiler removes the read.
+def module_cached_same_indices(param):
+    return Module(
+        _module_cached_same_indices,
+        render_kwds=dict(
+            name=param.name,
+            cname=cached_value_name(param.name)))
+
+
 _snippet_disassemble_combined = Snippet.create(
     lambda shape, slices, indices, combined_indices: """
     %for combined_index, slice_len in enumerate(slices):
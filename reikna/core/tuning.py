@@ -0,0 +1,257 @@
+"""
+This module contains the autotuner for computation parameters
+and its on-disk database of tuning results.
+"""
+
+import os
+import os.path
+import hashlib
+import tempfile
+import errno
+import json
+import time
+
+import numpy
+
+from reikna.cluda import OutOfResourcesError
+
+
+def _default_database_dir():
+    if 'REIKNA_TUNING_DIR' in os.environ:
+        return os.environ['REIKNA_TUNING_DIR']
+    else:
+        return os.path.join(os.path.expanduser('~'), '.cache', 'reikna', 'tuning')
+
+
+def _normalize(value):
+    # Tuples become lists after a roundtrip through JSON,
+    # so the candidates are compared with the stored values in this form.
+    return json.loads(json.dumps(value))
+
+
+class TuningDatabase:
+    """
+    An on-disk database of tuning results.
+    Each entry is a JSON-serializable value stored in a separate file,
+    so the database can be safely shared between several processes
+    (see :py:class:`~reikna.cluda.binary_cache.BinaryCache` for details).
+
+    :param path: the directory to store the entries in.
+        If ``None``, the value of the environment variable ``REIKNA_TUNING_DIR`` is used,
+        or, if it is not set, ``~/.cache/reikna/tuning``.
+    """
+
+    SUFFIX = '.json'
+
+    def __init__(self, path=None):
+        self.path = _default_database_dir() if path is None else path
+
+        try:
+            os.makedirs(self.path)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    @staticmethod
+    def key(*parts):
+        """
+        Returns a string identifying an entry described by ``parts`` (strings).
+        """
+        hasher = hashlib.sha1()
+        for part in parts:
+            hasher.update(part.encode('utf-8'))
+            # A separator to prevent collisions between different splits of the same string
+            hasher.update(b'\x00')
+        return hasher.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key + self.SUFFIX)
+
+    def get(self, key):
+        """
+        Returns the value saved for ``key``, or ``None`` if there is no such entry.
+        """
+        try:
+            with open(self._entry_path(key)) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            # The entry does not exist, or was corrupted.
+            return None
+
+    def put(self, key, value):
+        """
+        Saves ``value`` (a JSON-serializable object) for ``key``.
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(value, f)
+            os.rename(temp_path, self._entry_path(key))
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def __len__(self):
+        return len([fname for fname in os.listdir(self.path) if fname.endswith(self.SUFFIX)])
+
+    def clear(self):
+        """
+        Removes all the entries.
+        """
+        for fname in os.listdir(self.path):
+            if fname.endswith(self.SUFFIX):
+                try:
+                    os.remove(os.path.join(self.path, fname))
+                except OSError:
+                    # Already removed by another process.
+                    pass
+
+
+class Tuner:
+    """
+    Picks computation parameters (e.g. block widths or FFT radices)
+    based on their measured performance on the actual device
+    (see the ``tuner`` parameter of :py:meth:`~reikna.core.Computation.compile`).
+    The results are saved in a :py:class:`TuningDatabase`
+    keyed by the device fingerprint, the computation class,
+    the name of the parameter and the problem description (shapes and data types of arguments).
+
+    :param mode: ``'off'`` (computations use their default heuristics),
+        ``'cached'`` (the values from the database are used if available,
+        otherwise the default heuristics are used)
+        or ``'tune'`` (if there is no value in the database, the candidates are measured,
+        and the fastest one is saved).
+    :param database: a :py:class:`TuningDatabase` object, or a path to its directory.
+        If ``None``, the database in the default location is used.
+    :param repetitions: the number of timed executions for each candidate
+        (the minimum time is used).
+
+    .. py:attribute:: hits
+
+        Number of parameters taken from the database.
+
+    .. py:attribute:: misses
+
+        Number of parameters that were not found in the database.
+    """
+
+    MODES = ('off', 'cached', 'tune')
+
+    def __init__(self, mode='cached', database=None, repetitions=5):
+        if mode not in self.MODES:
+            raise ValueError("Unknown tuning mode: " + repr(mode))
+
+        self.mode = mode
+        if database is None or isinstance(database, str):
+            self.database = TuningDatabase(database)
+        else:
+            self.database = database
+        self.repetitions = repetitions
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, thread, computation, name, args, problem=None, fast_math=False):
+        """
+        Returns the database key for the parameter ``name`` of ``computation``
+        compiled for ``thread`` with the arguments ``args``
+        (:py:class:`~reikna.core.computation.KernelArgument` objects).
+        ``problem`` is a tuple with any additional values
+        the choice of the parameter depends on (its ``repr()`` must be deterministic).
+        """
+        cls = type(computation)
+        args_descr = tuple(
+            (tuple(arg.shape), arg.dtype.str, tuple(arg.strides)) for arg in args)
+        return self.database.key(
+            thread._device_fingerprint(),
+            cls.__module__ + "." + cls.__name__,
+            name,
+            repr(args_descr),
+            repr(problem),
+            repr(bool(fast_math)))
+
+    def pick(self, key, candidates, measure):
+        """
+        Returns the best of ``candidates`` (JSON-serializable values) for ``key``,
+        or ``None`` if it is not known and cannot be found in the current mode.
+        ``measure`` is a function taking a candidate and returning its execution time.
+        """
+        if self.mode == 'off':
+            return None
+
+        value = self.database.get(key)
+        if value is not None:
+            for candidate in candidates:
+                if _normalize(candidate) == value:
+                    self.hits += 1
+                    return candidate
+            # The stored value is not among the candidates anymore
+            # (e.g. the device parameters were overridden), treat it as a miss.
+
+        self.misses += 1
+        if self.mode != 'tune':
+            return None
+
+        best_time = None
+        best_candidate = None
+        for candidate in candidates:
+            try:
+                candidate_time = measure(candidate)
+            except (OutOfResourcesError, ValueError):
+                # Computations raise ValueError if they cannot find suitable kernel parameters
+                # for the given candidate.
+                continue
+
+            if best_time is None or candidate_time < best_time:
+                best_time = candidate_time
+                best_candidate = candidate
+
+        if best_candidate is not None:
+            self.database.put(key, _normalize(best_candidate))
+
+        return best_candidate
+
+    def time(self, compiled):
+        """
+        Returns the minimum execution time (in seconds) of a compiled computation
+        (see :py:func:`measure_time`).
+        """
+        return measure_time(compiled, repetitions=self.repetitions)
+
+
+def measure_time(compiled, repetitions=5, call_overhead=False):
+    """
+    Returns the minimum execution time (in seconds) of a compiled computation
+    (a :py:class:`~reikna.core.computation.ComputationCallable` object)
+    called ``repetitions`` times with zero-filled arguments.
+    If ``call_overhead`` is ``True``, returns a tuple of the execution time
+    and the minimum time a call takes on the host side, without waiting for the device.
+    """
+    thread = compiled.thread
+    args = []
+    for param in compiled.signature.parameters.values():
+        type_ = param.annotation.type
+        if param.annotation.array:
+            args.append(thread.to_device(numpy.zeros(type_.shape, type_.dtype)))
+        else:
+            args.append(type_.dtype.type(0))
+
+    # The first call may include some one-time initialization in the driver.
+    compiled(*args)
+    thread.synchronize()
+
+    times = []
+    overheads = []
+    for _ in range(repetitions):
+        t1 = time.time()
+        compiled(*args)
+        t2 = time.time()
+        thread.synchronize()
+        times.append(time.time() - t1)
+        overheads.append(t2 - t1)
+
+    if call_overhead:
+        return min(times), min(overheads)
+    else:
+        return min(times)
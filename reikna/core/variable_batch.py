@@ -0,0 +1,125 @@
+"""
+This module contains the execution of batched computations
+with the batch size changing from call to call.
+"""
+
+from reikna.core.parallel import _check_batched_parameters, _get_batch_size
+
+
+class VariableBatch:
+    """
+    Executes a computation which is independent along the outer (batch) axis of its arrays
+    for any batch size up to the declared maximum without compiling it again.
+    The computation is compiled in advance for a fixed list of batch sizes,
+    and each call uses the smallest of them that fits the batch of the arguments.
+    If the batch of the arguments is smaller,
+    the batched arrays are padded using internal device arrays,
+    which are allocated once for each compiled size.
+
+    :param factory: a function taking the batch size
+        and returning a :py:class:`~reikna.core.Computation` object for it.
+    :param max_batch_size: the maximum batch size.
+    :param batched: a list of names of the array parameters whose first axis is the batch one.
+        The other array parameters must be inputs.
+    :param sizes: a list of batch sizes to compile the computation for.
+        If ``None``, only ``max_batch_size`` is used;
+        more sizes (e.g. powers of 2) reduce the padding overhead
+        at the cost of compilation time and memory.
+    """
+
+    def __init__(self, factory, max_batch_size, batched, sizes=None):
+        if sizes is None:
+            sizes = [max_batch_size]
+        sizes = sorted(set(sizes))
+        if sizes[0] <= 0 or sizes[-1] != max_batch_size:
+            raise ValueError(
+                "The batch sizes must be positive, and the largest one must be equal to "
+                + str(max_batch_size))
+
+        self._batched = list(batched)
+        self._computations = []
+        for size in sizes:
+            computation = factory(size)
+            _check_batched_parameters(computation.signature, size, self._batched)
+            self._computations.append((size, computation))
+
+    def compile(self, thread, fast_math=False, cache=None):
+        """
+        Compiles the computation for all the batch sizes
+        and returns a :py:class:`~reikna.core.variable_batch.VariableBatchCallable` object.
+
+        :param thread: a :py:class:`~reikna.cluda.api.Thread` object.
+        :param fast_math: same as in :py:meth:`~reikna.core.Computation.compile`.
+        :param cache: same as in :py:meth:`~reikna.core.Computation.compile`.
+        """
+        compiled = [
+            (size, computation.compile(thread, fast_math=fast_math, cache=cache))
+            for size, computation in self._computations]
+        return VariableBatchCallable(thread, compiled, self._batched)
+
+
+class VariableBatchCallable:
+    """
+    A result of :py:meth:`~reikna.core.VariableBatch.compile`.
+    When called with device arrays (and scalars), the batched ones having the same length
+    of the first axis (not greater than the maximum batch size),
+    executes the computation compiled for the smallest fitting batch size.
+    If it is greater than the batch of the arguments, the batched inputs are copied
+    to the padded arrays, and the results are copied from them to the given outputs
+    (the padding rows are processed too, but do not affect the results).
+
+    .. py:attribute:: compiled
+
+        A list of tuples ``(batch_size, compiled)`` sorted by the batch size,
+        where ``compiled`` is a :py:class:`~reikna.core.computation.ComputationCallable` object.
+    """
+
+    def __init__(self, thread, compiled, batched):
+        self.compiled = compiled
+        self._thread = thread
+        self._batched = list(batched)
+        self._padded = {} # batch size -> {name: device array}
+
+    def _get_padded(self, size, compiled):
+        if size not in self._padded:
+            padded = {}
+            for name in self._batched:
+                type_ = compiled.signature.parameters[name].annotation.type
+                padded[name] = self._thread.array(type_.shape, type_.dtype)
+            self._padded[size] = padded
+        return self._padded[size]
+
+    def __call__(self, *args, **kwds):
+        """
+        Execute the computation.
+        """
+        max_size, max_compiled = self.compiled[-1]
+        bound_args = max_compiled.signature.bind_with_defaults(args, kwds, cast=True).arguments
+        batch_size = _get_batch_size(max_compiled.signature, self._batched, bound_args)
+        if batch_size > max_size:
+            raise ValueError(
+                "The batch size " + str(batch_size)
+                + " is greater than the maximum one " + str(max_size))
+        if batch_size == 0:
+            return
+
+        size, compiled = [
+            (size, compiled) for size, compiled in self.compiled if size >= batch_size][0]
+        if size == batch_size:
+            compiled(**bound_args)
+            return
+
+        padded = self._get_padded(size, compiled)
+        call_args = dict(bound_args)
+        for name in self._batched:
+            arg = bound_args[name]
+            if compiled.signature.parameters[name].annotation.input:
+                self._thread.copy_array(arg, dest=padded[name], size=arg.size)
+            call_args[name] = padded[name]
+
+        compiled(**call_args)
+
+        for name in self._batched:
+            arg = bound_args[name]
+            if compiled.signature.parameters[name].annotation.output:
+                self._thread.copy_array(padded[name], dest=arg, size=arg.size)
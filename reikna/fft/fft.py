@@ -5,6 +5,7 @@ from reikna.core import Computation, Parameter, Annotation
 from reikna.cluda import functions
 import reikna.cluda.dtypes as dtypes
 from reikna.cluda import OutOfResourcesError
+from reikna.cluda.vsize import sort_by_occupancy
 from reikna.algorithms import PureParallel
 from reikna.transformations import copy
 
@@ -74,6 +75,30 @@ def get_radix_array(size, use_max_radix=False):
             return [16] * (num_elems - 1) + [16 if lsize % 4 == 0 else 2 ** (lsize % 4)]
 
 
+def get_radix_array_candidates(size):
+    """
+    Returns a list of radix arrays for a local FFT of the size ``size``
+    to be compared by the tuner.
+    """
+    candidates = [get_radix_array(size), get_radix_array(size, use_max_radix=True)]
+    for base_radix in (8, 4):
+        if base_radix >= size:
+            continue
+        radix_array = []
+        remainder = size
+        while remainder > base_radix:
+            radix_array.append(base_radix)
+            remainder //= base_radix
+        radix_array.append(remainder)
+        candidates.append(radix_array)
+
+    unique_candidates = []
+    for candidate in candidates:
+        if candidate not in unique_candidates:
+            unique_candidates.append(candidate)
+    return unique_candidates
+
+
 def get_global_radix_info(size):
     """
     For ``size`` larger than what can be computed using local memory fft, global transposes
@@ -222,7 +247,7 @@ class LocalFFTKernel:
     """Generator for 'local' FFT in shared memory"""
 
     def __init__(self, dtype, device_params, outer_shape, fft_size, fft_size_real,
-            inner_shape, reverse_direction):
+            inner_shape, reverse_direction, radix_array=None):
 
         self.name = "fft_local"
         self.inplace_possible = True
@@ -234,6 +259,7 @@ class LocalFFTKernel:
 
         self._fft_size = fft_size
         self._fft_size_real = fft_size_real
+        self._radix_array = radix_array
         self._outer_batch = helpers.product(outer_shape)
         self._local_mem_size = device_params.local_mem_size
         self._itemsize = dtype.itemsize
@@ -252,9 +278,12 @@ class LocalFFTKernel:
         kwds = dict(self._constant_kwds)
         fft_size = self._fft_size
 
-        radix_array = get_radix_array(fft_size)
-        if fft_size // radix_array[0] > max_local_size:
-            radix_array = get_radix_array(fft_size, use_max_radix=True)
+        if self._radix_array is not None and fft_size // self._radix_array[0] <= max_local_size:
+            radix_array = self._radix_array
+        else:
+            radix_array = get_radix_array(fft_size)
+            if fft_size // radix_array[0] > max_local_size:
+                radix_array = get_radix_array(fft_size, use_max_radix=True)
 
         threads_per_xform = fft_size // radix_array[0]
         local_size = max(64, threads_per_xform)
@@ -337,6 +366,8 @@ class GlobalFFTKernel:
         local_batch = min(local_batch, stride_in)
         local_size = min(local_batch * threads_per_xform, max_local_size)
         local_batch = local_size // threads_per_xform
+        if local_batch == 0:
+            raise OutOfResourcesError
 
         workgroups_num = helpers.min_blocks(stride_in, local_batch) * self._outer_batch
 
@@ -364,6 +395,28 @@ class GlobalFFTKernel:
 
         return workgroups_num * local_size, local_size, kwds
 
+    def prepare_candidates(self, device_params):
+        """
+        Returns a list of the results of :py:meth:`prepare_for` for all the possible local sizes,
+        the ones with the best occupancy first.
+        """
+        candidates = []
+        local_sizes = []
+        max_local_size = device_params.max_work_group_size
+        while max_local_size >= 1:
+            try:
+                candidate = self.prepare_for(max_local_size)
+            except OutOfResourcesError:
+                pass
+            else:
+                if candidate[1] not in local_sizes:
+                    candidates.append(candidate)
+                    local_sizes.append(candidate[1])
+            max_local_size //= 2
+
+        local_mems = [kwds['lmem_size'] * self._itemsize // 2 for _, _, kwds in candidates]
+        return sort_by_occupancy(device_params, candidates, local_sizes, local_mems)
+
     @staticmethod
     def create_chain(dtype, device_params, outer_shape, fft_size, fft_size_real, inner_shape,
             reverse_direction):
@@ -382,8 +435,21 @@ class GlobalFFTKernel:
         return kernels
 
 
+def is_local_fft(fft_size, inner_shape, local_kernel_limit):
+    return helpers.product(inner_shape) == 1 and fft_size // MAX_RADIX <= local_kernel_limit
+
+
+def get_padded_fft_size(fft_size):
+    bounding_size = helpers.bounding_power_of_2(fft_size)
+    if bounding_size == fft_size:
+        return fft_size
+    else:
+        # padding FFT for the chirp-z transform
+        return 2 * bounding_size
+
+
 def get_fft_1d_kernels(dtype, device_params, outer_shape, fft_size, inner_shape,
-        local_kernel_limit, reverse_direction=False, fft_size_real=None):
+        local_kernel_limit, reverse_direction=False, fft_size_real=None, radix_arrays=None):
     """Create and compile kernels for one of the dimensions"""
 
     kernels = []
@@ -391,10 +457,11 @@ def get_fft_1d_kernels(dtype, device_params, outer_shape, fft_size, inner_shape,
     if fft_size_real is None:
         fft_size_real = fft_size
 
-    if (helpers.product(inner_shape) == 1 and fft_size // MAX_RADIX <= local_kernel_limit):
+    if is_local_fft(fft_size, inner_shape, local_kernel_limit):
         kernels.append(LocalFFTKernel(
             dtype, device_params, outer_shape, fft_size, fft_size_real,
-            inner_shape, reverse_direction))
+            inner_shape, reverse_direction,
+            radix_array=None if radix_arrays is None else radix_arrays.get(fft_size)))
     else:
         kernels.extend(GlobalFFTKernel.create_chain(
             dtype, device_params, outer_shape, fft_size, fft_size_real,
@@ -403,7 +470,8 @@ def get_fft_1d_kernels(dtype, device_params, outer_shape, fft_size, inner_shape,
     return kernels
 
 
-def get_fft_kernels(input_shape, dtype, axes, device_params, local_kernel_limit):
+def get_fft_kernels(input_shape, dtype, axes, device_params, local_kernel_limit,
+        radix_arrays=None):
     kernels = []
 
     # Starting from the most local transformation, for the sake of neatness.
@@ -416,23 +484,22 @@ def get_fft_kernels(input_shape, dtype, axes, device_params, local_kernel_limit)
         if fft_size == 1:
             continue
 
-        bounding_size = helpers.bounding_power_of_2(fft_size)
+        fft_size_padded = get_padded_fft_size(fft_size)
 
-        if bounding_size == fft_size:
+        if fft_size_padded == fft_size:
             kernels.extend(get_fft_1d_kernels(
                 dtype, device_params, outer_shape, fft_size,
-                inner_shape, local_kernel_limit))
+                inner_shape, local_kernel_limit, radix_arrays=radix_arrays))
         else:
-            # padding FFT for the chirp-z transform
-            fft_size_padded = 2 * bounding_size
             args = (dtype, device_params, outer_shape, fft_size_padded,
                 inner_shape, local_kernel_limit)
 
             new_kernels = []
             new_kernels.extend(get_fft_1d_kernels(
-                *args, fft_size_real=fft_size))
+                *args, fft_size_real=fft_size, radix_arrays=radix_arrays))
             new_kernels.extend(get_fft_1d_kernels(
-                *args, reverse_direction=True, fft_size_real=fft_size))
+                *args, reverse_direction=True, fft_size_real=fft_size,
+                radix_arrays=radix_arrays))
 
             # Since during pad-in or pad-out input and output blocks are no longer aligned,
             # these kernels lose their inplace_possible property
@@ -517,11 +584,12 @@ class FFT(Computation):
         return plan
 
     def _build_limited_plan(self, plan_factory, device_params, local_kernel_limit,
-            output, input_, inverse):
+            output, input_, inverse, radix_arrays=None):
 
         plan = plan_factory()
         kernels = get_fft_kernels(
-            input_.shape, input_.dtype, self._axes, device_params, local_kernel_limit)
+            input_.shape, input_.dtype, self._axes, device_params, local_kernel_limit,
+            radix_arrays=radix_arrays)
 
         mem_out = None
         for i, kernel in enumerate(kernels):
@@ -543,16 +611,21 @@ class FFT(Computation):
             argnames = [mem_out, mem_in] + kweights_arg + [inverse]
 
             # Try to find local size for each of the kernels
-            local_size = device_params.max_work_group_size
-            while local_size >= 1:
+            if isinstance(kernel, GlobalFFTKernel):
+                candidates = kernel.prepare_candidates(device_params)
+            else:
+                try:
+                    candidates = [kernel.prepare_for(device_params.max_work_group_size)]
+                except OutOfResourcesError:
+                    raise LocalKernelFail
+
+            for gsize, lsize, kwds in candidates:
                 try:
-                    gsize, lsize, kwds = kernel.prepare_for(local_size)
                     plan.kernel_call(
                         TEMPLATE.get_def(kernel.name), argnames,
                         global_size=gsize, local_size=lsize, render_kwds=kwds)
                 except OutOfResourcesError:
                     if isinstance(kernel, GlobalFFTKernel):
-                        local_size //= 2
                         continue
                     else:
                         raise LocalKernelFail
@@ -562,10 +635,8 @@ class FFT(Computation):
 
         return plan
 
-    def _build_plan(self, plan_factory, device_params, output, input_, inverse):
-
-        if helpers.product([input_.shape[i] for i in self._axes]) == 1:
-            return self._build_trivial_plan(plan_factory, output, input_)
+    def _build_plan_for_radix_arrays(self, plan_factory, device_params, radix_arrays,
+            output, input_, inverse):
 
         # While resource consumption of GlobalFFTKernel can be made lower by passing
         # lower value to prepare_for(), LocalFFTKernel may have to be split into several kernels.
@@ -577,7 +648,8 @@ class FFT(Computation):
         while local_kernel_limit >= 1:
             try:
                 plan = self._build_limited_plan(
-                    plan_factory, device_params, local_kernel_limit, output, input_, inverse)
+                    plan_factory, device_params, local_kernel_limit, output, input_, inverse,
+                    radix_arrays=radix_arrays)
             except LocalKernelFail:
             # One of LocalFFTKernels was out of resources.
             # Reduce the limit and try to create operations from scratch again.
@@ -590,3 +662,38 @@ class FFT(Computation):
             return plan
 
         raise ValueError("Could not find suitable call parameters for one of the local kernels")
+
+    def _build_plan(self, plan_factory, device_params, output, input_, inverse):
+
+        if helpers.product([input_.shape[i] for i in self._axes]) == 1:
+            return self._build_trivial_plan(plan_factory, output, input_)
+
+        # Radix arrays for local kernels can be picked by the tuner.
+        # Different FFT sizes are tuned one by one, with the radix arrays
+        # for the sizes tuned earlier being fixed.
+        local_fft_sizes = []
+        for axis in self._axes:
+            fft_size = get_padded_fft_size(input_.shape[axis])
+            if (fft_size > 1 and fft_size not in local_fft_sizes
+                    and is_local_fft(
+                        fft_size, input_.shape[axis+1:], device_params.max_work_group_size)):
+                local_fft_sizes.append(fft_size)
+
+        radix_arrays = {}
+        for fft_size in local_fft_sizes:
+
+            def build(plan_factory, radix_array, output, input_, inverse):
+                new_radix_arrays = dict(radix_arrays)
+                new_radix_arrays[fft_size] = radix_array
+                return self._build_plan_for_radix_arrays(
+                    plan_factory, device_params, new_radix_arrays, output, input_, inverse)
+
+            radix_array = self._tuned(
+                plan_factory, 'radix_array_' + str(fft_size),
+                get_radix_array_candidates(fft_size), build,
+                [output, input_, inverse], problem=(self._axes,))
+            if radix_array is not None:
+                radix_arrays[fft_size] = radix_array
+
+        return self._build_plan_for_radix_arrays(
+            plan_factory, device_params, radix_arrays, output, input_, inverse)
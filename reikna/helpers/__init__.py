@@ -10,8 +10,11 @@ import collections
 import os.path
 import warnings
 import inspect
+import hashlib
+import types
 import funcsigs
 
+import numpy
 from mako.template import Template
 
 
@@ -250,3 +253,123 @@ class ignore_integer_overflow():
 
     def __exit__(self, *args, **kwds):
         self.catch.__exit__(*args, **kwds)
+
+
+class _Identity:
+    """
+    Wraps an object which cannot be compared structurally,
+    making it hashable and comparable by identity.
+    Keeps a reference to the object, so its ``id`` cannot be reused while the wrapper is alive.
+    """
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __eq__(self, other):
+        return isinstance(other, _Identity) and self.obj is other.obj
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    def __hash__(self):
+        return hash(id(self.obj))
+
+
+_PRIMITIVE_TYPES = frozenset([type(None), bool, int, float, complex, str, bytes])
+
+
+def _structural_key(obj, visiting):
+
+    obj_type = type(obj)
+
+    if obj_type in _PRIMITIVE_TYPES:
+        return (obj_type, obj)
+
+    if obj_type is tuple:
+        # Tuples cannot form reference cycles by themselves, so there is no need to guard them.
+        return (tuple, tuple([_structural_key(elem, visiting) for elem in obj]))
+
+    if isinstance(obj, numpy.dtype):
+        return obj
+
+    if isinstance(obj, numpy.generic):
+        return (obj_type, obj.dtype, obj.tobytes())
+
+    if isinstance(obj, numpy.ndarray) and not obj.dtype.hasobject:
+        digest = hashlib.sha1(numpy.ascontiguousarray(obj).view(numpy.uint8)).hexdigest()
+        return (numpy.ndarray, obj.shape, obj.dtype, obj.strides, digest)
+
+    # Guarding against reference cycles
+    if id(obj) in visiting:
+        return _Identity(obj)
+    visiting.add(id(obj))
+
+    key = lambda x: _structural_key(x, visiting)
+
+    try:
+        if hasattr(obj, '__structural_key__'):
+            result = (obj.__class__, obj.__structural_key__(key))
+        elif isinstance(obj, numpy.ndarray):
+            # Object arrays hold references, so their buffers cannot be hashed directly;
+            # comparing them by their elements instead.
+            result = (numpy.ndarray, obj.shape, obj.dtype, key(obj.tolist()))
+        elif isinstance(obj, (tuple, list)):
+            # Not using ``type(obj)``, because named tuple classes
+            # are often created dynamically.
+            container_type = tuple if isinstance(obj, tuple) else list
+            result = (container_type, tuple([key(elem) for elem in obj]))
+        elif isinstance(obj, dict):
+            result = (dict, frozenset([(key(k), key(v)) for k, v in obj.items()]))
+        elif isinstance(obj, (set, frozenset)):
+            result = (frozenset, frozenset([key(elem) for elem in obj]))
+        elif isinstance(obj, Template):
+            # Templates with the same source produce the same code,
+            # even if they are different objects (e.g. created by ``template_def()``).
+            result = (Template, obj.source, obj.callable_.__name__)
+        elif isinstance(obj, funcsigs.Parameter):
+            result = (obj.__class__, obj.name, obj.kind, key(obj.annotation), key(obj.default))
+        elif isinstance(obj, funcsigs.Signature):
+            result = (obj.__class__, tuple([key(param) for param in obj.parameters.values()]))
+        elif isinstance(obj, types.FunctionType):
+            # Functions are often created dynamically (e.g. lambdas passed as render keywords),
+            # so comparing them by identity would make equal objects differ.
+            # Functions with the same code and the same captured values behave identically.
+            try:
+                closure = obj.__closure__
+                closure_values = tuple() if closure is None else tuple(
+                    [cell.cell_contents for cell in closure])
+            except ValueError:
+                # An empty cell (the closure variable has not been assigned yet)
+                result = _Identity(obj)
+            else:
+                result = (
+                    types.FunctionType, obj.__module__, obj.__code__,
+                    key(obj.__defaults__), key(closure_values))
+        elif (isinstance(obj, (types.ModuleType, type)) or inspect.isroutine(obj)
+                or not hasattr(obj, '__dict__')):
+            try:
+                hash(obj)
+                result = obj
+            except TypeError:
+                result = _Identity(obj)
+        else:
+            result = (obj.__class__, key(vars(obj)))
+    finally:
+        visiting.remove(id(obj))
+
+    return result
+
+
+def structural_key(obj):
+    """
+    Returns a hashable object that is equal for structurally equal objects
+    (that is, objects of the same class with equal attributes, processed recursively).
+    Scalars, ``numpy`` arrays, ``numpy`` dtypes, containers and ``Mako`` templates
+    are compared by value; functions, by their code and captured values;
+    classes and modules, by identity.
+    Objects of other classes are compared by their ``__dict__``, unless they
+    define the method ``__structural_key__(key)`` (where ``key`` is a function
+    that must be used to process any nested objects) returning a hashable value.
+    Objects that cannot be compared structurally are compared by identity.
+    """
+    return _structural_key(obj, set())
@@ -3,6 +3,7 @@ from reikna.core import Computation, Parameter, Annotation, Type
 import reikna.cluda.dtypes as dtypes
 from reikna.cluda import OutOfResourcesError
 from reikna.cluda import functions
+from reikna.cluda.vsize import sort_by_occupancy
 
 TEMPLATE = helpers.template_for(__file__)
 
@@ -22,6 +23,8 @@ class MatrixMul(Computation):
         will be derived from ``a_arr`` and ``b_arr``.
     :param block_width_override: if provided, it will used as a block size of
         the multiplication kernel.
+        Otherwise the block size is picked by the tuner (if it is used during compilation),
+        or based on the device parameters.
     :param transposed_a: if ``True``, the first matrix will be transposed
         before the multiplication.
     :param transposed_b: if ``True``, the second matrix will be transposed
@@ -72,6 +75,43 @@ class MatrixMul(Computation):
         self._transposed_a = transposed_a
         self._transposed_b = transposed_b
 
+    def _build_plan_for_block_width(
+            self, plan_factory, block_width, output, matrix_a, matrix_b):
+
+        plan = plan_factory()
+
+        a_batch = helpers.product(matrix_a.shape[:-2])
+        b_batch = helpers.product(matrix_b.shape[:-2])
+        batch = max(a_batch, b_batch)
+
+        num_steps = helpers.min_blocks(self._convolution_size, block_width)
+        a_blocks = helpers.min_blocks(self._a_outer_size, block_width)
+        b_blocks = helpers.min_blocks(self._b_outer_size, block_width)
+
+        render_kwds = dict(
+            batched_a=(a_batch != 1),
+            batched_b=(b_batch != 1),
+            transposed_a=self._transposed_a,
+            transposed_b=self._transposed_b,
+            num_steps=num_steps,
+            a_slices=(len(matrix_a.shape) - 2, 1, 1),
+            b_slices=(len(matrix_b.shape) - 2, 1, 1),
+            output_slices=(len(output.shape) - 2, 1, 1),
+            block_width=block_width,
+            mul=functions.mul(matrix_a.dtype, matrix_b.dtype, out_dtype=output.dtype))
+
+        plan.kernel_call(
+            TEMPLATE.get_def('matrixmul'),
+            [output, matrix_a, matrix_b],
+            global_size=(
+                batch,
+                a_blocks * block_width,
+                b_blocks * block_width),
+            local_size=(1, block_width, block_width),
+            render_kwds=render_kwds)
+
+        return plan
+
     def _build_plan(self, plan_factory, device_params, output, matrix_a, matrix_b):
         bwo = self._block_width_override
 
@@ -79,48 +119,34 @@ class MatrixMul(Computation):
             block_widths = [bwo]
         else:
             nbanks = device_params.local_mem_banks
-            block_widths = [2 ** n for n in range(helpers.log2(nbanks), -1, -1)]
-
-        a_batch = helpers.product(matrix_a.shape[:-2])
-        b_batch = helpers.product(matrix_b.shape[:-2])
-        batch = max(a_batch, b_batch)
+            block_widths = [
+                2 ** n for n in range(helpers.log2(nbanks), -1, -1)
+                if 2 ** (2 * n) <= device_params.max_work_group_size]
+
+            # The kernel keeps two blocks of the matrices in the local memory,
+            # which may limit the number of work groups executed simultaneously.
+            itemsize = matrix_a.dtype.itemsize + matrix_b.dtype.itemsize
+            block_widths = sort_by_occupancy(
+                device_params, block_widths,
+                [bw ** 2 for bw in block_widths],
+                [(bw ** 2 + bw) * itemsize for bw in block_widths])
+
+            best_width = self._tuned(
+                plan_factory, 'block_width', block_widths, self._build_plan_for_block_width,
+                [output, matrix_a, matrix_b],
+                problem=(self._transposed_a, self._transposed_b))
+            if best_width is not None:
+                block_widths = [best_width] + [bw for bw in block_widths if bw != best_width]
 
         for block_width in block_widths:
 
-            plan = plan_factory()
-
             if block_width ** 2 > device_params.max_work_group_size:
                 continue
 
-            num_steps = helpers.min_blocks(self._convolution_size, block_width)
-            a_blocks = helpers.min_blocks(self._a_outer_size, block_width)
-            b_blocks = helpers.min_blocks(self._b_outer_size, block_width)
-
-            render_kwds = dict(
-                batched_a=(a_batch != 1),
-                batched_b=(b_batch != 1),
-                transposed_a=self._transposed_a,
-                transposed_b=self._transposed_b,
-                num_steps=num_steps,
-                a_slices=(len(matrix_a.shape) - 2, 1, 1),
-                b_slices=(len(matrix_b.shape) - 2, 1, 1),
-                output_slices=(len(output.shape) - 2, 1, 1),
-                block_width=block_width,
-                mul=functions.mul(matrix_a.dtype, matrix_b.dtype, out_dtype=output.dtype))
-
             try:
-                plan.kernel_call(
-                    TEMPLATE.get_def('matrixmul'),
-                    [output, matrix_a, matrix_b],
-                    global_size=(
-                        batch,
-                        a_blocks * block_width,
-                        b_blocks * block_width),
-                    local_size=(1, block_width, block_width),
-                    render_kwds=render_kwds)
+                return self._build_plan_for_block_width(
+                    plan_factory, block_width, output, matrix_a, matrix_b)
             except OutOfResourcesError:
                 continue
 
-            return plan
-
         raise ValueError("Could not find suitable call parameters for the kernel")
@@ -138,6 +138,7 @@ if __name__ == '__main__':
         packages=[
             'reikna',
             'reikna/algorithms',
+            'reikna/benchmarks',
             'reikna/cbrng',
             'reikna/cluda',
             'reikna/core',
@@ -164,6 +165,8 @@ if __name__ == '__main__':
             'reikna/fft': ['*.mako'],
             'reikna/linalg': ['*.mako'],
             },
+        entry_points=dict(
+            console_scripts=['reikna-benchmark = reikna.benchmarks.__main__:main']),
         version=VERSION_STR,
         author='Bogdan Opanchuk',
         author_email='bogdan@opanchuk.net',
@@ -8,7 +8,9 @@ import pytest
 # renderers
 renderers = {
     'GFLOPS': lambda x: "{f:.2f} GFLOPS".format(f=float(x[1]) / x[0] / 1e9),
-    'GB/s': lambda x: "{f:.2f} GB/s".format(f=float(x[1]) / x[0] / 2 ** 30)
+    'GB/s': lambda x: "{f:.2f} GB/s".format(f=float(x[1]) / x[0] / 2 ** 30),
+    # a sequence of times for several variants of the same operation
+    'us': lambda x: " -> ".join("{f:.1f} us".format(f=t * 1e6) for t in x),
 }
 
 def pytest_configure(config):
@@ -283,3 +283,64 @@ def test_same_argument(some_thr):
     testc(arr_dev, arr_dev)
 
     assert diff_is_negligible(arr_dev.get(), arr)
+
+
+class FusedPureParallel(Computation):
+
+    def __init__(self, size, dtype):
+
+        Computation.__init__(self, [
+            Parameter('output', Annotation(Type(dtype, shape=size), 'o')),
+            Parameter('input', Annotation(Type(dtype, shape=size), 'i')),
+            Parameter('param', Annotation(dtype))])
+
+        trf = mul_param(Type(dtype, shape=size), dtype)
+        self._scale = PureParallel.from_trf(trf, trf.output)
+
+        # Reads the intermediate array at a different index,
+        # so the fused transformation must work with arbitrary indices.
+        self._reverse_add = PureParallel([
+                Parameter('output', Annotation(Type(dtype, shape=size), 'o')),
+                Parameter('i1', Annotation(Type(dtype, shape=size), 'i')),
+                Parameter('i2', Annotation(Type(dtype, shape=size), 'i'))],
+            """
+            ${i1.ctype} t1 = ${i1.load_idx}(${idxs[0]});
+            ${i2.ctype} t2 = ${i2.load_idx}(${size} - 1 - ${idxs[0]});
+            ${output.store_idx}(${idxs[0]}, t1 + t2);
+            """,
+            render_kwds=dict(size=size))
+
+    def _build_plan(self, plan_factory, device_params, output, input_, param):
+        plan = plan_factory()
+        scaled = plan.temp_array_like(input_)
+        scaled_twice = plan.temp_array_like(input_)
+        plan.computation_call(self._scale, scaled, input_, param)
+        plan.computation_call(self._scale, scaled_twice, scaled, 2)
+        plan.computation_call(self._reverse_add, output, input_, scaled_twice)
+        return plan
+
+
+def test_fuse_kernels(some_thr):
+    """
+    Checks that successive pure parallel computations are fused into a single kernel
+    and the intermediate arrays are not allocated.
+    """
+    N = 1000
+    coeff = 3
+    dtype = numpy.float32
+
+    p = FusedPureParallel(N, dtype)
+    a = get_test_array_like(p.parameter.input)
+    a_dev = some_thr.to_device(a)
+    res_dev = some_thr.empty_like(p.parameter.output)
+
+    pc = p.compile(some_thr)
+    assert len(pc._kernel_calls) == 3
+
+    pc = p.compile(some_thr, fuse_kernels=True)
+    assert len(pc._kernel_calls) == 1
+    assert len(pc.__tempalloc__) == 0
+
+    pc(res_dev, a_dev, coeff)
+
+    assert diff_is_negligible(res_dev.get(), a + a[::-1] * coeff * 2)
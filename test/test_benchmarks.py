@@ -0,0 +1,47 @@
+import numpy
+
+from reikna.core import Type
+from reikna.algorithms import Transpose
+from reikna.benchmarks import Benchmark, SUITES, run_benchmark, compare_results
+
+
+def test_suites():
+    for name, suite in SUITES.items():
+        for double in (False, True):
+            benchmarks = suite(double=double)
+            assert len(benchmarks) > 0
+            assert all(benchmark.suite == name for benchmark in benchmarks)
+            # The names are used to match the results with the baseline
+            assert len(set(benchmark.name for benchmark in benchmarks)) == len(benchmarks)
+
+
+def test_run_benchmark(some_thr):
+    arr_t = Type(numpy.float32, shape=(64, 128))
+    benchmark = Benchmark(
+        'Transpose', dict(shape=[64, 128]), lambda: Transpose(arr_t), nbytes=64 * 128 * 4 * 2)
+
+    result = run_benchmark(some_thr, benchmark, repetitions=3)
+    assert result['name'] == benchmark.name
+    assert result['time'] > 0
+    assert result['compile_time'] > 0
+    assert 0 <= result['call_overhead'] <= result['time']
+    assert result['gflops'] is None
+    assert result['gbps'] > 0
+
+
+def test_compare_results():
+    baseline = dict(results=[
+        dict(name='a', time=1.0, compile_time=1.0),
+        dict(name='b', time=1.0, compile_time=1.0),
+        dict(name='c', time=1.0, compile_time=1.0)])
+    results = dict(results=[
+        dict(name='a', time=1.05, compile_time=2.0),
+        dict(name='b', time=1.5, compile_time=1.0),
+        dict(name='d', time=10.0, compile_time=1.0)])
+
+    regressions = compare_results(results, baseline, threshold=0.1)
+    assert [(r['name'], r['key']) for r in regressions] == [('b', 'time')]
+    assert regressions[0]['ratio'] == 1.5
+
+    regressions = compare_results(results, baseline, threshold=0.1, keys=('compile_time',))
+    assert [(r['name'], r['key']) for r in regressions] == [('a', 'compile_time')]
@@ -1,4 +1,5 @@
 import itertools
+import json
 
 import pytest
 
@@ -6,7 +7,10 @@ import reikna.cluda as cluda
 import reikna.cluda.dtypes as dtypes
 import reikna.cluda.functions as functions
 from reikna.cluda import tempalloc
-from reikna.helpers import product
+from reikna.cluda.binary_cache import BinaryCache
+from reikna.cluda.characterization import CharacterizationDatabase
+from reikna.cluda.api import _typedef_names
+from reikna.helpers import product, template_def
 
 from helpers import *
 from pytest_threadgen import parametrize_thread_tuple, create_thread_in_tuple
@@ -176,8 +180,8 @@ def test_find_local_size(thr_and_global_size):
 
 @pytest.mark.parametrize(
     'tempalloc_cls',
-    [tempalloc.TrivialManager, tempalloc.ZeroOffsetManager],
-    ids=['trivial', 'zero_offset'])
+    [tempalloc.TrivialManager, tempalloc.ZeroOffsetManager, tempalloc.OffsetManager],
+    ids=['trivial', 'zero_offset', 'offset'])
 @pytest.mark.parametrize('pack', [False, True], ids=['no_pack', 'pack'])
 def test_tempalloc(cluda_api, tempalloc_cls, pack):
 
@@ -248,3 +252,327 @@ def test_tempalloc(cluda_api, tempalloc_cls, pack):
             # So we need to transfer the data to a normal array first.
             transfer(transfer_dest, arrays[dep], global_size=shape)
             assert (transfer_dest.get() != val).all()
+
+
+def test_offset_tempalloc(cluda_api):
+    """
+    Checks that ``OffsetManager`` places dependent temporary arrays
+    side by side in a single real allocation.
+    """
+
+    dtype = numpy.int32
+    thr = cluda_api.Thread.create(temp_alloc=dict(cls=tempalloc.OffsetManager))
+
+    large = thr.temp_array(10000, dtype)
+    small = thr.temp_array(100, dtype, dependencies=[large])
+    # Does not depend on anything, so it can reuse any of the existing regions
+    independent = thr.temp_array(1000, dtype)
+    assert thr.temp_alloc._statistics()['real_num'] == 2
+
+    thr.temp_alloc.pack()
+    stats = thr.temp_alloc._statistics()
+    assert stats['real_num'] == 1
+    assert stats['real_size_total'] < stats['virtual_size_total']
+
+
+def test_offset_tempalloc_intervals(cluda_api):
+    """
+    Checks that ``OffsetManager`` places temporary arrays with overlapping live intervals
+    at non-overlapping offsets, and reuses memory for the other ones.
+    """
+
+    dtype = numpy.int32
+    thr = cluda_api.Thread.create(temp_alloc=dict(cls=tempalloc.OffsetManager))
+    size = 1024
+
+    arrays = thr.temp_arrays([
+        ((size,), dtype, None, [(0, 1)]),
+        ((size,), dtype, None, [(1, 2)]),
+        ((size,), dtype, None, [(2, 3), (5, 5)])])
+    stats = thr.temp_alloc._statistics()
+    assert stats['real_num'] == 1
+    assert stats['real_size_total'] < stats['virtual_size_total']
+
+    mappings = [
+        thr.temp_alloc._virtual_to_real[arr.__tempalloc_id__] for arr in arrays]
+    assert mappings[0].offset != mappings[1].offset
+    assert mappings[1].offset != mappings[2].offset
+    assert mappings[0].offset == mappings[2].offset
+
+
+def test_mem_pool(cluda_api):
+    """
+    Checks that the memory pool reuses freed allocations of the same size class,
+    and respects the limit on the size of the held allocations.
+    """
+
+    thr = cluda_api.Thread.create(mem_pool=dict(limit=100000))
+    pool = thr.mem_pool
+
+    a = get_test_array(10000, numpy.int32)
+    a_dev = thr.to_device(a)
+    del a_dev
+    stats = pool.statistics()
+    assert stats['buffers_held'] == 1
+    assert stats['buffers_active'] == 0
+
+    # Same size class, served by the held allocation
+    b = get_test_array(9900, numpy.int32)
+    b_dev = thr.to_device(b)
+    assert diff_is_negligible(thr.from_device(b_dev), b)
+    stats = pool.statistics()
+    assert stats['hits'] == 1
+    assert stats['buffers_held'] == 0
+    assert stats['fragmentation'] > 0
+
+    # Temporary arrays are allocated from the pool too
+    temp = thr.temp_array(100000, numpy.int32)
+    assert pool.statistics()['buffers_active'] == 2
+
+    # Exceeds the limit, so the allocation is not kept
+    del temp
+    assert pool.statistics()['buffers_held'] == 0
+
+    del b_dev
+    assert pool.statistics()['buffers_held'] == 1
+    pool.trim()
+    assert pool.statistics()['bytes_held'] == 0
+
+
+def test_host_array_transfers(cluda_api):
+    """
+    Checks the asynchronous transfers from and to page-locked host arrays.
+    """
+
+    thr = cluda_api.Thread.create(host_pool=True)
+
+    a = thr.host_array((100, 200), numpy.float32)
+    a[:] = get_test_array(a.shape, a.dtype)
+
+    a_dev, event = thr.to_device(a, event=True)
+    event.wait()
+    assert event.done()
+
+    b, event = thr.from_device(a_dev, event=True)
+    event.wait()
+    assert diff_is_negligible(b, a)
+
+    b[:] = 0
+    event = thr.from_device(a_dev, dest=b, event=True)
+    event.wait()
+    assert diff_is_negligible(b, a)
+
+    # The freed host arrays are not reused until the operations enqueued before the release
+    # are finished.
+    del a, b
+    assert all(len(events) == 1 for buffers in thr.host_pool._held.values()
+        for _, events in buffers)
+    thr.synchronize()
+    c = thr.host_array((200, 100), numpy.float32)
+    assert thr.host_pool.statistics()['hits'] == 1
+
+
+def test_release_pending_futures(cluda_api):
+    """
+    Checks that the ``asyncio`` futures of the transfers enqueued before the release
+    of a thread are resolved.
+    """
+
+    asyncio = pytest.importorskip('asyncio')
+    loop = asyncio.new_event_loop()
+
+    thr = cluda_api.Thread.create()
+    a = get_test_array(100000, numpy.float32)
+    a_dev = thr.to_device(a)
+
+    futures = []
+    def enqueue():
+        futures.append(thr.from_device_async(a_dev))
+        thr.release()
+
+    try:
+        # The futures have to be created while the loop is running
+        loop.call_soon(enqueue)
+        loop.run_until_complete(asyncio.sleep(0))
+        b = loop.run_until_complete(futures[0])
+    finally:
+        loop.close()
+
+    assert diff_is_negligible(b, a)
+
+
+def test_fork(cluda_api):
+    """
+    Checks that a forked thread shares the temporary array manager and the pools
+    with the parent, and the operations in different queues can be ordered with events.
+    """
+
+    thr = cluda_api.Thread.create(mem_pool=True)
+    forked = thr.fork()
+    assert forked.temp_alloc is thr.temp_alloc
+    assert forked.mem_pool is thr.mem_pool
+
+    # Independent temporary arrays used in different queues do not share memory
+    temp1 = thr.temp_array(1000, numpy.int32)
+    temp2 = forked.temp_array(1000, numpy.int32)
+    assert thr.temp_alloc._statistics()['real_num'] == 2
+
+    src = """
+    KERNEL void fill(GLOBAL_MEM int *dest, int val)
+    {
+        const SIZE_T i = get_global_id(0);
+        dest[i] = val;
+    }
+    """
+    fill = forked.compile(src).fill
+
+    a_dev = forked.array(1000, numpy.int32)
+    fill(a_dev, numpy.int32(123), global_size=1000)
+    event = forked.record_event()
+
+    b_dev = thr.array(1000, numpy.int32)
+    thr.wait_for(event)
+    thr.copy_array(a_dev, dest=b_dev)
+    assert (thr.from_device(b_dev) == 123).all()
+
+    # Releasing a forked thread does not free the allocations held by the shared pool
+    del a_dev, b_dev
+    forked.synchronize()
+    thr.synchronize()
+    buffers_held = thr.mem_pool.statistics()['buffers_held']
+    assert buffers_held > 0
+    forked.release()
+    assert thr.mem_pool.statistics()['buffers_held'] == buffers_held
+
+
+def test_profiler(cluda_api, tmpdir):
+    """
+    Checks that the profiler collects the records of kernel launches and transfers,
+    and exports them as a trace.
+    """
+
+    thr = cluda_api.Thread.create(profile=True)
+
+    template = template_def(['dest'], """
+    KERNEL void fill(GLOBAL_MEM int *${dest})
+    {
+        VIRTUAL_SKIP_THREADS;
+        const VSIZE_T i = virtual_global_id(0);
+        ${dest}[i] = i;
+    }
+    """)
+    fill = thr.compile_static(template, 'fill', 1000, render_args=['dest'])
+
+    a_dev = thr.to_device(numpy.zeros(1000, numpy.int32))
+    fill(a_dev)
+    fill(a_dev)
+    assert (thr.from_device(a_dev) == numpy.arange(1000)).all()
+
+    records = thr.profiler.records()
+    assert [record['name'] for record in records] == ['to_device', 'fill', 'fill', 'from_device']
+    kernel_record = records[1]
+    assert kernel_record['global_size'] == (1000,)
+    assert kernel_record['build_time'] > 0
+    for record in records:
+        assert record['duration'] >= 0
+
+    report = thr.profiler.report()
+    kernel_entry = [entry for entry in report if entry['name'] == 'fill'][0]
+    assert kernel_entry['count'] == 2
+
+    fname = str(tmpdir.join('trace.json'))
+    thr.profiler.export_chrome_trace(fname)
+    with open(fname) as f:
+        trace = json.load(f)
+    assert len(trace['traceEvents']) == 4
+
+    thr.profiler.clear()
+    assert thr.profiler.records() == []
+
+
+def test_binary_cache(cluda_api, tmpdir):
+    """
+    Checks that the second compilation of the same source is served from the binary cache,
+    the program loaded from the cache works correctly, and corrupted entries are replaced.
+    """
+
+    src = """
+    KERNEL void fill(GLOBAL_MEM int *dest, int val)
+    {
+        const SIZE_T i = get_global_id(0);
+        dest[i] = val + i;
+    }
+    """
+    size = 128
+
+    for i in range(2):
+        thr = cluda_api.Thread.create(binary_cache=str(tmpdir))
+        program = thr.compile(src)
+        dest_dev = thr.array(size, numpy.int32)
+        program.fill(dest_dev, numpy.int32(i), global_size=size)
+        assert diff_is_negligible(dest_dev.get(), numpy.arange(size).astype(numpy.int32) + i)
+
+        assert thr.binary_cache.hits == i
+        assert thr.binary_cache.misses == 1 - i
+        thr.release()
+
+    # A corrupted entry is counted as a miss and replaced by a valid one
+    paths = [str(path) for path in tmpdir.listdir() if str(path).endswith(BinaryCache.SUFFIX)]
+    for path in paths:
+        with open(path, 'wb') as f:
+            f.write(b'corrupted')
+
+    thr = cluda_api.Thread.create(binary_cache=str(tmpdir))
+    program = thr.compile(src)
+    dest_dev = thr.array(size, numpy.int32)
+    program.fill(dest_dev, numpy.int32(2), global_size=size)
+    assert diff_is_negligible(dest_dev.get(), numpy.arange(size).astype(numpy.int32) + 2)
+    assert thr.binary_cache.hits == 0
+    assert thr.binary_cache.misses == 1
+    thr.release()
+
+    for path in paths:
+        with open(path, 'rb') as f:
+            assert f.read() != b'corrupted'
+
+    cache = BinaryCache(str(tmpdir))
+    assert cache.size() > 0
+    cache.evict(0)
+    assert cache.size() == 0
+
+
+def test_characterization(cluda_api, tmpdir):
+    """
+    Checks that the measured device parameters are saved in the database
+    and used by the subsequent threads for the same device.
+    """
+
+    thr = cluda_api.Thread.create(characterization=str(tmpdir))
+    params = thr.device_params
+    assert params.launch_latency > 0
+    assert params.warp_size >= 1
+    assert params.local_mem_banks >= 1
+    assert sorted(params.min_mem_coalesce_width) == [4, 8, 16]
+
+    saved = CharacterizationDatabase(str(tmpdir)).get(thr._device_fingerprint())
+    assert saved['launch_latency'] == params.launch_latency
+
+    thr2 = cluda_api.Thread.create(characterization=str(tmpdir))
+    assert thr2.device_params.launch_latency == params.launch_latency
+    assert thr2.device_params.min_mem_coalesce_width == params.min_mem_coalesce_width
+
+    thr2.release()
+    thr.release()
+
+
+def test_typedef_names():
+    """
+    Checks that the names of the types defined in a kernel source are found
+    (so that they could be renamed when several kernels are placed in a single program).
+    """
+    src = """
+        typedef struct { int a; struct { float b; } c; } my_struct;
+        typedef float2 vec_t;
+        typedef int arr_t[4];
+        """
+    assert _typedef_names(src) == ['my_struct', 'vec_t', 'arr_t']
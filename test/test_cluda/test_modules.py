@@ -3,6 +3,7 @@ import pytest
 from helpers import *
 from reikna.helpers import *
 from reikna.cluda import Module, Snippet
+from reikna.cluda.kernel import render_statistics, clear_render_cache
 import reikna.cluda.functions as functions
 
 
@@ -208,3 +209,52 @@ def test_caching(some_thr):
     a_ref = numpy.vstack([a[1] + 2, a[0] + 3])
 
     assert diff_is_negligible(a_dev.get(), a_ref)
+
+
+PARAMETRIZED_TEMPLATE = template_from("""
+<%def name="adder(prefix, num)">
+WITHIN_KERNEL int ${prefix}(int x)
+{
+    return x + ${num};
+}
+</%def>
+""")
+
+
+def test_parametrized_module_deduplication(some_thr):
+    """
+    Tests that a parametrized module called several times with the same arguments
+    is rendered only once, and that the rendered source is reused for an identical kernel.
+    """
+
+    size = 128
+    adder = Module(PARAMETRIZED_TEMPLATE.get_def('adder'))
+    src = """
+        KERNEL void test(GLOBAL_MEM int *dest)
+        {
+            const SIZE_T idx = get_global_id(0);
+            int x = dest[idx];
+            %for i in range(4):
+            x = ${adder(1)}(x);
+            %endfor
+            x = ${adder(2)}(x);
+            dest[idx] = x;
+        }
+        """
+
+    clear_render_cache()
+    program = some_thr.compile(src, render_kwds=dict(adder=adder))
+    stats = render_statistics()
+    assert stats['module_renders'] == 2
+    assert stats['module_duplicates'] == 3
+    assert stats['source_size_deduplicated'] < stats['source_size_total']
+
+    a = get_test_array(size, numpy.int32)
+    a_dev = some_thr.to_device(a)
+    program.test(a_dev, global_size=size)
+    assert diff_is_negligible(a_dev.get(), a + 6)
+
+    # An identical module object should produce the same source
+    some_thr.compile(
+        src, render_kwds=dict(adder=Module(PARAMETRIZED_TEMPLATE.get_def('adder'))))
+    assert render_statistics()['cache_hits'] == 1
@@ -32,6 +32,66 @@ def test_find_local_size(global_size, flat_local_size, expected_local_size):
     assert local_size == expected_local_size
 
 
+class MockDeviceParameters:
+
+    def __init__(self, occupancy_known=True):
+        self.warp_size = 32
+        self.max_threads_per_compute_unit = 2048 if occupancy_known else None
+        self.max_groups_per_compute_unit = 16 if occupancy_known else None
+        self.registers_per_compute_unit = 65536 if occupancy_known else None
+        self.local_mem_per_compute_unit = 49152 if occupancy_known else None
+
+
+vals_find_flat_local_size = [
+    # no kernel resource information, the maximum size is used
+    (True, None, None, 1024),
+    # the occupancy is unknown
+    (False, 40, 0, 1024),
+    # few resources are used, the maximum size is as good as any other
+    (True, 16, 0, 1024),
+    # registers are enough for 1638 threads; one 1024-thread group leaves a lot of them idle,
+    # while three 544-thread groups fit
+    (True, 40, 0, 544),
+    # registers are enough for one 1024-thread group or two 512-thread ones,
+    # the larger group size is preferred
+    (True, 64, 0, 1024),
+    # local memory is enough for only one group, so it should be as large as possible
+    (True, 16, 32768, 1024),
+    ]
+@pytest.mark.parametrize(
+    ('occupancy_known', 'registers', 'local_mem', 'expected_flat_local_size'),
+    vals_find_flat_local_size,
+    ids=[str(x[:3]) for x in vals_find_flat_local_size])
+def test_find_flat_local_size(occupancy_known, registers, local_mem, expected_flat_local_size):
+    """
+    Checking that ``find_flat_local_size`` picks the local size with the best occupancy
+    if the kernel resource usage is available, and the maximum local size otherwise.
+    """
+    device_params = MockDeviceParameters(occupancy_known=occupancy_known)
+    flat_local_size = vsize.find_flat_local_size(
+        device_params, 2 ** 20, 1024, registers=registers, local_mem=local_mem)
+    assert flat_local_size == expected_flat_local_size
+
+
+def test_sort_by_occupancy():
+    """
+    Checking that ``sort_by_occupancy`` puts first the local sizes
+    for which the local memory usage does not limit the occupancy,
+    preserving the given order otherwise.
+    """
+    local_sizes = [1024, 512, 256]
+    # Only one 1024-thread group fits in the local memory, but enough of the smaller ones do
+    local_mems = [40000, 8192, 2048]
+
+    device_params = MockDeviceParameters()
+    assert vsize.sort_by_occupancy(
+        device_params, local_sizes, local_sizes, local_mems) == [512, 256, 1024]
+
+    device_params = MockDeviceParameters(occupancy_known=False)
+    assert vsize.sort_by_occupancy(
+        device_params, local_sizes, local_sizes, local_mems) == local_sizes
+
+
 vals_group_dimensions = [
     ((1, 1, 1), (2, 2)),
     ((1, 2, 3), (2, 3)),
@@ -1,6 +1,15 @@
+import time
+
 import numpy
 import pytest
 
+from reikna.core import CompilationCache, LaunchGraph, DataParallel, Streaming, \
+    VariableBatch, Tuner, Computation, Parameter, Annotation, Type
+from reikna.core.parallel import split_batch
+from reikna.cluda import tempalloc
+from reikna.helpers import template_from, structural_key
+from reikna.algorithms import PureParallel
+
 from helpers import *
 from test_core.dummy import *
 
@@ -194,3 +203,618 @@ def test_same_arg_as_i_and_o(some_thr):
 
     assert diff_is_negligible(C, C_ref)
     assert diff_is_negligible(D, D_ref)
+
+
+def test_compilation_cache(some_thr):
+    """
+    Tests that structurally identical computations are compiled only once
+    when a compilation cache is used.
+    """
+
+    N = 200
+    A = get_test_array((N, N), numpy.complex64)
+    B = get_test_array(N, numpy.complex64)
+    cache = CompilationCache(max_entries=2)
+
+    d1 = DummyNested(A, B, numpy.float32, 3).compile(some_thr, cache=cache)
+    d2 = DummyNested(A, B, numpy.float32, 3).compile(some_thr, cache=cache)
+    assert d2 is d1
+    assert cache.hits == 1 and cache.misses == 1
+
+    # Different constructor parameters
+    d3 = DummyNested(A, B, numpy.float32, 4).compile(some_thr, cache=cache)
+    assert d3 is not d1
+
+    # Different transformation trees
+    d = DummyNested(A, B, numpy.float32, 3)
+    scale = tr_scale(A, numpy.float32)
+    d.parameter.A.connect(scale, scale.o1, A_prime=scale.i1, scale_coeff=scale.s1)
+    d4 = d.compile(some_thr, cache=cache)
+    assert d4 is not d1
+
+    # The first entry must have been evicted
+    assert len(cache) == 2
+    assert DummyNested(A, B, numpy.float32, 3).compile(some_thr, cache=cache) is not d1
+    assert cache.hits == 1 and cache.misses == 4
+
+
+def test_structural_key_object_arrays():
+    """
+    Tests that arrays of Python objects are keyed by their elements.
+    """
+    a1 = numpy.array([1, 'a', None], dtype=object)
+    a2 = numpy.array([1, 'a', None], dtype=object)
+    a3 = numpy.array([2, 'a', None], dtype=object)
+    assert structural_key(a1) == structural_key(a2)
+    assert hash(structural_key(a1)) == hash(structural_key(a2))
+    assert structural_key(a1) != structural_key(a3)
+
+def test_compilation_cache_options(some_thr, tmpdir):
+    """
+    Tests that the compilation options changing the plan are a part of the cache key.
+    """
+
+    N = 200
+    A = get_test_array((N, N), numpy.complex64)
+    B = get_test_array(N, numpy.complex64)
+    cache = CompilationCache()
+
+    d1 = DummyNested(A, B, numpy.float32, 3).compile(some_thr, cache=cache)
+
+    # A tuner which does nothing is the same as no tuner
+    tuner = Tuner(mode='off', database=str(tmpdir))
+    assert DummyNested(A, B, numpy.float32, 3).compile(
+        some_thr, cache=cache, tuner=tuner) is d1
+
+    tuner = Tuner(mode='tune', database=str(tmpdir))
+    d2 = DummyNested(A, B, numpy.float32, 3).compile(some_thr, cache=cache, tuner=tuner)
+    assert d2 is not d1
+    assert DummyNested(A, B, numpy.float32, 3).compile(
+        some_thr, cache=cache, tuner=Tuner(mode='tune', database=str(tmpdir))) is d2
+    assert DummyNested(A, B, numpy.float32, 3).compile(
+        some_thr, cache=cache, tuner=Tuner(mode='cached', database=str(tmpdir))) is not d2
+
+    d3 = DummyNested(A, B, numpy.float32, 3).compile(some_thr, cache=cache, fuse_kernels=True)
+    assert d3 is not d1
+    assert DummyNested(A, B, numpy.float32, 3).compile(
+        some_thr, cache=cache, fuse_kernels=True) is d3
+
+
+def test_parallel_build(some_thr):
+    """
+    Tests that a computation with kernels built in parallel at the plan finalization
+    produces the same results.
+    """
+
+    N = 200
+    coeff = 2
+    second_coeff = 3
+    A = get_test_array((N, N), numpy.complex64)
+    B = get_test_array(N, numpy.complex64)
+
+    A_dev = some_thr.to_device(A)
+    B_dev = some_thr.to_device(B)
+    C_dev = some_thr.empty_like(A_dev)
+    D_dev = some_thr.empty_like(B_dev)
+
+    d = DummyNested(A_dev, B_dev, numpy.float32, second_coeff).compile(
+        some_thr, build_workers=4)
+    assert all(kernel_call._kernel.built for kernel_call in d._kernel_calls)
+
+    d(C_dev, D_dev, A_dev, B_dev, coeff)
+    C_ref, D_ref = mock_dummy_nested(A, B, coeff, second_coeff)
+
+    assert diff_is_negligible(C_dev.get(), C_ref)
+    assert diff_is_negligible(D_dev.get(), D_ref)
+
+
+def test_merged_kernels(some_thr):
+    """
+    Tests that kernels of a computation can be placed in a single program.
+    """
+
+    N = 200
+    coeff = 2
+    second_coeff = 3
+    A = get_test_array((N, N), numpy.complex64)
+    B = get_test_array(N, numpy.complex64)
+
+    A_dev = some_thr.to_device(A)
+    B_dev = some_thr.to_device(B)
+    C_dev = some_thr.empty_like(A_dev)
+    D_dev = some_thr.empty_like(B_dev)
+
+    d = DummyNested(A_dev, B_dev, numpy.float32, second_coeff).compile(
+        some_thr, merge_kernels=True)
+    programs = set(id(kernel_call._kernel._program) for kernel_call in d._kernel_calls)
+    assert len(d._kernel_calls) == 4 and len(programs) == 1
+
+    d(C_dev, D_dev, A_dev, B_dev, coeff)
+    C_ref, D_ref = mock_dummy_nested(A, B, coeff, second_coeff)
+
+    assert diff_is_negligible(C_dev.get(), C_ref)
+    assert diff_is_negligible(D_dev.get(), D_ref)
+
+
+def test_prepared_call(some_thr):
+    """
+    Checks that the low-overhead call gives the same results as the normal one.
+    """
+
+    N = 200
+    coeff = 2
+    A = get_test_array((N, N), numpy.complex64)
+    B = get_test_array(N, numpy.complex64)
+
+    A_dev = some_thr.to_device(A)
+    B_dev = some_thr.to_device(B)
+    C_dev = some_thr.empty_like(A_dev)
+    D_dev = some_thr.empty_like(B_dev)
+
+    d = Dummy(A_dev, B_dev, numpy.float32).compile(some_thr)
+    d.prepared_call(C_dev, D_dev, A_dev, B_dev, numpy.float32(coeff))
+
+    C_ref, D_ref = mock_dummy(A, B, coeff)
+    assert diff_is_negligible(C_dev.get(), C_ref)
+    assert diff_is_negligible(D_dev.get(), D_ref)
+
+    with pytest.raises(TypeError):
+        d.prepared_call(C_dev, D_dev, A_dev, B_dev)
+
+
+def test_submit(some_thr):
+    """
+    Checks that the enqueued computations can wait for each other's events,
+    and the returned events mark their completion.
+    """
+
+    N = 200
+    coeff = 2
+    A = get_test_array((N, N), numpy.complex64)
+    B = get_test_array(N, numpy.complex64)
+
+    A_dev = some_thr.to_device(A)
+    B_dev = some_thr.to_device(B)
+    C_dev = some_thr.empty_like(A_dev)
+    D_dev = some_thr.empty_like(B_dev)
+    C2_dev = some_thr.empty_like(A_dev)
+    D2_dev = some_thr.empty_like(B_dev)
+
+    d = Dummy(A_dev, B_dev, numpy.float32).compile(some_thr)
+    event = d.submit((C_dev, D_dev, A_dev, B_dev), dict(coeff=coeff))
+    event2 = d.bind(coeff=coeff).submit(
+        (C2_dev, D2_dev), dict(A=A_dev, B=B_dev), wait_for=[event])
+    event2.wait()
+    assert event.done() and event2.done()
+
+    C_ref, D_ref = mock_dummy(A, B, coeff)
+    assert diff_is_negligible(C_dev.get(), C_ref)
+    assert diff_is_negligible(D_dev.get(), D_ref)
+    assert diff_is_negligible(C2_dev.get(), C_ref)
+    assert diff_is_negligible(D2_dev.get(), D_ref)
+
+
+def run_in_loop(loop, func):
+    """
+    Calls ``func`` while ``loop`` is running,
+    and returns the result of the future it returns.
+    """
+    result = loop.create_future()
+
+    def resolve(future):
+        if future.exception() is None:
+            result.set_result(future.result())
+        else:
+            result.set_exception(future.exception())
+
+    loop.call_soon(lambda: func().add_done_callback(resolve))
+    return loop.run_until_complete(result)
+
+
+def test_call_async(some_thr):
+    """
+    Checks the ``asyncio`` futures returned by the asynchronous transfers and calls.
+    """
+
+    asyncio = pytest.importorskip('asyncio')
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    N = 200
+    coeff = 2
+    A = get_test_array((N, N), numpy.complex64)
+    B = get_test_array(N, numpy.complex64)
+
+    try:
+        A_dev, B_dev = run_in_loop(loop, lambda: asyncio.gather(
+            some_thr.to_device_async(A), some_thr.to_device_async(B)))
+        C_dev = some_thr.empty_like(A_dev)
+        D_dev = some_thr.empty_like(B_dev)
+
+        d = Dummy(A_dev, B_dev, numpy.float32).compile(some_thr)
+        assert run_in_loop(loop, lambda: d.call_async(C_dev, D_dev, A_dev, B_dev, coeff)) is None
+
+        C, D = run_in_loop(loop, lambda: asyncio.gather(
+            some_thr.from_device_async(C_dev), some_thr.from_device_async(D_dev)))
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+    C_ref, D_ref = mock_dummy(A, B, coeff)
+    assert diff_is_negligible(C, C_ref)
+    assert diff_is_negligible(D, D_ref)
+
+
+def test_bind(some_thr):
+    """
+    Checks that a computation with some arguments fixed gives correct results,
+    and that the fixed scalar arguments can be changed.
+    """
+
+    N = 200
+    A = get_test_array((N, N), numpy.complex64)
+    B = get_test_array(N, numpy.complex64)
+
+    A_dev = some_thr.to_device(A)
+    B_dev = some_thr.to_device(B)
+    C_dev = some_thr.empty_like(A_dev)
+    D_dev = some_thr.empty_like(B_dev)
+
+    d = Dummy(A_dev, B_dev, numpy.float32).compile(some_thr)
+    bound = d.bind(A=A_dev, B=B_dev, coeff=2)
+    assert list(bound.signature.parameters.keys()) == ['C', 'D']
+
+    set_coeff = bound.setter('coeff')
+    for coeff in (2, 3):
+        set_coeff(coeff)
+        bound(C_dev, D=D_dev)
+        C_ref, D_ref = mock_dummy(A, B, coeff)
+        assert diff_is_negligible(C_dev.get(), C_ref)
+        assert diff_is_negligible(D_dev.get(), D_ref)
+
+    with pytest.raises(TypeError):
+        d.bind(E=A_dev)
+    with pytest.raises(TypeError):
+        bound.setter('C')
+
+
+def test_launch_graph(some_thr):
+    """
+    Checks that a recorded sequence of computation calls and copies
+    gives the same results as the direct calls.
+    """
+
+    N = 200
+    coeff = 2
+    A = get_test_array((N, N), numpy.complex64)
+    B = get_test_array(N, numpy.complex64)
+
+    A_dev = some_thr.to_device(A)
+    B_dev = some_thr.to_device(B)
+    C_dev = some_thr.empty_like(A_dev)
+    D_dev = some_thr.empty_like(B_dev)
+    C2_dev = some_thr.empty_like(A_dev)
+    D2_dev = some_thr.empty_like(B_dev)
+
+    d = Dummy(A_dev, B_dev, numpy.float32).compile(some_thr)
+
+    graph = LaunchGraph(some_thr)
+    graph.add(d, C_dev, D_dev, A_dev, B_dev, coeff)
+    graph.add_copy(A_dev, C_dev)
+    graph.add(d.bind(coeff=coeff), C2_dev, D2_dev, A_dev, D_dev)
+
+    # Nothing is executed during recording
+    assert diff_is_negligible(A_dev.get(), A)
+
+    graph()
+
+    C_ref, D_ref = mock_dummy(A, B, coeff)
+    C2_ref, D2_ref = mock_dummy(C_ref, D_ref, coeff)
+    assert diff_is_negligible(C2_dev.get(), C2_ref)
+    assert diff_is_negligible(D2_dev.get(), D2_ref)
+
+
+TEMP_KERNELS = template_from("""
+<%def name="scale(kernel_declaration, output, input)">
+${kernel_declaration}
+{
+    VIRTUAL_SKIP_THREADS;
+    VSIZE_T idx = virtual_global_id(0);
+    if (idx >= ${start} && idx < ${stop})
+        ${output.store_idx}(idx, ${input.load_idx}(idx) * ${coeff});
+}
+</%def>
+""")
+
+
+def scale_call(plan, output, input_, coeff, start=0, stop=None, overwrite=False):
+    """
+    Adds a kernel call writing ``input_ * coeff`` to the elements
+    of ``output`` from ``start`` to ``stop``.
+    """
+    size = input_.shape[0]
+    plan.kernel_call(
+        TEMP_KERNELS.get_def('scale'), [output, input_], global_size=size,
+        render_kwds=dict(coeff=coeff, start=start, stop=size if stop is None else stop),
+        overwrites=[output] if overwrite else None)
+
+
+class TempReuse(Computation):
+    """
+    Uses two temporary arrays one after another,
+    writing to one of them after its contents was used for the last time.
+    If ``overwrite`` is ``True``, the writes are declared to overwrite the arrays completely.
+    """
+
+    def __init__(self, arr, overwrite=False):
+        self._overwrite = overwrite
+        Computation.__init__(self, [
+            Parameter('output1', Annotation(arr, 'o')),
+            Parameter('output2', Annotation(arr, 'o')),
+            Parameter('output3', Annotation(arr, 'o')),
+            Parameter('input', Annotation(arr, 'i'))])
+
+    def _build_plan(self, plan_factory, device_params, output1, output2, output3, input_):
+        plan = plan_factory()
+        temp1 = plan.temp_array_like(input_)
+        temp2 = plan.temp_array_like(input_)
+        overwrite = self._overwrite
+        scale_call(plan, temp1, input_, 2, overwrite=overwrite)
+        scale_call(plan, output1, temp1, 1)
+        scale_call(plan, temp2, input_, 3, overwrite=overwrite)
+        scale_call(plan, output2, temp2, 1)
+        scale_call(plan, temp1, input_, 4, overwrite=overwrite)
+        scale_call(plan, output3, temp1, 1)
+        scale_call(plan, temp2, input_, 5, overwrite=overwrite)
+        return plan
+
+
+@pytest.mark.parametrize('overwrite', [False, True], ids=['partial', 'overwrite'])
+def test_temp_liveness(cluda_api, overwrite):
+    """
+    Checks that temporary arrays share memory only if their contents
+    does not have to be preserved at the same time, without changing the results.
+    """
+
+    thr = cluda_api.Thread.create(temp_alloc=dict(cls=tempalloc.OffsetManager))
+
+    A = get_test_array(1000, numpy.float32)
+    A_dev = thr.to_device(A)
+    B_dev = thr.empty_like(A_dev)
+    C_dev = thr.empty_like(A_dev)
+    D_dev = thr.empty_like(A_dev)
+
+    comp = TempReuse(A_dev, overwrite=overwrite)
+    compc = comp.compile(thr)
+    stats = thr.temp_alloc._statistics()
+    assert stats['virtual_num'] == 2
+    assert stats['real_num'] == 1
+    if overwrite:
+        assert stats['real_size_total'] == A.nbytes
+    else:
+        assert stats['real_size_total'] >= 2 * A.nbytes
+
+    compc(B_dev, C_dev, D_dev, A_dev)
+    assert diff_is_negligible(B_dev.get(), A * 2)
+    assert diff_is_negligible(C_dev.get(), A * 3)
+    assert diff_is_negligible(D_dev.get(), A * 4)
+
+
+class PartialWrite(Computation):
+    """
+    Fills the halves of a temporary array in two kernels,
+    using another temporary array in between.
+    """
+
+    def __init__(self, arr):
+        Computation.__init__(self, [
+            Parameter('output1', Annotation(arr, 'o')),
+            Parameter('output2', Annotation(arr, 'o')),
+            Parameter('input', Annotation(arr, 'i'))])
+
+    def _build_plan(self, plan_factory, device_params, output1, output2, input_):
+        plan = plan_factory()
+        half = input_.shape[0] // 2
+        temp1 = plan.temp_array_like(input_)
+        temp2 = plan.temp_array_like(input_)
+        scale_call(plan, temp1, input_, 2, stop=half)
+        scale_call(plan, temp2, input_, 3)
+        scale_call(plan, output2, temp2, 1)
+        scale_call(plan, temp1, input_, 4, start=half)
+        scale_call(plan, output1, temp1, 1)
+        return plan
+
+
+def test_temp_partial_write(cluda_api):
+    """
+    Checks that a temporary array filled by several partial writes
+    does not share memory with the ones used between the writes.
+    """
+
+    thr = cluda_api.Thread.create(temp_alloc=dict(cls=tempalloc.OffsetManager))
+
+    A = get_test_array(1000, numpy.float32)
+    A_dev = thr.to_device(A)
+    B_dev = thr.empty_like(A_dev)
+    C_dev = thr.empty_like(A_dev)
+
+    comp = PartialWrite(A_dev)
+    compc = comp.compile(thr)
+    compc(B_dev, C_dev, A_dev)
+
+    half = A.size // 2
+    assert diff_is_negligible(B_dev.get(), numpy.concatenate([A[:half] * 2, A[half:] * 4]))
+    assert diff_is_negligible(C_dev.get(), A * 3)
+
+
+def batched_affine(batch_size, size=100):
+    """
+    Returns a computation calculating ``input * coeff + vec``
+    for a batch of ``batch_size`` rows of length ``size``.
+    """
+    arr_t = Type(numpy.float32, shape=(batch_size, size))
+    vec_t = Type(numpy.float32, shape=size)
+    return PureParallel(
+        [
+            Parameter('output', Annotation(arr_t, 'o')),
+            Parameter('input', Annotation(arr_t, 'i')),
+            Parameter('vec', Annotation(vec_t, 'i')),
+            Parameter('coeff', Annotation(numpy.float32))],
+        """
+        ${output.store_idx}(${idxs[0]}, ${idxs[1]},
+            ${input.load_idx}(${idxs[0]}, ${idxs[1]}) * ${coeff}
+            + ${vec.load_idx}(${idxs[1]}));
+        """)
+
+
+def test_split_batch():
+    assert split_batch(10, [1, 1]) == [5, 5]
+    assert split_batch(10, [1, 4]) == [2, 8]
+    assert split_batch(10, [1, 1, 1]) == [4, 3, 3]
+    assert split_batch(1, [1, 1]) == [1, 0]
+    assert sum(split_batch(1000, [0.3, 1.7, 2.9])) == 1000
+
+
+@pytest.mark.parametrize('weights', [None, [1, 3]], ids=['measured', 'fixed'])
+def test_data_parallel(some_thr, weights):
+    """
+    Checks that the parts of the batch processed by different threads
+    are gathered correctly, with a non-batched input copied to every thread.
+    """
+
+    batch, size = 20, 100
+
+    threads = [some_thr, some_thr.fork()]
+    dp = DataParallel(batched_affine, batch, ['output', 'input'])
+    dpc = dp.compile(threads, weights=weights)
+    assert sum(stop - start for start, stop, _ in dpc.parts) == batch
+    if weights is not None:
+        assert [stop - start for start, stop, _ in dpc.parts] == [5, 15]
+
+    A = get_test_array((batch, size), numpy.float32)
+    B = get_test_array(size, numpy.float32)
+    res = numpy.empty_like(A)
+    dpc(res, A, B, 2)
+
+    assert diff_is_negligible(res, A * 2 + B)
+
+    # The batch size and the shapes of the rows must match the compiled ones
+    with pytest.raises(ValueError):
+        dpc(res[:-1], A[:-1], B, 2)
+    with pytest.raises(ValueError):
+        dpc(res[:, :-1], A[:, :-1], B, 2)
+
+    # The output parameters must be batched
+    with pytest.raises(ValueError):
+        DataParallel(batched_affine, batch, ['input'])
+
+
+def test_data_parallel_separate_threads(cluda_api):
+    """
+    Checks that the threads created separately
+    (having different contexts in ``CUDA``) can process the parts of the batch.
+    """
+
+    batch, size = 20, 100
+
+    thr1 = cluda_api.Thread.create()
+    thr2 = cluda_api.Thread.create()
+    try:
+        dp = DataParallel(batched_affine, batch, ['output', 'input'])
+        dpc = dp.compile([thr1, thr2])
+
+        A = get_test_array((batch, size), numpy.float32)
+        B = get_test_array(size, numpy.float32)
+        res = numpy.empty_like(A)
+        dpc(res, A, B, 2)
+
+        # The device arrays have to be freed before the contexts are destroyed
+        del dpc
+    finally:
+        thr2.release()
+        thr1.release()
+
+    assert diff_is_negligible(res, A * 2 + B)
+
+
+def test_streaming(some_thr, tmpdir):
+    """
+    Checks that a computation is applied correctly to memory-mapped arrays
+    processed in chunks, including a partial last chunk.
+    """
+
+    batch, chunk, size = 23, 5, 100
+
+    sc = Streaming(batched_affine, chunk, ['output', 'input']).compile(some_thr)
+
+    A = numpy.memmap(
+        str(tmpdir.join('input')), dtype=numpy.float32, mode='w+', shape=(batch, size))
+    A[:] = get_test_array((batch, size), numpy.float32)
+    B = get_test_array(size, numpy.float32)
+    res = numpy.memmap(
+        str(tmpdir.join('output')), dtype=numpy.float32, mode='w+', shape=(batch, size))
+    sc(res, A, B, 2)
+
+    assert diff_is_negligible(numpy.asarray(res), A * 2 + B)
+
+    # The batched arguments must have the same length
+    with pytest.raises(ValueError):
+        sc(res[:chunk], A, B, 2)
+
+
+def test_variable_batch(some_thr):
+    """
+    Checks that a computation compiled for several batch sizes
+    gives correct results for the batch sizes between them.
+    """
+
+    size = 100
+
+    vbc = VariableBatch(batched_affine, 20, ['output', 'input'], sizes=[8, 20]).compile(some_thr)
+    assert [batch for batch, _ in vbc.compiled] == [8, 20]
+
+    B = get_test_array(size, numpy.float32)
+    B_dev = some_thr.to_device(B)
+    for batch in (5, 8, 13, 20):
+        A = get_test_array((batch, size), numpy.float32)
+        A_dev = some_thr.to_device(A)
+        res_dev = some_thr.empty_like(A_dev)
+        vbc(res_dev, A_dev, B_dev, 2)
+        assert diff_is_negligible(res_dev.get(), A * 2 + B)
+
+    # The batch size must not exceed the maximum one
+    A_dev = some_thr.to_device(get_test_array((21, size), numpy.float32))
+    with pytest.raises(ValueError):
+        vbc(some_thr.empty_like(A_dev), A_dev, B_dev, 2)
+
+
+@pytest.mark.perf
+@pytest.mark.returns('us')
+def test_call_overhead(thr):
+    """
+    Measures the time of a single call of a computation with small arrays
+    (dominated by the Python overhead) for the normal and the low-overhead calls.
+    """
+
+    N = 16
+    A_dev = thr.to_device(get_test_array((N, N), numpy.complex64))
+    B_dev = thr.to_device(get_test_array(N, numpy.complex64))
+    C_dev = thr.empty_like(A_dev)
+    D_dev = thr.empty_like(B_dev)
+    coeff = numpy.float32(2)
+
+    d = Dummy(A_dev, B_dev, numpy.float32).compile(thr)
+
+    attempts = 1000
+    times = []
+    for call in (d, d.prepared_call):
+        call(C_dev, D_dev, A_dev, B_dev, coeff)
+        thr.synchronize()
+
+        t1 = time.time()
+        for i in range(attempts):
+            call(C_dev, D_dev, A_dev, B_dev, coeff)
+        thr.synchronize()
+        times.append((time.time() - t1) / attempts)
+
+    return times
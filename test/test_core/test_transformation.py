@@ -3,7 +3,13 @@ import pytest
 
 from reikna.core import Parameter, Annotation, Transformation
 from reikna.core.signature import Type
+from reikna.core.transformation import TransformationTree
+from reikna.core.transformation_modules import cached_value_name
+from reikna.cluda.kernel import render_template_source
+from reikna.helpers import template_def
 from reikna.cluda import functions
+from reikna.algorithms import PureParallel
+import reikna.transformations as transformations
 
 from helpers import *
 from test_core.dummy import *
@@ -94,6 +100,18 @@ def test_signature_correctness():
         Parameter('B_param', Annotation(coeff_dtype)),
         Parameter('coeff', Annotation(coeff_dtype))]
 
+# Output = Input1 * Input1 + Input1 (reads the input several times)
+def tr_repeated_load(arr):
+    return Transformation(
+        [Parameter('o1', Annotation(arr, 'o')),
+        Parameter('i1', Annotation(arr, 'i'))],
+        """
+        ${o1.store_same}(${add}(${mul}(${i1.load_same}, ${i1.load_same}), ${i1.load_same}));
+        """,
+        render_kwds=dict(
+            add=functions.add(arr.dtype, arr.dtype),
+            mul=functions.mul(arr.dtype, arr.dtype)))
+
 
 def test_same_shape(thr):
 
@@ -187,6 +205,81 @@ def test_connection_to_base(thr):
     assert diff_is_negligible(D_dev.get(), D)
 
 
+def test_repeated_load(some_thr):
+    """
+    Checks that a transformation reading the same input several times
+    (which is only loaded from the global memory once) gives correct results.
+    """
+
+    N = 200
+    coeff = 2
+
+    coeff_dtype = numpy.float32
+    arr_type = Type(numpy.complex64, (N, N))
+
+    d = Dummy(arr_type, arr_type, coeff_dtype, same_A_B=True)
+    repeated = tr_repeated_load(d.parameter.A)
+    d.parameter.A.connect(repeated, repeated.o1, A_prime=repeated.i1)
+    dc = d.compile(some_thr)
+
+    A_prime = get_test_array_like(d.parameter.A_prime)
+    B = get_test_array_like(d.parameter.B)
+    A_prime_dev = some_thr.to_device(A_prime)
+    B_dev = some_thr.to_device(B)
+    C_dev = some_thr.empty_like(d.parameter.A_prime)
+    D_dev = some_thr.empty_like(d.parameter.B)
+
+    dc(C_dev, D_dev, A_prime_dev, B_dev, coeff)
+
+    C, D = mock_dummy(A_prime * A_prime + A_prime, B, coeff)
+
+    assert diff_is_negligible(C_dev.get(), C)
+    assert diff_is_negligible(D_dev.get(), D)
+
+
+def test_shared_leaf_loads(some_thr):
+    """
+    Checks that a leaf read with the same indices by several transformations
+    (here, both parts of a complex number are calculated from the same array)
+    is only loaded from the global memory once.
+    """
+
+    N = 200
+    complex_t = Type(numpy.complex64, N)
+    real_t = Type(numpy.float32, N)
+
+    pp = PureParallel(
+        [Parameter('output', Annotation(complex_t, 'o')),
+        Parameter('input', Annotation(complex_t, 'i'))],
+        "${output.store_idx}(${idxs[0]}, ${input.load_idx}(${idxs[0]}));")
+
+    combine = transformations.combine_complex(complex_t)
+    pp.parameter.input.connect(combine, combine.output, real=combine.real, imag=combine.imag)
+    mul = transformations.mul_param(real_t, numpy.float32)
+    pp.parameter.real.connect(mul, mul.output, x=mul.input, c1=mul.param)
+    add = transformations.add_param(real_t, numpy.float32)
+    pp.parameter.imag.connect(add, add.output, x=add.input, c2=add.param)
+
+    # The value of the leaf is loaded into a local variable in a single place,
+    # and passed to the functions of both transformations.
+    tree = TransformationTree([Parameter('input', Annotation(complex_t, 'i'))])
+    tree.connect('input', combine, dict(output='input', real='real', imag='imag'))
+    tree.connect('real', mul, dict(output='real', input='x', param='c1'))
+    tree.connect('imag', add, dict(output='imag', input='x', param='c2'))
+    input_obj, = tree.get_kernel_argobjects()
+    src = render_template_source(
+        template_def(['input'], "${input.load_idx}(0);"), render_args=[input_obj])
+    assert src.count(cached_value_name('x') + " = ") == 1
+
+    ppc = pp.compile(some_thr)
+    x = get_test_array(N, numpy.float32)
+    x_dev = some_thr.to_device(x)
+    output_dev = some_thr.empty_like(ppc.parameter.output)
+    ppc(output_dev, x_dev, 2, 3)
+
+    assert diff_is_negligible(output_dev.get(), x * 2 + 1j * (x + 3))
+
+
 def test_nested_same_shape(thr):
 
     N = 2000
@@ -0,0 +1,59 @@
+import pytest
+
+from reikna.cluda import OutOfResourcesError
+from reikna.core import Tuner, TuningDatabase
+
+
+def test_database(tmpdir):
+    db = TuningDatabase(str(tmpdir))
+    key = db.key('device', 'computation', 'parameter')
+
+    assert db.get(key) is None
+    db.put(key, [8, 4])
+    assert TuningDatabase(str(tmpdir)).get(key) == [8, 4]
+    assert len(db) == 1
+
+    db.clear()
+    assert db.get(key) is None
+    assert len(db) == 0
+
+
+def test_modes(tmpdir):
+    """
+    Checks that the tuner measures the candidates only in the ``'tune'`` mode,
+    and uses the saved results in the ``'cached'`` one.
+    """
+    measured = []
+    times = {(1, 2): 3., (2, 2): 1., (4, 2): 2.}
+    def measure(candidate):
+        measured.append(candidate)
+        if candidate == (8, 2):
+            raise OutOfResourcesError()
+        return times[candidate]
+
+    candidates = [(1, 2), (2, 2), (4, 2), (8, 2)]
+    key = TuningDatabase.key('problem')
+
+    assert Tuner(mode='cached', database=str(tmpdir)).pick(key, candidates, measure) is None
+    assert measured == []
+
+    tuner = Tuner(mode='tune', database=str(tmpdir))
+    assert tuner.pick(key, candidates, measure) == (2, 2)
+    assert measured == candidates
+
+    del measured[:]
+    tuner = Tuner(mode='cached', database=str(tmpdir))
+    assert tuner.pick(key, candidates, measure) == (2, 2)
+    assert measured == []
+    assert (tuner.hits, tuner.misses) == (1, 0)
+
+    # The stored value is not among the candidates anymore
+    assert tuner.pick(key, candidates[:1], measure) is None
+    assert (tuner.hits, tuner.misses) == (1, 1)
+
+    assert Tuner(mode='off', database=str(tmpdir)).pick(key, candidates, measure) is None
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        Tuner(mode='fast')
@@ -5,6 +5,7 @@ import pytest
 from helpers import *
 
 from reikna.linalg import MatrixMul
+from reikna.core import Tuner
 import reikna.cluda.dtypes as dtypes
 from reikna.cluda import OutOfResourcesError
 from reikna.helpers import product
@@ -157,6 +158,29 @@ def test_dtypes(thr_and_double, arg_dtypes):
     check_errors(thr, (30, 40, 50), dtype1, (30, 50, 60), dtype2)
 
 
+def test_tuned(thr, tmpdir):
+    """
+    Checks that the tuner saves the picked block width,
+    and the computation compiled with it gives correct results.
+    """
+    if thr.device_params.local_mem_banks < 2 or thr.device_params.max_work_group_size < 4:
+        pytest.skip("Only one block width is available")
+
+    a = get_test_array((30, 40), numpy.float32)
+    b = get_test_array((40, 50), numpy.float32)
+    a_dev = thr.to_device(a)
+    b_dev = thr.to_device(b)
+    res_dev = thr.array((30, 50), numpy.float32)
+
+    for mode, hits, misses in (('tune', 0, 1), ('cached', 1, 0)):
+        tuner = Tuner(mode=mode, database=str(tmpdir))
+        dotc = MatrixMul(a_dev, b_dev, out_arr=res_dev).compile(thr, tuner=tuner)
+        dotc(res_dev, a_dev, b_dev)
+        assert diff_is_negligible(res_dev.get(), numpy.dot(a, b))
+        assert (tuner.hits, tuner.misses) == (hits, misses)
+        assert len(tuner.database) == 1
+
+
 def test_out_arr_shape():
     a = numpy.empty((1, 22, 33), numpy.float32)
     b = numpy.empty((2, 3, 33, 44), numpy.float32)